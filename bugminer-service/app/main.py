@@ -1,17 +1,468 @@
 
 from __future__ import annotations
 
-from typing import List, Dict, Optional
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import AbstractSet, Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+import asyncio
+import email.utils
+import hashlib
+import json
+import operator
 import os
+import random
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import weakref
+import zlib
+from urllib.parse import urlsplit
+import httpx
 import requests
-from fastapi import FastAPI
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import uvicorn
 
-from common.models import BugItem
-from common.security import redact_pii
+from common.models import BugItem, BugStatus
+from common.security import redact_pii, redact_pii_many_async, shutdown_redaction_pool
 
-app = FastAPI()
+# Jira caps maxResults per search page (100 on Cloud); the server may lower it further
+JIRA_PAGE_SIZE = int(os.getenv("JIRA_PAGE_SIZE", "100"))
+# Search pages requested in parallel once the total is known
+JIRA_PAGE_CONCURRENCY = int(os.getenv("JIRA_PAGE_CONCURRENCY", "8"))
+# Only the fields mapped onto BugItem are requested
+JIRA_FIELDS = "summary,description,updated,priority,status"
+# workitemsbatch accepts at most 200 ids per request
+AZURE_BATCH_SIZE = min(200, int(os.getenv("AZURE_BATCH_SIZE", "200")))
+AZURE_BATCH_CONCURRENCY = int(os.getenv("AZURE_BATCH_CONCURRENCY", "8"))
+AZURE_FIELDS = [
+    "System.Id",
+    "System.Title",
+    "System.Description",
+    "System.ChangedDate",
+    "System.State",
+    "Microsoft.VSTS.Common.Severity",
+]
+
+# Connections kept alive per provider host; at least the page/batch concurrency
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "32"))
+# Retries of failed connections and 429/5xx responses, with exponential backoff
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+
+_http_session: Optional[requests.Session] = None
+_http_session_lock = threading.Lock()
+
+
+def build_http_session(pool_size: int = HTTP_POOL_SIZE, retries: int = HTTP_RETRIES, backoff: float = HTTP_BACKOFF) -> requests.Session:
+    """Create a session with a keep-alive connection pool and retry/backoff.
+
+    Provider searches are read-only, so POSTs (WIQL, workitemsbatch) are
+    retried as well. Retry-After headers on 429/503 are honoured.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "POST"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_http_session() -> requests.Session:
+    """Return the process-wide pooled session shared by all agents, creating it once."""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            _http_session = build_http_session()
+        return _http_session
+
+
+def close_http_session() -> None:
+    """Close the shared session and its pooled connections, if it was created."""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is not None:
+            _http_session.close()
+            _http_session = None
+
+
+def fetch_ordered(fetch: Callable[[Any], Any], args: Iterable[Any], concurrency: int) -> Iterator[Any]:
+    """Yield ``fetch(arg)`` for each arg, running at most `concurrency` calls at once.
+
+    Results come back in argument order as soon as each one (and everything
+    before it) is done, so callers can stream them. Closing the iterator early
+    cancels the calls that have not started yet.
+    """
+    concurrency = max(1, concurrency)
+    args = iter(args)
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        pending = deque(executor.submit(fetch, arg) for arg in islice(args, concurrency))
+        while pending:
+            result = pending.popleft().result()
+            pending.extend(executor.submit(fetch, arg) for arg in islice(args, 1))
+            yield result
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+AZURE_PROVIDERS = ("azure", "azuredevops", "azure-devops")
+
+
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    """Parse a tracker timestamp (Jira ``...+0530``, Azure ``...Z``); naive values are taken as UTC."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+# Tracker workflow states (Jira status categories and names, Azure states)
+_STATUS_BY_NAME = {
+    "new": BugStatus.open,
+    "open": BugStatus.open,
+    "to do": BugStatus.open,
+    "proposed": BugStatus.open,
+    "reopened": BugStatus.open,
+    "triaged": BugStatus.triaged,
+    "approved": BugStatus.triaged,
+    "indeterminate": BugStatus.in_progress,
+    "in progress": BugStatus.in_progress,
+    "active": BugStatus.in_progress,
+    "committed": BugStatus.in_progress,
+    "resolved": BugStatus.resolved,
+    "done": BugStatus.resolved,
+    "closed": BugStatus.closed,
+    "removed": BugStatus.closed,
+}
+
+
+def bug_status(*names: Any) -> BugStatus:
+    """Map the first known tracker state in `names` onto BugStatus (open if none is known)."""
+    for name in names:
+        status = _STATUS_BY_NAME.get(str(name or "").strip().lower())
+        if status is not None:
+            return status
+    return BugStatus.open
+
+
+def mapped_bug(
+    id: Any,
+    title: Any,
+    description: Any,
+    updated: Any,
+    severity: Any = None,
+    status: BugStatus = BugStatus.open,
+    related_requirements: Optional[List[str]] = None,
+    redact: bool = True,
+    source: Optional[str] = None,
+) -> BugItem:
+    """Map tracker fields onto a BugItem; `redact=False` leaves the description for redacted_page().
+
+    `source` names the tracker instance (see ``jira_source``/``azure_source``)
+    and prefixes the id, so equal keys from different sites stay distinct.
+    """
+    fields: Dict[str, Any] = {
+        "title": title or "",
+        "description": redact_pii(description or "") if redact else description or "",
+        "updated_at": parse_timestamp(updated),
+        "severity": str(severity) if severity else None,
+        "status": status,
+        "related_requirements": [str(r) for r in related_requirements or []],
+    }
+    if id is not None:
+        fields["id"] = f"{source}:{id}" if source else str(id)
+    return BugItem(**fields)
+
+
+def jira_search(config: Dict) -> Optional[Tuple[str, Tuple[str, str]]]:
+    """Return the Jira search URL and basic auth from `config`/env, or None if not configured."""
+    base = config.get("base_url") or os.getenv("JIRA_BASE_URL")
+    email = config.get("email") or os.getenv("JIRA_EMAIL")
+    token = config.get("api_token") or os.getenv("JIRA_API_TOKEN")
+    if not base or not token or not email:
+        return None
+    return f"{base}/rest/api/2/search", (email, token)
+
+
+def jira_source(url: str) -> str:
+    """Id namespace of the Jira site serving `url`: ``jira:<host>``."""
+    return f"jira:{urlsplit(url).netloc.lower()}"
+
+
+def jira_page_params(start_at: int, limit: int, since: Optional[datetime] = None) -> Dict[str, Any]:
+    """Search parameters for one page; with `since`, only bugs updated from then on, oldest first.
+
+    JQL compares dates in the API user's time zone at minute precision, so
+    `since` is formatted in its own offset (watermarks keep the offset Jira
+    reported) and the boundary minute is fetched again. Its bugs up to
+    `since` are dropped by the caller, so with `since` pages are not capped
+    at `limit`.
+    """
+    if since is None:
+        jql = "issuetype=Bug ORDER BY updated DESC"
+    else:
+        jql = f'issuetype=Bug AND updated >= "{since.strftime("%Y/%m/%d %H:%M")}" ORDER BY updated ASC'
+    return {
+        "jql": jql,
+        "startAt": start_at,
+        "maxResults": JIRA_PAGE_SIZE if since is not None else min(JIRA_PAGE_SIZE, limit - start_at),
+        "fields": JIRA_FIELDS,
+    }
+
+
+def jira_next_offsets(first: dict, limit: int) -> range:
+    """Offsets of the search pages still to fetch after the first one."""
+    total = min(limit, int(first.get("total", 0)))
+    # The server reports the page size it actually used
+    step = int(first.get("maxResults") or len(first.get("issues", [])))
+    return range(step, total, step) if step > 0 else range(0)
+
+
+def jira_bugs(data: dict, redact: bool = True, source: Optional[str] = None) -> Iterator[BugItem]:
+    for it in data.get("issues", []):
+        fields = it.get("fields", {})
+        status = fields.get("status") or {}
+        yield mapped_bug(
+            it.get("key"),
+            fields.get("summary"),
+            fields.get("description"),
+            fields.get("updated"),
+            severity=(fields.get("priority") or {}).get("name"),
+            status=bug_status(status.get("name"), (status.get("statusCategory") or {}).get("key")),
+            redact=redact,
+            source=source,
+        )
+
+
+def azure_api(config: Dict, project: str) -> Optional[Tuple[str, Tuple[str, str]]]:
+    """Return the Azure DevOps WIT API root and PAT auth from `config`/env, or None if not configured."""
+    org = config.get("org") or os.getenv("AZURE_ORG")
+    pat = config.get("pat") or os.getenv("AZURE_DEVOPS_PAT")
+    if not org or not pat or not project:
+        return None
+    return f"https://dev.azure.com/{org}/{project}/_apis/wit", ("", pat)
+
+
+def azure_source(api: str) -> str:
+    """Id namespace of the Azure DevOps organization of `api`: ``azure:<org>``.
+
+    Work item ids are unique per organization, across its projects.
+    """
+    return f"azure:{urlsplit(api).path.split('/')[1].lower()}"
+
+
+def azure_wiql(project: str, since: Optional[datetime] = None) -> Dict[str, str]:
+    """WIQL for the project's bugs; with `since`, only those changed from then on, oldest first."""
+    where = f"[System.WorkItemType] = 'Bug' AND [System.TeamProject] = '{project}'"
+    order = "DESC"
+    if since is not None:
+        changed = since.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        where += f" AND [System.ChangedDate] >= '{changed}'"
+        order = "ASC"
+    return {"query": f"Select [System.Id] From WorkItems Where {where} ORDER BY [System.ChangedDate] {order}"}
+
+
+def azure_wiql_params(limit: int, since: Optional[datetime] = None) -> Dict[str, Any]:
+    params: Dict[str, Any] = {"api-version": "6.0", "$top": limit}
+    if since is not None:
+        # Without timePrecision WIQL compares dates only
+        params["timePrecision"] = "true"
+    return params
+
+
+def azure_chunks(data: dict, limit: int) -> List[List[int]]:
+    """Split the ids of a WIQL result into workitemsbatch-sized chunks."""
+    ids = [int(i["id"]) for i in data.get("workItems", [])][:limit]
+    return [ids[i:i + AZURE_BATCH_SIZE] for i in range(0, len(ids), AZURE_BATCH_SIZE)]
+
+
+def azure_batch_body(chunk: List[int]) -> Dict[str, Any]:
+    return {"ids": chunk, "fields": AZURE_FIELDS, "errorPolicy": "omit"}
+
+
+def azure_bugs(data: dict, redact: bool = True, source: Optional[str] = None) -> Iterator[BugItem]:
+    for it in data.get("value") or []:
+        # errorPolicy=omit returns null for deleted or inaccessible items
+        if not it:
+            continue
+        fields = it.get("fields", {})
+        yield mapped_bug(
+            it.get("id", fields.get("System.Id")),
+            fields.get("System.Title"),
+            fields.get("System.Description"),
+            fields.get("System.ChangedDate"),
+            severity=fields.get("Microsoft.VSTS.Common.Severity"),
+            status=bug_status(fields.get("System.State")),
+            redact=redact,
+            source=source,
+        )
+
+
+def is_new(bug: BugItem, since: Optional[datetime], seen: AbstractSet[str] = frozenset()) -> bool:
+    """Whether `bug` changed after `since`, or at `since` without having been mined then (`seen`)."""
+    if since is None:
+        return True
+    if bug.updated_at is None or bug.updated_at < since:
+        return False
+    return bug.updated_at > since or bug.id not in seen
+
+
+def changed_since(bugs: Iterable[BugItem], since: Optional[datetime], seen: AbstractSet[str] = frozenset()) -> Iterator[BugItem]:
+    for bug in bugs:
+        if is_new(bug, since, seen):
+            yield bug
+
+
+# Characters read from a mock bug dump at a time
+MOCK_READ_CHUNK = int(os.getenv("MOCK_READ_CHUNK", str(1 << 20)))
+# Bugs parsed per worker-thread hop when a dump is streamed from async code
+MOCK_PAGE_SIZE = int(os.getenv("MOCK_PAGE_SIZE", "500"))
+
+_JSON_WS_RE = re.compile(r"[ \t\n\r]*")
+_JSON_DECODER = json.JSONDecoder()
+
+
+class JsonStream:
+    """Pulls JSON values one at a time from a text file, keeping only the current one in memory."""
+
+    def __init__(self, fh, chunk_size: int = MOCK_READ_CHUNK):
+        self.fh = fh
+        self.chunk_size = max(1, chunk_size)
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, at_least: int = 0) -> bool:
+        """Drop the consumed prefix and read more; False at end of file."""
+        if self.eof:
+            return False
+        data = self.fh.read(max(self.chunk_size, at_least))
+        if not data:
+            # Positions into the buffer stay valid when nothing was read
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """The next non-whitespace character ('' at end of file), not consumed."""
+        while True:
+            self.pos = _JSON_WS_RE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} in JSON stream")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode the next complete value, reading (doubling the buffer) until it is whole."""
+        self.peek()
+        while True:
+            try:
+                value, end = _JSON_DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill(len(self.buf)):
+                    raise
+                continue
+            # A number near the end of the buffer may go on in the next chunk:
+            # "1." or "1e+" decode as 1, leaving the rest unread
+            if len(self.buf) - end <= 2 and not isinstance(value, (dict, list, str)) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_array(fh, key: str, chunk_size: int = MOCK_READ_CHUNK) -> Iterator[Any]:
+    """Yield the items of the array under top-level `key` of a JSON object, one at a time.
+
+    Like ijson's ``items(fh, f"{key}.item")``: other top-level values are
+    decoded and dropped, and nothing after the array is read.
+    """
+    stream = JsonStream(fh, chunk_size)
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        name = stream.value()
+        stream.expect(":")
+        if name == key:
+            stream.expect("[")
+            if stream.peek() == "]":
+                return
+            while True:
+                yield stream.value()
+                sep = stream.peek()
+                if sep == "]":
+                    return
+                if sep != ",":
+                    raise ValueError("Expected ',' or ']' in JSON array")
+                stream.pos += 1
+        stream.value()
+        sep = stream.peek()
+        if sep == "}":
+            return
+        if sep != ",":
+            raise ValueError("Expected ',' or '}' in JSON object")
+        stream.pos += 1
+
+
+def iter_mock_bugs(path: str) -> Iterator[BugItem]:
+    """Stream the bugs of a local JSON export (``{"bugs": [...]}``) lazily.
+
+    Only the bug being parsed is held in memory, so exports of any size can
+    be replayed and a caller that stops early reads no further. A file that
+    cannot be opened yields no bugs; one that turns out to be malformed
+    raises ValueError after the bugs before the damage, so a truncated
+    export is not mistaken for a complete one.
+    """
+    try:
+        fh = open(path, 'r', encoding='utf-8')
+    except OSError:
+        return
+    with fh:
+        try:
+            for it in iter_json_array(fh, 'bugs'):
+                yield mapped_bug(
+                    it.get('id'),
+                    it.get('title'),
+                    it.get('description'),
+                    it.get('updated_at'),
+                    severity=it.get('severity'),
+                    status=bug_status(it.get('status')),
+                    related_requirements=it.get('related_requirements'),
+                )
+        except (ValueError, AttributeError) as exc:
+            raise ValueError(f"Malformed bug export {path}: {exc}") from exc
+
+
+def load_mock_bugs(path: str) -> List[BugItem]:
+    """Read all bugs of a local JSON export; see iter_mock_bugs."""
+    return list(iter_mock_bugs(path))
 
 
 class BugMinerAgent:
@@ -20,77 +471,998 @@ class BugMinerAgent:
     Config examples (config dict):
       - Jira: {"provider": "jira", "base_url": "https://yourorg.atlassian.net", "email": "x@org", "api_token": "..."}
       - Azure DevOps: {"provider": "azure", "org": "org", "project": "proj", "pat": "..."}
+
+    All agents share the pooled session from get_http_session() unless one
+    is passed in, so connections stay alive across requests.
+
+    The service endpoints mine through AsyncBugMinerAgent; this blocking
+    agent is kept for library use (scripts, notebooks, other services).
     """
 
-    def __init__(self, provider: str = "jira", config: Optional[Dict] = None, mock: bool = False, mock_file: str | None = None):
+    def __init__(
+        self,
+        provider: str = "jira",
+        config: Optional[Dict] = None,
+        mock: bool = False,
+        mock_file: str | None = None,
+        session: Optional[requests.Session] = None,
+    ):
         self.provider = provider.lower()
         self.config = config or {}
         self.mock = mock
         self.mock_file = mock_file
+        self.session = session or get_http_session()
+
+    def fetch_recent_bugs(self, project: str = "", limit: int = 50, since: Optional[datetime] = None) -> List[BugItem]:
+        """Fetch the latest `limit` bugs, or with `since` the next `limit` changed from then on.
 
-    def fetch_recent_bugs(self, project: str = "", limit: int = 50) -> List[BugItem]:
+        Jira and Azure DevOps are read over the pooled session; any other
+        registered provider plugin is run on a private event loop.
+        """
         # In mock mode, read from a local JSON file if provided
         if self.mock and self.mock_file:
-            try:
-                import json
-                with open(self.mock_file, 'r', encoding='utf-8') as fh:
-                    data = json.load(fh)
-                items: List[BugItem] = []
-                for it in data.get('bugs', []):
-                    items.append(BugItem(title=it.get('title',''), description=redact_pii(it.get('description',''))))
-                return items
-            except Exception:
-                return []
+            return list(islice(changed_since(iter_mock_bugs(self.mock_file), since), max(0, limit)))
 
         if self.provider == "jira":
-            return self._fetch_jira_issues(limit=limit)
-        if self.provider in ("azure", "azuredevops", "azure-devops"):
-            return self._fetch_azure_work_items(project=project, limit=limit)
+            return list(self.iter_jira_issues(limit=limit, since=since))
+        if self.provider in AZURE_PROVIDERS:
+            return list(self.iter_azure_work_items(project=project, limit=limit, since=since))
+        if self.provider in BUG_PROVIDERS:
+            return asyncio.run(self._fetch_plugin(project, limit, since))
         return []
 
+    async def _fetch_plugin(self, project: str, limit: int, since: Optional[datetime]) -> List[BugItem]:
+        async with build_async_http_client() as client:
+            agent = AsyncBugMinerAgent(self.provider, self.config, client=client)
+            return await agent.fetch_recent_bugs(project=project, limit=limit, since=since)
+
     def _fetch_jira_issues(self, limit: int = 50) -> List[BugItem]:
-        base = self.config.get("base_url") or os.getenv("JIRA_BASE_URL")
-        email = self.config.get("email") or os.getenv("JIRA_EMAIL")
-        token = self.config.get("api_token") or os.getenv("JIRA_API_TOKEN")
-        if not base or not token or not email:
-            return []
-        url = f"{base}/rest/api/2/search"
-        jql = "issuetype=Bug ORDER BY updated DESC"
-        params = {"jql": jql, "maxResults": limit}
-        resp = requests.get(url, params=params, auth=(email, token), timeout=15)
-        resp.raise_for_status()
-        data = resp.json()
-        issues = []
-        for it in data.get("issues", []):
-            fields = it.get("fields", {})
-            issues.append(BugItem(title=fields.get("summary", ""), description=redact_pii(fields.get("description", ""))))
-        return issues
+        return list(self.iter_jira_issues(limit=limit))
+
+    def iter_jira_issues(self, limit: int = 50, since: Optional[datetime] = None) -> Iterator[BugItem]:
+        """Yield up to `limit` Jira bugs, most recently updated first.
+
+        The first search page gives the total; the remaining ``startAt``
+        offsets are then fetched JIRA_PAGE_CONCURRENCY at a time and their
+        issues are yielded in order as the pages arrive.
+        """
+        search = jira_search(self.config)
+        if search is None or limit <= 0:
+            return
+        url, auth = search
+
+        def page(start_at: int) -> dict:
+            resp = self.session.get(url, params=jira_page_params(start_at, limit, since), auth=auth, timeout=15)
+            resp.raise_for_status()
+            return resp.json()
+
+        first = page(0)
+        yield from jira_bugs(first, source=jira_source(url))
+        for data in fetch_ordered(page, jira_next_offsets(first, limit), JIRA_PAGE_CONCURRENCY):
+            yield from jira_bugs(data, source=jira_source(url))
 
     def _fetch_azure_work_items(self, project: str = "", limit: int = 50) -> List[BugItem]:
-        org = self.config.get("org") or os.getenv("AZURE_ORG")
-        pat = self.config.get("pat") or os.getenv("AZURE_DEVOPS_PAT")
-        if not org or not pat or not project:
-            return []
+        return list(self.iter_azure_work_items(project=project, limit=limit))
+
+    def iter_azure_work_items(self, project: str = "", limit: int = 50, since: Optional[datetime] = None) -> Iterator[BugItem]:
+        """Yield up to `limit` Azure DevOps bugs, most recently changed first.
+
+        The WIQL query returns only ids; their fields are then read with the
+        workitemsbatch API in chunks of AZURE_BATCH_SIZE ids, fetched
+        AZURE_BATCH_CONCURRENCY at a time over the shared session.
+        """
+        target = azure_api(self.config, project)
+        if target is None or limit <= 0:
+            return
+        api, auth = target
         # Query Work Items for bugs
-        wiql = {
-            "query": f"Select [System.Id],[System.Title],[System.State] From WorkItems Where [System.WorkItemType] = 'Bug' AND [System.TeamProject] = '{project}' ORDER BY [System.ChangedDate] DESC"
+        resp = self.session.post(f"{api}/wiql", params=azure_wiql_params(limit, since), json=azure_wiql(project, since), auth=auth, timeout=15)
+        resp.raise_for_status()
+
+        def batch(chunk: List[int]) -> dict:
+            resp = self.session.post(f"{api}/workitemsbatch", params={"api-version": "6.0"}, json=azure_batch_body(chunk), auth=auth, timeout=15)
+            resp.raise_for_status()
+            return resp.json()
+
+        for data in fetch_ordered(batch, azure_chunks(resp.json(), limit), AZURE_BATCH_CONCURRENCY):
+            yield from azure_bugs(data, source=azure_source(api))
+
+
+async def fetch_ordered_async(
+    fetch: Callable[[Any], Awaitable[Any]], args: Iterable[Any], concurrency: int
+) -> AsyncIterator[Any]:
+    """Async counterpart of fetch_ordered: at most `concurrency` awaits in flight, results in order."""
+    concurrency = max(1, concurrency)
+    args = iter(args)
+    pending = deque(asyncio.ensure_future(fetch(arg)) for arg in islice(args, concurrency))
+    try:
+        while pending:
+            result = await pending.popleft()
+            pending.extend(asyncio.ensure_future(fetch(arg)) for arg in islice(args, 1))
+            yield result
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+# httpx clients cannot be shared between event loops, so there is one per loop
+_async_http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def build_async_http_client(pool_size: int = HTTP_POOL_SIZE, retries: int = HTTP_RETRIES) -> httpx.AsyncClient:
+    """Create an httpx client with a keep-alive pool; connection failures are retried."""
+    limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+    transport = httpx.AsyncHTTPTransport(retries=retries, limits=limits)
+    return httpx.AsyncClient(transport=transport, limits=limits, timeout=15)
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Return the async client shared by all async agents on the running loop, creating it once."""
+    loop = asyncio.get_running_loop()
+    with _http_session_lock:
+        client = _async_http_clients.get(loop)
+        if client is None or client.is_closed:
+            client = _async_http_clients[loop] = build_async_http_client()
+        return client
+
+
+async def close_async_http_client() -> None:
+    """Close the running loop's shared async client, if it was created."""
+    with _http_session_lock:
+        client = _async_http_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+# Requests per second and burst allowed per provider host (0: no fixed rate,
+# rely on Retry-After and the adaptive concurrency limit)
+PROVIDER_RATE = float(os.getenv("PROVIDER_RATE", "0"))
+PROVIDER_BURST = int(os.getenv("PROVIDER_BURST", "20"))
+# Upper bound of the adaptive number of requests in flight per host
+PROVIDER_MAX_CONCURRENCY = int(os.getenv("PROVIDER_MAX_CONCURRENCY", "16"))
+# Responses slower than this (seconds) shrink the concurrency limit
+PROVIDER_LATENCY_TARGET = float(os.getenv("PROVIDER_LATENCY_TARGET", "2.0"))
+# Retries of a throttled (429/503), failed (5xx) or unreachable request
+PROVIDER_MAX_RETRIES = int(os.getenv("PROVIDER_MAX_RETRIES", "6"))
+
+_THROTTLED = (429, 503)
+_RETRYABLE = (429, 500, 502, 503, 504)
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delay-seconds or HTTP-date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def _backoff(attempt: int) -> float:
+    return min(60.0, HTTP_BACKOFF * (2 ** attempt))
+
+
+class HostScheduler:
+    """Paces the requests sent to one provider host.
+
+    A token bucket allows `rate` requests per second in bursts of `burst`.
+    On top of it, the number of requests in flight follows an AIMD limit:
+    it grows by about one per round of fast successes, halves on throttling
+    or server errors, and shrinks by a quarter when latency exceeds
+    `latency_target`. A Retry-After pauses the whole host, so every run
+    mining it backs off together.
+    """
+
+    def __init__(
+        self,
+        rate: float = PROVIDER_RATE,
+        burst: int = PROVIDER_BURST,
+        max_concurrency: int = PROVIDER_MAX_CONCURRENCY,
+        latency_target: float = PROVIDER_LATENCY_TARGET,
+    ):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_concurrency = max(1, max_concurrency)
+        self.latency_target = latency_target
+        self.limit = float(min(4, self.max_concurrency))
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self._tokens = float(self.burst)
+        self._stamp = time.monotonic()
+        self._waiters: set = set()
+
+    def _try_acquire(self) -> Optional[float]:
+        """Take a slot and a token: 0.0 on success, else seconds to wait (None: until a release)."""
+        if self.in_flight >= int(self.limit):
+            return None
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            if self._tokens < 1:
+                return (1 - self._tokens) / self.rate
+            self._tokens -= 1
+        self.in_flight += 1
+        self.requests += 1
+        return 0.0
+
+    async def acquire(self) -> None:
+        while True:
+            wait = self._try_acquire()
+            if wait == 0.0:
+                return
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.add(waiter)
+            try:
+                await asyncio.wait({waiter}, timeout=wait)
+            finally:
+                self._waiters.discard(waiter)
+                waiter.cancel()
+
+    def release(self, status: Optional[int], latency: float, pause: Optional[float] = None) -> None:
+        """Return a slot and adapt to the outcome (`status` None: the request did not complete)."""
+        self.in_flight -= 1
+        if status is None or status in _RETRYABLE:
+            self.limit = max(1.0, self.limit / 2)
+            if status in _THROTTLED:
+                self.throttled += 1
+            else:
+                self.errors += 1
+            if pause:
+                self.paused_until = max(self.paused_until, time.monotonic() + pause)
+        elif latency > self.latency_target:
+            self.limit = max(1.0, self.limit * 0.75)
+        else:
+            self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "errors": self.errors,
         }
-        headers = {"Content-Type": "application/json"}
-        resp = requests.post(f"https://dev.azure.com/{org}/{project}/_apis/wit/wiql?api-version=6.0", json=wiql, headers=headers, auth=("", pat), timeout=15)
+
+
+# Schedulers hold asyncio futures, so like the clients there is a set per event loop
+_host_schedulers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, HostScheduler]]" = weakref.WeakKeyDictionary()
+
+
+def get_host_scheduler(url: str) -> HostScheduler:
+    """Return the scheduler shared by every request to the host of `url` on the running loop."""
+    parsed = httpx.URL(url)
+    host = f"{parsed.scheme}://{parsed.netloc.decode('ascii')}"
+    schedulers = _host_schedulers.setdefault(asyncio.get_running_loop(), {})
+    scheduler = schedulers.get(host)
+    if scheduler is None:
+        scheduler = schedulers[host] = HostScheduler()
+    return scheduler
+
+
+async def scheduled_request(client: httpx.AsyncClient, method: str, url: str, **kwargs: Any) -> httpx.Response:
+    """Send a provider request through its host's scheduler, retrying throttled and failed attempts.
+
+    429/503 responses pause the host for their Retry-After (or an
+    exponential backoff); other 5xx responses and transport errors are
+    retried after a backoff. After PROVIDER_MAX_RETRIES the last response
+    is returned (or the transport error raised).
+    """
+    scheduler = get_host_scheduler(url)
+    attempt = 0
+    while True:
+        await scheduler.acquire()
+        start = time.monotonic()
+        status: Optional[int] = None
+        pause: Optional[float] = None
+        try:
+            resp = await client.request(method, url, **kwargs)
+            status = resp.status_code
+            if status in _THROTTLED:
+                pause = retry_after_seconds(resp.headers.get("Retry-After"))
+                if pause is None:
+                    pause = _backoff(attempt)
+        except httpx.TransportError:
+            if attempt == PROVIDER_MAX_RETRIES:
+                raise
+            resp = None
+        finally:
+            scheduler.release(status, time.monotonic() - start, pause)
+        if resp is not None and (status not in _RETRYABLE or attempt == PROVIDER_MAX_RETRIES):
+            return resp
+        if pause is None:
+            await asyncio.sleep(_backoff(attempt))
+        attempt += 1
+
+
+class BugQuery(NamedTuple):
+    """What a bug source plugin is asked for."""
+
+    client: httpx.AsyncClient
+    config: Dict
+    project: str
+    limit: int
+    since: Optional[datetime]
+    # Ids of the bugs updated exactly at `since` that were mined already
+    seen: AbstractSet[str] = frozenset()
+
+
+# A bug source plugin yields pages of BugItems (most recent first, or oldest
+# first from `since`) and stops after `limit` bugs; with `since` it skips the
+# bugs that are not is_new() without counting them against `limit`
+BugPages = Callable[[BugQuery], AsyncIterator[List[BugItem]]]
+
+# provider name -> plugin
+BUG_PROVIDERS: Dict[str, BugPages] = {}
+
+
+def register_provider(*names: str) -> Callable[[BugPages], BugPages]:
+    """Register an async page iterator as the bug source for the provider `names`."""
+    def decorator(pages: BugPages) -> BugPages:
+        for name in names:
+            BUG_PROVIDERS[name.lower()] = pages
+        return pages
+    return decorator
+
+
+async def redacted_page(bugs: List[BugItem]) -> List[BugItem]:
+    """Redact the descriptions of a page of bugs without tying up the event loop."""
+    descriptions = await redact_pii_many_async([bug.description or "" for bug in bugs])
+    for bug, description in zip(bugs, descriptions):
+        bug.description = description
+    return bugs
+
+
+@register_provider("jira")
+async def jira_pages(query: BugQuery) -> AsyncIterator[List[BugItem]]:
+    search = jira_search(query.config)
+    if search is None or query.limit <= 0:
+        return
+    url, auth = search
+
+    async def page(start_at: int) -> dict:
+        resp = await scheduled_request(query.client, "GET", url, params=jira_page_params(start_at, query.limit, query.since), auth=auth)
         resp.raise_for_status()
-        data = resp.json()
-        ids = [str(i["id"]) for i in data.get("workItems", [])][:limit]
-        if not ids:
-            return []
-        ids_str = ",".join(ids)
-        resp2 = requests.get(f"https://dev.azure.com/{org}/{project}/_apis/wit/workitems?ids={ids_str}&api-version=6.0", auth=("", pat), timeout=15)
-        resp2.raise_for_status()
-        data2 = resp2.json()
-        items = []
-        for it in data2.get("value", []):
-            fields = it.get("fields", {})
-            items.append(BugItem(title=fields.get("System.Title", ""), description=redact_pii(fields.get("System.Description", ""))))
-        return items
+        return resp.json()
+
+    first = await page(0)
+    # With `since`, every page of the search may be needed to find `limit` new bugs
+    total = query.limit if query.since is None else int(first.get("total", 0))
+    pages = fetch_ordered_async(page, jira_next_offsets(first, total), JIRA_PAGE_CONCURRENCY)
+    remaining = query.limit
+    data: Optional[dict] = first
+    try:
+        while data is not None and remaining > 0:
+            bugs = [bug for bug in jira_bugs(data, redact=False, source=jira_source(url)) if is_new(bug, query.since, query.seen)][:remaining]
+            if bugs:
+                remaining -= len(bugs)
+                yield await redacted_page(bugs)
+            data = await anext(pages, None)
+    finally:
+        await pages.aclose()
+
+
+@register_provider(*AZURE_PROVIDERS)
+async def azure_pages(query: BugQuery) -> AsyncIterator[List[BugItem]]:
+    target = azure_api(query.config, query.project)
+    if target is None or query.limit <= 0:
+        return
+    api, auth = target
+    # WIQL compares `since` exactly, so only the bugs already seen at `since` come back again
+    top = query.limit + len(query.seen)
+    resp = await scheduled_request(
+        query.client, "POST", f"{api}/wiql", params=azure_wiql_params(top, query.since), json=azure_wiql(query.project, query.since), auth=auth
+    )
+    resp.raise_for_status()
+
+    async def batch(chunk: List[int]) -> dict:
+        resp = await scheduled_request(
+            query.client, "POST", f"{api}/workitemsbatch", params={"api-version": "6.0"}, json=azure_batch_body(chunk), auth=auth
+        )
+        resp.raise_for_status()
+        return resp.json()
+
+    remaining = query.limit
+    async for data in fetch_ordered_async(batch, azure_chunks(resp.json(), top), AZURE_BATCH_CONCURRENCY):
+        bugs = [bug for bug in azure_bugs(data, redact=False, source=azure_source(api)) if is_new(bug, query.since, query.seen)][:remaining]
+        if bugs:
+            remaining -= len(bugs)
+            yield await redacted_page(bugs)
+        if remaining <= 0:
+            return
+
+
+@register_provider("mock")
+async def mock_pages(query: BugQuery) -> AsyncIterator[List[BugItem]]:
+    """Bugs of the local JSON export at ``config["mock_file"]``, parsed lazily on a worker thread."""
+    path = query.config.get("mock_file")
+    if not path:
+        return
+    stream = iter_mock_bugs(path)
+    bugs = islice(changed_since(stream, query.since, query.seen), max(0, query.limit))
+
+    def next_page() -> Tuple[List[BugItem], Optional[Exception]]:
+        # The bugs before a malformed part of the file are delivered first
+        page: List[BugItem] = []
+        try:
+            for bug in islice(bugs, MOCK_PAGE_SIZE):
+                page.append(bug)
+        except ValueError as exc:
+            return page, exc
+        return page, None
+
+    try:
+        while True:
+            page, error = await asyncio.to_thread(next_page)
+            if page:
+                yield page
+            if error is not None:
+                raise error
+            if not page:
+                return
+    finally:
+        try:
+            stream.close()
+        except ValueError:
+            # Cancelled while a worker thread was still parsing; it is closed when collected
+            pass
+
+
+class AsyncBugMinerAgent:
+    """BugMinerAgent on httpx/asyncio: pages and batches are awaited, not run on threads.
+
+    Takes the same provider/config/mock settings and reads bugs through the
+    plugin registered for the provider (BUG_PROVIDERS). Bugs are yielded as
+    they arrive, and several agents can be mined at once with
+    mine_concurrently().
+    """
+
+    def __init__(
+        self,
+        provider: str = "jira",
+        config: Optional[Dict] = None,
+        mock: bool = False,
+        mock_file: str | None = None,
+        client: Optional[httpx.AsyncClient] = None,
+    ):
+        self.provider = provider.lower()
+        self.config = config or {}
+        self.mock = mock
+        self.mock_file = mock_file
+        self._client = client
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._client or get_async_http_client()
+
+    async def fetch_recent_bugs(
+        self, project: str = "", limit: int = 50, since: Optional[datetime] = None, seen: Iterable[str] = ()
+    ) -> List[BugItem]:
+        return [bug async for bug in self.iter_recent_bugs(project=project, limit=limit, since=since, seen=seen)]
+
+    async def iter_recent_bugs(
+        self, project: str = "", limit: int = 50, since: Optional[datetime] = None, seen: Iterable[str] = ()
+    ) -> AsyncIterator[BugItem]:
+        async for page in self.iter_pages(project=project, limit=limit, since=since, seen=seen):
+            for bug in page:
+                yield bug
+
+    async def iter_pages(
+        self, project: str = "", limit: int = 50, since: Optional[datetime] = None, seen: Iterable[str] = ()
+    ) -> AsyncIterator[List[BugItem]]:
+        """Yield pages of bugs from the provider's plugin; nothing for an unknown provider.
+
+        With `since`, only bugs changed after it, or at it and not in `seen`, are returned.
+        """
+        config = self.config
+        provider = self.provider
+        # In mock mode, read from a local JSON file if provided
+        if self.mock and self.mock_file:
+            provider, config = "mock", dict(config, mock_file=self.mock_file)
+        pages = BUG_PROVIDERS.get(provider)
+        if pages is None:
+            return
+        async for page in pages(BugQuery(self.client, config, project, limit, since, frozenset(seen))):
+            yield page
+
+
+async def mine_concurrently(
+    sources: List[AsyncIterator[BugItem]], buffer: int = 1000
+) -> AsyncIterator[Tuple[int, Union[BugItem, Exception]]]:
+    """Consume several bug streams (e.g. ``agent.iter_recent_bugs(...)``) at the same time.
+
+    Yields ``(source index, bug)`` as bugs arrive from any source, and
+    ``(source index, exception)`` when a source fails; the other sources
+    carry on. At most `buffer` bugs are held when the consumer is slower.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=buffer)
+    done = object()
+
+    async def pump(index: int, source: AsyncIterator[BugItem]) -> None:
+        try:
+            async for bug in source:
+                await queue.put((index, bug))
+        except Exception as exc:
+            await queue.put((index, exc))
+        finally:
+            await queue.put((index, done))
+
+    tasks = [asyncio.create_task(pump(i, source)) for i, source in enumerate(sources)]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            index, item = await queue.get()
+            if item is done:
+                remaining -= 1
+            else:
+                yield index, item
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+# Watermarks of incremental mining, one JSON file per source
+BUGMINER_STATE_DIR = os.getenv("BUGMINER_STATE_DIR", ".bugminer")
+# Incremental runs store their bugs and save their watermark after this many bugs
+SOURCE_CHECKPOINT_BUGS = int(os.getenv("SOURCE_CHECKPOINT_BUGS", "1000"))
+
+
+class SourceCache:
+    """Watermark of one provider/project, persisted as JSON.
+
+    The watermark is the latest ``updated_at`` merged so far, and `seen`
+    the ids of the bugs merged at exactly that time; the next run asks the
+    provider only for bugs changed after it, or at it and not seen yet. The
+    bugs themselves are kept in the bug store.
+    """
+
+    def __init__(self, path: str, watermark: Optional[datetime] = None, seen: Iterable[str] = ()):
+        self.path = path
+        self.watermark = watermark
+        self.seen = set(seen)
+
+    @staticmethod
+    def path_for(provider: str, config: Optional[Dict], project: str, directory: Optional[str] = None) -> str:
+        config = config or {}
+        if provider in AZURE_PROVIDERS:
+            provider = "azure"
+        if provider == "jira":
+            host = config.get("base_url") or os.getenv("JIRA_BASE_URL")
+        else:
+            host = config.get("org") or os.getenv("AZURE_ORG")
+        digest = hashlib.sha1(f"{host or ''}|{project}".encode("utf-8")).hexdigest()[:16]
+        return os.path.join(directory or BUGMINER_STATE_DIR, f"{provider}-{digest}.json")
+
+    @classmethod
+    def load(cls, path: str) -> "SourceCache":
+        if not os.path.exists(path):
+            return cls(path)
+        with open(path, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+        return cls(path, parse_timestamp(data.get("watermark")), data.get("seen", ()))
+
+    def merge(self, bug: BugItem) -> None:
+        if bug.updated_at is None:
+            return
+        if self.watermark is None or bug.updated_at > self.watermark:
+            self.watermark = bug.updated_at
+            self.seen = {bug.id}
+        elif bug.updated_at == self.watermark:
+            self.seen.add(bug.id)
+
+    def update(self, other: "SourceCache") -> None:
+        """Merge the watermark of `other` (e.g. the one saved by another run)."""
+        if other.watermark is None:
+            return
+        if self.watermark is None or other.watermark > self.watermark:
+            self.watermark, self.seen = other.watermark, set(other.seen)
+        elif other.watermark == self.watermark:
+            self.seen |= other.seen
+
+    def save(self) -> None:
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        data = {"watermark": self.watermark.isoformat() if self.watermark else None, "seen": sorted(self.seen)}
+        # A temp file of its own, so concurrent saves never write into each other's
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=os.path.basename(self.path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                json.dump(data, fh)
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+# Runs of the same source are serialized; asyncio locks belong to one event loop
+_source_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Lock]]" = weakref.WeakKeyDictionary()
+
+
+def source_lock(path: str) -> asyncio.Lock:
+    """Return the lock of the source whose watermark is kept at `path`, on the running loop."""
+    locks = _source_locks.setdefault(asyncio.get_running_loop(), {})
+    lock = locks.get(path)
+    if lock is None:
+        lock = locks[path] = asyncio.Lock()
+    return lock
+
+
+async def iter_incremental(
+    agent: AsyncBugMinerAgent,
+    cache: SourceCache,
+    project: str = "",
+    limit: int = 50,
+    store: Optional[BugStore] = None,
+) -> AsyncIterator[BugItem]:
+    """Yield the bugs changed since the cache watermark, merging them into the cache.
+
+    A source without a watermark starts from its latest `limit` bugs, newest
+    first, so its watermark is only saved once that first run completes.
+    After that, changes come oldest first, so the watermark is saved even
+    when the run stops early: the next run resumes from the last bug merged.
+    Bugs already merged at the watermark are not returned again, so however
+    many bugs share one timestamp (or one Jira minute), every run advances.
+    Bugs are written to `store` (if given) before each watermark save, every
+    SOURCE_CHECKPOINT_BUGS bugs and at the end, so the watermark never gets
+    ahead of the stored bugs. Concurrent runs of one source wait for each
+    other, and each starts from the watermark the previous one saved.
+    """
+    async with source_lock(cache.path):
+        # Pick up what a run that held the lock before this one saved
+        cache.update(await asyncio.to_thread(SourceCache.load, cache.path))
+        first_run = cache.watermark is None
+        since, seen = cache.watermark, frozenset(cache.seen)
+        complete = False
+        batch: List[BugItem] = []
+        try:
+            async for bug in agent.iter_recent_bugs(project=project, limit=limit, since=since, seen=seen):
+                cache.merge(bug)
+                batch.append(bug)
+                if len(batch) >= SOURCE_CHECKPOINT_BUGS:
+                    if store is not None:
+                        await asyncio.to_thread(store.upsert, batch)
+                    batch = []
+                    if not first_run:
+                        await asyncio.to_thread(cache.save)
+                yield bug
+            complete = True
+        finally:
+            # Keep what was mined even when the consumer stops early
+            if store is not None:
+                store.upsert(batch)
+            if complete or not first_run:
+                cache.save()
+
+
+# SQLite file holding every mined bug; ":memory:" keeps them for the process only
+BUG_STORE_PATH = os.getenv("BUG_STORE_PATH", os.path.join(BUGMINER_STATE_DIR, "bugs.db"))
+# Bugs written per transaction while a mining stream is consumed
+BUG_STORE_BATCH = int(os.getenv("BUG_STORE_BATCH", "500"))
+
+_BUG_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bugs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    severity TEXT,
+    updated_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS bugs_status ON bugs (status);
+CREATE INDEX IF NOT EXISTS bugs_severity ON bugs (severity);
+CREATE TABLE IF NOT EXISTS bug_requirements (
+    requirement TEXT NOT NULL,
+    bug_id TEXT NOT NULL REFERENCES bugs (id) ON DELETE CASCADE,
+    PRIMARY KEY (requirement, bug_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS bug_requirements_bug ON bug_requirements (bug_id);
+"""
+
+
+def _utc_text(moment: Optional[datetime]) -> Optional[str]:
+    """Fixed-width UTC text of `moment` (naive taken as UTC), so the text sorts in time order."""
+    if moment is None:
+        return None
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+class BugStore:
+    """File-backed store of mined bugs keyed by BugItem.id (SQLite).
+
+    Status, severity and related requirements are indexed columns; the full
+    BugItem is kept as JSON. One connection is shared behind a lock, so the
+    store can be used from request threads and worker threads alike.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(_BUG_STORE_SCHEMA)
+            # Rows written with the tracker's UTC offset sort out of order; rewrite them once
+            stale = self._conn.execute("SELECT id, updated_at FROM bugs WHERE updated_at NOT LIKE '%Z'").fetchall()
+            self._conn.executemany(
+                "UPDATE bugs SET updated_at = ? WHERE id = ?",
+                [(_utc_text(datetime.fromisoformat(value)), bug_id) for bug_id, value in stale],
+            )
+
+    def upsert(self, bugs: Iterable[BugItem]) -> int:
+        """Insert or replace `bugs` in one transaction; returns how many were written."""
+        rows = []
+        links = []
+        for bug in bugs:
+            rows.append((bug.id, bug.status.value, bug.severity, _utc_text(bug.updated_at), bug.model_dump_json()))
+            links.extend((req, bug.id) for req in dict.fromkeys(bug.related_requirements))
+        if not rows:
+            return 0
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM bug_requirements WHERE bug_id = ?", [(r[0],) for r in rows])
+            self._conn.executemany(
+                "INSERT INTO bugs (id, status, severity, updated_at, data) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET status = excluded.status, severity = excluded.severity, "
+                "updated_at = excluded.updated_at, data = excluded.data",
+                rows,
+            )
+            self._conn.executemany("INSERT OR IGNORE INTO bug_requirements (requirement, bug_id) VALUES (?, ?)", links)
+        return len(rows)
+
+    def get(self, bug_id: str) -> Optional[BugItem]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM bugs WHERE id = ?", (bug_id,)).fetchone()
+        return BugItem.model_validate_json(row[0]) if row else None
+
+    def delete(self, bug_id: str) -> bool:
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM bugs WHERE id = ?", (bug_id,)).rowcount > 0
+
+    @staticmethod
+    def _where(status: Optional[str], severity: Optional[str], requirement: Optional[str]) -> Tuple[str, List[Any]]:
+        clauses, args = [], []
+        if status is not None:
+            clauses.append("status = ?")
+            args.append(status)
+        if severity is not None:
+            clauses.append("severity = ?")
+            args.append(severity)
+        if requirement is not None:
+            clauses.append("id IN (SELECT bug_id FROM bug_requirements WHERE requirement = ?)")
+            args.append(requirement)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), args
+
+    def query(
+        self,
+        status: Optional[str] = None,
+        severity: Optional[str] = None,
+        requirement: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0,
+    ) -> List[BugItem]:
+        """Bugs matching every given filter, most recently updated first."""
+        where, args = self._where(status, severity, requirement)
+        sql = f"SELECT data FROM bugs{where} ORDER BY updated_at IS NULL, updated_at DESC, id LIMIT ? OFFSET ?"
+        with self._lock:
+            rows = self._conn.execute(sql, args + [limit, offset]).fetchall()
+        return [BugItem.model_validate_json(row[0]) for row in rows]
+
+    def count(self, status: Optional[str] = None, severity: Optional[str] = None, requirement: Optional[str] = None) -> int:
+        where, args = self._where(status, severity, requirement)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM bugs{where}", args).fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_bug_store: Optional[BugStore] = None
+_bug_store_lock = threading.Lock()
+
+
+def get_bug_store() -> BugStore:
+    """Return the process-wide bug store at BUG_STORE_PATH, opening it once."""
+    global _bug_store
+    with _bug_store_lock:
+        if _bug_store is None:
+            _bug_store = BugStore(BUG_STORE_PATH)
+        return _bug_store
+
+
+def close_bug_store() -> None:
+    """Close the process-wide bug store, if it was opened."""
+    global _bug_store
+    with _bug_store_lock:
+        if _bug_store is not None:
+            _bug_store.close()
+            _bug_store = None
+
+
+async def stored(stream: AsyncIterator[BugItem], store: BugStore) -> AsyncIterator[BugItem]:
+    """Pass `stream` through, writing its bugs to `store` in BUG_STORE_BATCH batches."""
+    batch: List[BugItem] = []
+    try:
+        async for bug in stream:
+            batch.append(bug)
+            if len(batch) >= BUG_STORE_BATCH:
+                await asyncio.to_thread(store.upsert, batch)
+                batch = []
+            yield bug
+    finally:
+        # Keep what was mined even when the consumer stops early
+        store.upsert(batch)
+
+
+# Estimated Jaccard similarity of word shingles above which two bugs are duplicates
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.7"))
+# MinHash signature length; LSH bands x rows are chosen to fit it
+DEDUP_PERMUTATIONS = int(os.getenv("DEDUP_PERMUTATIONS", "128"))
+DEDUP_SHINGLE_WORDS = 3
+
+_WORD_RE = re.compile(r"\w+")
+_EMPTY_BIN = 1 << 32
+
+
+def shingles(text: str, size: int = DEDUP_SHINGLE_WORDS) -> List[str]:
+    """Distinct `size`-word shingles of `text` (one shingle for shorter texts)."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) <= size:
+        return [" ".join(words)] if words else []
+    return list({" ".join(words[i:i + size]) for i in range(len(words) - size + 1)})
+
+
+@lru_cache(maxsize=8)
+def _probe_order(num_perm: int) -> Tuple[Tuple[int, ...], ...]:
+    """A fixed pseudo-random order of the other bins for every bin, used to densify signatures."""
+    rnd = random.Random(num_perm)
+    order = []
+    for i in range(num_perm):
+        others = [j for j in range(num_perm) if j != i]
+        rnd.shuffle(others)
+        order.append(tuple(others))
+    return tuple(order)
+
+
+def minhash(items: Iterable[str], num_perm: int = DEDUP_PERMUTATIONS) -> Tuple[int, ...]:
+    """One-permutation MinHash signature of `items`.
+
+    Each item is hashed once into one of `num_perm` bins and the minimum per
+    bin is kept, instead of hashing it under `num_perm` permutations. An
+    empty bin borrows the value of the first filled bin in its own fixed
+    probe order (optimal densification), offset by the probe step so that
+    borrowed and genuine values never collide. The fraction of equal
+    positions estimates the Jaccard similarity.
+    """
+    bins = [_EMPTY_BIN] * num_perm
+    for item in items:
+        # crc32 scrambled by Fibonacci hashing: stable across processes and cheap
+        h = (zlib.crc32(item.encode("utf-8")) * 0x9E3779B1) & 0xFFFFFFFF
+        b, v = h % num_perm, h // num_perm
+        if v < bins[b]:
+            bins[b] = v
+    filled = [i for i, v in enumerate(bins) if v != _EMPTY_BIN]
+    if not filled:
+        return tuple(bins)
+    signature = list(bins)
+    for i, probes in enumerate(_probe_order(num_perm)):
+        if bins[i] == _EMPTY_BIN:
+            for step, j in enumerate(probes, 1):
+                if bins[j] != _EMPTY_BIN:
+                    signature[i] = bins[j] + step * _EMPTY_BIN
+                    break
+    return tuple(signature)
+
+
+def signature_similarity(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+    return sum(map(operator.eq, a, b)) / len(a)
+
+
+@lru_cache(maxsize=64)
+def lsh_bands(threshold: float, num_perm: int, miss_weight: float = 0.9) -> Tuple[int, int]:
+    """(bands, rows) with bands * rows <= num_perm minimising the weighted LSH error.
+
+    The error integrates the chance that a pair below `threshold` shares a
+    bucket (false positive) and that a pair above it shares none (false
+    negative). Candidates are verified against their signatures, so a false
+    positive only costs a comparison and misses are weighted `miss_weight`.
+    """
+    def error(bands: int, rows: int) -> float:
+        total = 0.0
+        for n in range(100):
+            sim = (n + 0.5) / 100
+            p = 1 - (1 - sim ** rows) ** bands
+            total += (1 - p) * miss_weight if sim >= threshold else p * (1 - miss_weight)
+        return total
+
+    return min(((num_perm // rows, rows) for rows in range(1, num_perm + 1)), key=lambda br: error(*br))
+
+
+class BugCluster(BaseModel):
+    representative: BugItem
+    duplicate_ids: List[str] = []
+
+
+class BugDeduplicator:
+    """Clusters near-duplicate bugs with MinHash signatures and LSH buckets.
+
+    Bugs are shingled on their redacted title and description. A new bug is
+    compared only with the representatives sharing one of its LSH band
+    buckets and joins the most similar one at or above `threshold`;
+    otherwise it becomes the representative of a new cluster. Adding n bugs
+    is near-linear, and since the first bug of a cluster stays its
+    representative, bugs can be deduplicated while they stream.
+    """
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD, num_perm: int = DEDUP_PERMUTATIONS):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands, self.rows = lsh_bands(threshold, num_perm)
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+        self._signatures: List[Tuple[int, ...]] = []
+        self._clusters: List[BugCluster] = []
+
+    def signature(self, bug: BugItem) -> Tuple[int, ...]:
+        return minhash(shingles(redact_pii(f"{bug.title}\n{bug.description or ''}")), self.num_perm)
+
+    def add(self, bug: BugItem) -> Optional[BugCluster]:
+        """Add `bug`; returns its new cluster if it is a representative, None if it is a duplicate."""
+        sig = self.signature(bug)
+        keys = [(band, sig[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+        candidates = {c for key in keys for c in self._buckets.get(key, ())}
+        best, best_similarity = None, self.threshold
+        for c in candidates:
+            similarity = signature_similarity(sig, self._signatures[c])
+            if similarity >= best_similarity:
+                best, best_similarity = c, similarity
+        if best is not None:
+            self._clusters[best].duplicate_ids.append(bug.id)
+            return None
+        index = len(self._clusters)
+        cluster = BugCluster(representative=bug)
+        self._clusters.append(cluster)
+        self._signatures.append(sig)
+        for key in keys:
+            self._buckets.setdefault(key, []).append(index)
+        return cluster
+
+    def clusters(self) -> List[BugCluster]:
+        return list(self._clusters)
+
+
+def deduplicate(bugs: Iterable[BugItem], threshold: float = DEDUP_THRESHOLD) -> List[BugCluster]:
+    """Cluster `bugs`; each cluster's representative is its first bug in input order."""
+    dedup = BugDeduplicator(threshold)
+    for bug in bugs:
+        dedup.add(bug)
+    return dedup.clusters()
+
+
+async def unique(stream: AsyncIterator[BugItem], dedup: BugDeduplicator) -> AsyncIterator[BugItem]:
+    """Pass only the bugs of `stream` that are not near-duplicates of an earlier one."""
+    async for bug in stream:
+        if dedup.add(bug) is not None:
+            yield bug
 
 
 class RunPayload(BaseModel):
@@ -100,6 +1472,75 @@ class RunPayload(BaseModel):
     limit: int = 50
     mock: bool = False
     mock_file: str | None = None
+    # Only fetch bugs changed since the last incremental run of this source
+    incremental: bool = False
+    # Keep the mined bugs in the local bug store (BUG_STORE_PATH)
+    store: bool = True
+    # /run: return one representative per cluster of near-duplicate bugs
+    dedupe: bool = False
+
+
+class MinePayload(BaseModel):
+    # Provider/project pairs mined at the same time
+    sources: List[RunPayload]
+    # Stream only the first bug of each near-duplicate cluster, across all sources
+    dedupe: bool = False
+    dedupe_threshold: float = DEDUP_THRESHOLD
+
+
+class DedupePayload(BaseModel):
+    bugs: List[BugItem]
+    threshold: float = DEDUP_THRESHOLD
+
+
+class RedactPayload(BaseModel):
+    texts: List[str]
+
+
+# Distinct source settings whose agents are kept per worker (least recently used evicted)
+AGENT_CACHE_SIZE = int(os.getenv("AGENT_CACHE_SIZE", "64"))
+
+_async_agents: "OrderedDict[str, AsyncBugMinerAgent]" = OrderedDict()
+_async_agents_lock = threading.Lock()
+
+
+def get_async_agent(
+    provider: str = "jira", config: Optional[Dict] = None, mock: bool = False, mock_file: str | None = None
+) -> AsyncBugMinerAgent:
+    """Return the worker's agent for these source settings, building it on first use.
+
+    Agents hold no per-request state and resolve the shared client of the
+    running loop on each request, so one agent serves concurrent requests.
+    """
+    key = json.dumps([provider.lower(), config or {}, mock, mock_file], sort_keys=True, default=str)
+    with _async_agents_lock:
+        agent = _async_agents.get(key)
+        if agent is None:
+            agent = _async_agents[key] = AsyncBugMinerAgent(provider, config, mock, mock_file)
+            while len(_async_agents) > AGENT_CACHE_SIZE:
+                _async_agents.popitem(last=False)
+        else:
+            _async_agents.move_to_end(key)
+        return agent
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Open the worker's HTTP client and bug store at startup and release them at shutdown."""
+    get_async_http_client()
+    await asyncio.to_thread(get_bug_store)
+    try:
+        yield
+    finally:
+        with _async_agents_lock:
+            _async_agents.clear()
+        await close_async_http_client()
+        close_http_session()
+        await asyncio.to_thread(close_bug_store)
+        await asyncio.to_thread(shutdown_redaction_pool)
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 @app.get("/")
@@ -107,17 +1548,105 @@ def read_root():
     return {"status": "ok"}
 
 
+@app.post("/redact")
+async def redact_batch(payload: RedactPayload):
+    """Redact a batch of texts off the event loop, on the shared process pool."""
+    redacted = await redact_pii_many_async(payload.texts)
+    return {"status": "success", "data": redacted}
+
+
+def _async_agent(source: RunPayload) -> AsyncBugMinerAgent:
+    return get_async_agent(source.provider, source.config, source.mock, source.mock_file)
+
+
+async def _source_stream(source: RunPayload, store: BugStore) -> AsyncIterator[BugItem]:
+    agent = _async_agent(source)
+    if not source.incremental:
+        stream = agent.iter_recent_bugs(project=source.project, limit=source.limit)
+        if source.store:
+            stream = stored(stream, store)
+    else:
+        cache = SourceCache(SourceCache.path_for(agent.provider, agent.config, source.project))
+        stream = iter_incremental(
+            agent, cache, project=source.project, limit=source.limit, store=store if source.store else None
+        )
+    async for bug in stream:
+        yield bug
+
+
+def _source_error(source: RunPayload, exc: Exception) -> Dict[str, str]:
+    return {"provider": source.provider, "project": source.project, "message": str(exc)}
+
+
 @app.post("/run")
-def run_bug_miner(payload: RunPayload):
-    agent = BugMinerAgent(
-        provider=payload.provider,
-        config=payload.config,
-        mock=payload.mock,
-        mock_file=payload.mock_file,
-    )
-    bugs = agent.fetch_recent_bugs(project=payload.project, limit=payload.limit)
+async def run_bug_miner(payload: RunPayload, store: BugStore = Depends(get_bug_store)):
+    """Mine one source; if it fails part way, the bugs mined so far come back with an ``error``."""
+    stream = _source_stream(payload, store)
+    if payload.dedupe:
+        stream = unique(stream, BugDeduplicator())
+    bugs: List[BugItem] = []
+    try:
+        async for bug in stream:
+            bugs.append(bug)
+    except Exception as exc:
+        return {"status": "partial", "data": bugs, "error": _source_error(payload, exc)}
     return {"status": "success", "data": bugs}
 
 
+async def _mine_lines(payload: MinePayload, store: BugStore) -> AsyncIterator[str]:
+    dedup = BugDeduplicator(payload.dedupe_threshold) if payload.dedupe else None
+    async for index, item in mine_concurrently([_source_stream(source, store) for source in payload.sources]):
+        if dedup is not None and isinstance(item, BugItem) and dedup.add(item) is None:
+            continue
+        if isinstance(item, Exception):
+            yield json.dumps({"source_error": _source_error(payload.sources[index], item)}) + "\n"
+        else:
+            yield item.model_dump_json() + "\n"
+
+
+@app.post("/mine")
+async def mine_bugs(payload: MinePayload, store: BugStore = Depends(get_bug_store)):
+    """Mine several providers/projects concurrently and stream the bugs as NDJSON.
+
+    Bugs arrive in whatever order the sources deliver them; a failing source
+    is reported as a ``{"source_error": {...}}`` line.
+    """
+    return StreamingResponse(_mine_lines(payload, store), media_type="application/x-ndjson")
+
+
+@app.post("/dedupe")
+async def dedupe_bugs(payload: DedupePayload):
+    """Cluster near-duplicate bugs; each cluster keeps its first bug as representative."""
+    if not 0 < payload.threshold <= 1:
+        raise HTTPException(status_code=400, detail="threshold must be in (0, 1]")
+    clusters = await asyncio.to_thread(deduplicate, payload.bugs, payload.threshold)
+    return {"status": "success", "data": clusters}
+
+
+@app.get("/bugs")
+def query_bugs(
+    status: Optional[BugStatus] = None,
+    severity: Optional[str] = None,
+    requirement: Optional[str] = None,
+    limit: int = 100,
+    offset: int = 0,
+    store: BugStore = Depends(get_bug_store),
+):
+    """Query the local bug store by status, severity and/or related requirement."""
+    if limit < 0 or offset < 0:
+        raise HTTPException(status_code=400, detail="limit and offset must not be negative")
+    status_value = status.value if status else None
+    bugs = store.query(status_value, severity, requirement, limit=limit, offset=offset)
+    return {"status": "success", "data": bugs, "total": store.count(status_value, severity, requirement)}
+
+
+@app.get("/bugs/{bug_id}")
+def get_bug(bug_id: str, store: BugStore = Depends(get_bug_store)):
+    bug = store.get(bug_id)
+    if bug is None:
+        raise HTTPException(status_code=404, detail="Unknown bug id")
+    return {"status": "success", "data": bug}
+
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=int(os.environ.get("PORT", 8080)))
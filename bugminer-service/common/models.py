@@ -3,7 +3,7 @@ from __future__ import annotations
 from datetime import datetime
 from enum import Enum
 import uuid
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from pydantic import BaseModel, Field
 from pydantic import ConfigDict
@@ -38,6 +38,16 @@ class CodeSymbol(BaseModel):
     end_line: Optional[int] = None
     docstring: Optional[str] = None
     code_snippet: Optional[str] = None
+    # "<content hash>:<start offset>-<end offset>", set instead of code_snippet
+    # when snippets are returned by reference
+    snippet_ref: Optional[str] = None
+    # Character offsets of the symbol in its file (not serialized)
+    source_span: Optional[Tuple[int, int]] = Field(default=None, exclude=True)
+
+    @property
+    def node_id(self) -> str:
+        """Dependency-graph node of this symbol: ``<file_path>::<qualified name>``."""
+        return f"{self.file_path or ''}::{self.qualified_name or self.name}"
 
 
 class Requirement(BaseModel):
@@ -67,6 +77,8 @@ class BugItem(BaseModel):
     related_requirements: List[str] = Field(default_factory=list)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     resolved_at: Optional[datetime] = None
+    # Last change in the source tracker; drives incremental mining watermarks
+    updated_at: Optional[datetime] = None
 
 
 class TestIntent(BaseModel):
@@ -94,5 +106,7 @@ class GeneratedTest(BaseModel):
     language: str = "python"
     metadata: Dict[str, Any] = Field(default_factory=dict)
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    # Node ids (CodeSymbol.node_id) of the code symbols this test exercises
+    symbol_ids: List[str] = Field(default_factory=list)
     last_run_at: Optional[datetime] = None
     passed: Optional[bool] = None
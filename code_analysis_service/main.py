@@ -1,63 +1,1939 @@
 
 from __future__ import annotations
 
-from typing import List
-from fastapi import FastAPI
-from pydantic import BaseModel
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from bisect import bisect_right
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Pattern, Tuple, TypeVar, Union
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 import uvicorn
 import os
 import ast
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import posixpath
+import re
+import subprocess
+import sys
+import tarfile
+import tempfile
+import threading
+import uuid
 
-from common.models import CodeSymbol
-from common.security import redact_pii
+from common.models import CodeSymbol, GeneratedTest
+from common.security import redact_pii, redact_pii_many_async, redact_pii_slices, shutdown_redaction_pool
 
-app = FastAPI()
+
+def content_hash(code: str) -> str:
+    """Return the hex digest used to identify a file's content."""
+    return hashlib.blake2b(code.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+
+# Parser registry: language -> parser and file suffix -> language. Parsers take
+# source text and return its symbols, raising (e.g. SyntaxError) on input they
+# cannot parse; they are module-level functions so repository mode can run
+# them in pool workers. SEGMENT_BOUNDARIES holds, per language, a pattern for
+# the start of top-level definitions, where recovery mode splits a file that
+# fails to parse.
+SymbolParser = Callable[[str], List[CodeSymbol]]
+PARSERS: Dict[str, SymbolParser] = {}
+LANGUAGE_BY_SUFFIX: Dict[str, str] = {}
+SEGMENT_BOUNDARIES: Dict[str, Pattern] = {}
+DEFAULT_LANGUAGE = "python"
+
+
+def register_parser(
+    language: str, suffixes: Tuple[str, ...], segment_boundary: Optional[Pattern] = None
+) -> Callable[[SymbolParser], SymbolParser]:
+    """Register the decorated function as the parser for `language` files."""
+
+    def decorator(parser: SymbolParser) -> SymbolParser:
+        PARSERS[language] = parser
+        for suffix in suffixes:
+            LANGUAGE_BY_SUFFIX[suffix] = language
+        if segment_boundary is not None:
+            SEGMENT_BOUNDARIES[language] = segment_boundary
+        return parser
+
+    return decorator
+
+
+def detect_language(file_path: Optional[str]) -> Optional[str]:
+    """Return the registered language for `file_path`'s extension, if any."""
+    if not file_path:
+        return None
+    return LANGUAGE_BY_SUFFIX.get(os.path.splitext(file_path)[1].lower())
+
+
+def resolve_language(file_path: Optional[str] = None, language: Optional[str] = None) -> str:
+    """Pick the parser language: explicit, else by extension, else Python."""
+    language = language or detect_language(file_path) or DEFAULT_LANGUAGE
+    if language not in PARSERS:
+        raise ValueError(f"Unsupported language: {language}")
+    return language
+
+
+def _symbol_key(digest: str, language: str, recover: bool) -> str:
+    return f"{digest}:{language}:{int(recover)}"
+
+
+_SYMBOL_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "healthqagenagent:code-symbol")
+
+
+def symbol_id(file_path: Optional[str], digest: str, position: int, symbol: CodeSymbol) -> str:
+    """Id of the `position`-th symbol of the file at `file_path` with content hash `digest`."""
+    name = f"{file_path or ''}\0{digest}\0{position}\0{symbol.qualified_name or symbol.name}"
+    return str(uuid.uuid5(_SYMBOL_ID_NAMESPACE, name))
+
+
+class SegmentError(BaseModel):
+    """A part of a file that could not be parsed, with the parser's message."""
+
+    file_path: Optional[str] = None
+    start_line: int
+    end_line: int
+    error_line: Optional[int] = None
+    message: str
+
+
+class ParseResult(NamedTuple):
+    symbols: List[CodeSymbol]
+    errors: List[SegmentError]
+
+
+# Rough memory of a cached symbol or error besides its strings (model
+# instance, field dict, ints)
+_CACHED_OBJECT_BYTES = 512
+
+
+def _result_size(result: ParseResult) -> int:
+    """Approximate memory held by a parse result, snippets and docstrings included."""
+    size = sys.getsizeof(result)
+    for s in result.symbols:
+        size += _CACHED_OBJECT_BYTES + sum(
+            sys.getsizeof(v) for v in (s.name, s.qualified_name, s.docstring, s.code_snippet) if v
+        )
+    for e in result.errors:
+        size += _CACHED_OBJECT_BYTES + sys.getsizeof(e.message)
+    return size
+
+
+class SymbolCache:
+    """Process-wide LRU cache of parse results keyed by content hash, language and mode.
+
+    Symbols are stored without a file path so identical content at several
+    paths (or a renamed file) shares one entry. The least recently used
+    entries are evicted once either `max_entries` or `max_bytes` (the
+    approximate memory held by the results, snippets included) is exceeded.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 256 << 20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[ParseResult, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[ParseResult]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: str, result: ParseResult) -> None:
+        if self.max_entries <= 0:
+            return
+        size = _result_size(result)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (result, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+_symbol_cache = SymbolCache(
+    max_entries=int(os.getenv("SYMBOL_CACHE_ENTRIES", "10000")),
+    max_bytes=int(os.getenv("SYMBOL_CACHE_BYTES", str(256 << 20))),
+)
+
+
+class SourceStore:
+    """LRU store of source files by content hash, bounded by total characters.
+
+    Backs snippets returned by reference: the file is kept so its snippets
+    can be cut on demand instead of being embedded in every response.
+
+    In memory, a reference only resolves in the process that issued it. With
+    a `directory` (shared by all replicas, e.g. a mounted volume), files are
+    also written there under their content hash and read back on a miss, so
+    any replica can serve them; the directory is not pruned by the store.
+    """
+
+    def __init__(self, max_chars: int = 256 << 20, directory: Optional[str] = None):
+        self.max_chars = max_chars
+        self.directory = directory
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            code = self._entries.get(key)
+            if code is not None:
+                self._entries.move_to_end(key)
+                return code
+        if not self.directory:
+            return None
+        try:
+            with open(os.path.join(self.directory, key), "r", encoding="utf-8", errors="surrogatepass", newline="") as fh:
+                code = fh.read()
+        except FileNotFoundError:
+            return None
+        self._remember(key, code)
+        return code
+
+    def put(self, key: str, code: str) -> None:
+        if self.directory:
+            path = os.path.join(self.directory, key)
+            if not os.path.exists(path):
+                # Content-addressed, so concurrent writers write the same bytes
+                fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+                with os.fdopen(fd, "w", encoding="utf-8", errors="surrogatepass", newline="") as fh:
+                    fh.write(code)
+                os.replace(tmp, path)
+        self._remember(key, code)
+
+    def _remember(self, key: str, code: str) -> None:
+        if len(code) > self.max_chars:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = code
+            self._chars += len(code)
+            while self._chars > self.max_chars:
+                _, evicted = self._entries.popitem(last=False)
+                self._chars -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._chars = 0
+
+
+# SNIPPET_SOURCE_DIR: shared directory so snippet refs resolve on every replica
+_source_store = SourceStore(int(os.getenv("SNIPPET_SOURCE_CHARS", str(256 << 20))), os.getenv("SNIPPET_SOURCE_DIR"))
+
+_SNIPPET_REF_RE = re.compile(r"([0-9a-f]{32}):(\d+)-(\d+)")
+
+# Repository mode: files are parsed in groups of up to _GROUP_FILES files or
+# _GROUP_CHARS characters, with a few groups in flight per worker.
+_SKIP_DIRS = {".git", ".hg", ".svn", "__pycache__", "node_modules", ".venv", "venv", ".tox", ".mypy_cache"}
+_GROUP_FILES = 64
+_GROUP_CHARS = 1 << 20
+_INFLIGHT_PER_WORKER = 4
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool_lock = threading.Lock()
+# Workers are started from a clean server process rather than forked from
+# the service, whose threads may hold locks at fork time.
+_POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def _parse_workers() -> int:
+    return int(os.getenv("CODE_ANALYSIS_WORKERS", "0")) or os.cpu_count() or 1
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    """Return the process-wide pool used to parse repositories, creating it once."""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            _parse_pool = ProcessPoolExecutor(
+                max_workers=_parse_workers(), mp_context=multiprocessing.get_context(_POOL_START_METHOD)
+            )
+        return _parse_pool
+
+
+def shutdown_parse_pool() -> None:
+    """Shut down the repository parse pool, if it was started."""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.shutdown()
+            _parse_pool = None
+
+
+def _is_skipped(rel_path: str) -> bool:
+    return any(part in _SKIP_DIRS for part in rel_path.split("/")[:-1])
+
+
+def iter_source_files(path: str) -> Iterator[Tuple[str, str]]:
+    """Yield ``(relative path, source)`` for the files under `path` with a registered parser.
+
+    `path` is a directory or a (possibly compressed) tarball. Tarballs are
+    read sequentially, so they are never extracted to disk or held in memory.
+    Symbolic links are skipped, in directories as in tarballs, so a link
+    cannot lead the walk outside `path`.
+    """
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if d not in _SKIP_DIRS)
+            for name in sorted(files):
+                full = os.path.join(root, name)
+                if detect_language(name) and not os.path.islink(full):
+                    with open(full, "r", encoding="utf-8", errors="replace") as fh:
+                        yield os.path.relpath(full, path), fh.read()
+    elif os.path.isfile(path) and tarfile.is_tarfile(path):
+        with tarfile.open(path, mode="r|*") as tar:
+            for member in tar:
+                if member.isfile() and detect_language(member.name) and not _is_skipped(member.name):
+                    fh = tar.extractfile(member)
+                    if fh is not None:
+                        yield member.name, fh.read().decode("utf-8", errors="replace")
+    else:
+        raise ValueError(f"Not a directory or tarball: {path}")
 
 
 class CodeAnalysisAgent:
     """Loads code and extracts symbols via Vertex AI code model."""
 
-    def __init__(self, mock: bool = False):
+    def __init__(self, mock: bool = False, cache: Optional[SymbolCache] = None, sources: Optional[SourceStore] = None):
         self.mock = mock
+        self.cache = cache if cache is not None else _symbol_cache
+        self.sources = sources if sources is not None else _source_store
+
+    def extract_symbols(
+        self,
+        code: str,
+        file_path: Optional[str] = None,
+        inline_snippets: bool = True,
+        language: Optional[str] = None,
+        recover: bool = False,
+        errors: Optional[List[SegmentError]] = None,
+    ) -> List[CodeSymbol]:
+        """Return the symbols of `code`, re-parsing only content not seen before.
+
+        The parser is chosen by `language`, else by `file_path`'s extension,
+        defaulting to Python. Symbol tables are cached by content hash, so
+        unchanged files are served without parsing; cached symbols keep their
+        ids across calls. Without `inline_snippets`, symbols carry a
+        ``snippet_ref`` for ``snippet()`` instead of their code.
+
+        If the file does not parse, no symbols are returned unless `recover`
+        is set, in which case each top-level definition is parsed on its own
+        (see ``parse_source``). Parse errors are appended to `errors` if given.
+        """
+        key, result, _ = self._cached_symbols(code, resolve_language(file_path, language), recover)
+        self._report(result, file_path, errors)
+        return self._bind(result.symbols, file_path, key, code, inline_snippets)
+
+    def extract_symbols_incremental(
+        self,
+        files: Dict[str, str],
+        inline_snippets: bool = True,
+        recover: bool = False,
+        errors: Optional[List[SegmentError]] = None,
+    ) -> Tuple[List[CodeSymbol], Dict[str, int]]:
+        """Extract symbols for many files, re-parsing only modified ones.
+
+        Returns the symbols of all files (in input order) and counts of files
+        that were parsed versus served from the cache. Each file's language is
+        detected from its extension.
+        """
+        symbols: List[CodeSymbol] = []
+        stats = {"parsed": 0, "cached": 0}
+        for path, code in files.items():
+            key, result, hit = self._cached_symbols(code, resolve_language(path), recover)
+            stats["cached" if hit else "parsed"] += 1
+            self._report(result, path, errors)
+            symbols.extend(self._bind(result.symbols, path, key, code, inline_snippets))
+        return symbols, stats
+
+    def snippet(self, snippet_ref: str) -> Optional[str]:
+        """Return the redacted snippet a ``snippet_ref`` points to.
+
+        The reference holds the symbol's character offsets, so the snippet is
+        the same text the inline ``code_snippet`` would have been. Returns
+        None when the file is no longer in the source store; raises
+        ValueError for a malformed reference or a span outside the file.
+        """
+        m = _SNIPPET_REF_RE.fullmatch(snippet_ref)
+        if m is None:
+            raise ValueError(f"Malformed snippet reference: {snippet_ref}")
+        code = self.sources.get(m.group(1))
+        if code is None:
+            return None
+        start, end = int(m.group(2)), int(m.group(3))
+        if not start <= end <= len(code):
+            raise ValueError(f"Span outside the file: {snippet_ref}")
+        return redact_pii(code[start:end])
+
+    @staticmethod
+    def _report(result: ParseResult, file_path: Optional[str], errors: Optional[List[SegmentError]]) -> None:
+        if errors is not None:
+            errors.extend(e.model_copy(update={"file_path": file_path}) for e in result.errors)
+
+    def _bind(
+        self, symbols: List[CodeSymbol], file_path: Optional[str], key: str, code: str, inline_snippets: bool
+    ) -> List[CodeSymbol]:
+        """Copy cached symbols for `file_path`, replacing snippets by references if asked.
+
+        Ids are derived from the path, the content hash and the symbol's
+        position in the file, so they are stable across calls while identical
+        files at different paths still get distinct ids.
+        """
+        index: Optional[LineIndex] = None
+        if not inline_snippets:
+            self.sources.put(key, code)
+        bound = []
+        for i, s in enumerate(symbols):
+            update = {"id": symbol_id(file_path, key, i, s), "file_path": file_path}
+            if not inline_snippets:
+                span = s.source_span
+                if span is None:
+                    # A parser that reports no offsets: whole lines, minus the first line's indentation
+                    index = index or LineIndex(code)
+                    span = _line_span(index, s.start_line, s.end_line)
+                update.update(code_snippet=None, snippet_ref=f"{key}:{span[0]}-{span[1]}")
+            bound.append(s.model_copy(update=update))
+        return bound
+
+    def extract_repository(
+        self,
+        path: str,
+        inline_snippets: bool = True,
+        recover: bool = False,
+        errors: Optional[List[SegmentError]] = None,
+    ) -> Iterator[CodeSymbol]:
+        """Yield the symbols of every source file in a directory or tarball.
+
+        Files already in the cache are served directly; the rest are parsed,
+        whatever their language, in groups across the parse process pool. Symbols are yielded as soon
+        as their group completes, and only a bounded number of groups are in
+        flight, so memory does not grow with the size of the repository.
+        Parse errors are appended to `errors` as files complete.
+        """
+        pool = get_parse_pool()
+        max_inflight = _parse_workers() * _INFLIGHT_PER_WORKER
+        pending: Dict[Future, List[Tuple[str, str, str, str]]] = {}
+        group: List[Tuple[str, str, str, str]] = []
+        group_chars = 0
+
+        def drain(block_until: int) -> Iterator[CodeSymbol]:
+            while len(pending) > block_until:
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                for future in done:
+                    meta = pending.pop(future)
+                    for (rel_path, key, code, language), result in zip(meta, future.result()):
+                        self.cache.put(_symbol_key(key, language, recover), result)
+                        self._report(result, rel_path, errors)
+                        yield from self._bind(result.symbols, rel_path, key, code, inline_snippets)
 
-    def extract_symbols(self, code: str) -> List[CodeSymbol]:
+        for rel_path, code in iter_source_files(path):
+            key = content_hash(code)
+            language = resolve_language(rel_path)
+            cached = self.cache.get(_symbol_key(key, language, recover))
+            if cached is not None:
+                self._report(cached, rel_path, errors)
+                yield from self._bind(cached.symbols, rel_path, key, code, inline_snippets)
+                continue
+            group.append((rel_path, key, code, language))
+            group_chars += len(code)
+            if len(group) >= _GROUP_FILES or group_chars >= _GROUP_CHARS:
+                future = pool.submit(_parse_group, [(language, code) for _, _, code, language in group], recover)
+                pending[future] = group
+                group, group_chars = [], 0
+                yield from drain(max_inflight - 1)
+        if group:
+            future = pool.submit(_parse_group, [(language, code) for _, _, code, language in group], recover)
+            pending[future] = group
+        yield from drain(0)
+
+    def _cached_symbols(
+        self, code: str, language: str = DEFAULT_LANGUAGE, recover: bool = False
+    ) -> Tuple[str, ParseResult, bool]:
+        """Return the content hash of `code`, its parse result and whether it came from the cache."""
+        key = content_hash(code)
+        result = self.cache.get(_symbol_key(key, language, recover))
+        if result is not None:
+            return key, result, True
+        result = parse_source(code, language, recover)
+        self.cache.put(_symbol_key(key, language, recover), result)
+        return key, result, False
+
+    def _parse_symbols(self, code: str, language: str = DEFAULT_LANGUAGE) -> List[CodeSymbol]:
         """Use Vertex AI code model to extract functions/classes/endpoints.
 
         This is a placeholder that should call the model for structured extraction.
+        Until then the registered parser for `language` is used.
         """
+        return parse_source(code, language).symbols
+
+
+def _line_span(index: LineIndex, start_line: int, end_line: int) -> Tuple[int, int]:
+    code = index.code
+    start = index.line_starts[start_line - 1]
+    while start < len(code) and code[start] in " \t":
+        start += 1
+    end = index.line_starts[end_line] if end_line < len(index.line_starts) else len(code)
+    while end > start and code[end - 1] in "\r\n":
+        end -= 1
+    return start, end
+
+
+# Line numbers quoted in SyntaxError messages, e.g. "(detected at line 7)"
+_DETECTED_LINE_RE = re.compile(r"(?<=detected at line )\d+")
+
+# SyntaxError messages for a string or bracket still open at the end of the
+# text; in a segment, these may just mean the split fell inside the string.
+_OPEN_AT_END_MESSAGES = ("unterminated triple-quoted string", "was never closed", "unexpected EOF")
+
+
+def _segment_error(exc: Exception, start_line: int, end_line: int) -> SegmentError:
+    if isinstance(exc, SyntaxError):
+        error_line = start_line - 1 + exc.lineno if exc.lineno else None
+        msg = _DETECTED_LINE_RE.sub(lambda m: str(start_line - 1 + int(m.group())), exc.msg or "")
+        return SegmentError(start_line=start_line, end_line=end_line, error_line=error_line, message=f"{type(exc).__name__}: {msg}")
+    return SegmentError(start_line=start_line, end_line=end_line, message=f"{type(exc).__name__}: {exc}")
+
+
+def _open_at_end(exc: Exception, start_line: int = 1) -> Optional[int]:
+    """Return the file line of the string or bracket `exc` reports as never closed, if any."""
+    if isinstance(exc, SyntaxError) and exc.lineno and any(m in (exc.msg or "") for m in _OPEN_AT_END_MESSAGES):
+        return start_line - 1 + exc.lineno
+    return None
+
+
+def split_segments(code: str, boundary: Pattern) -> List[Tuple[int, int, str]]:
+    """Split `code` where `boundary` matches at a line start, keeping decorators attached.
+
+    Returns ``(first line, last line, text)`` per segment; text before the
+    first definition (imports, constants) forms a segment of its own.
+    """
+    index = LineIndex(code)
+    cuts = [0]
+    after_decorator = False
+    for m in boundary.finditer(code):
+        start = m.start()
+        # A decorator, however many lines it spans, runs up to the next definition
+        decorated, after_decorator = after_decorator, code.startswith("@", start)
+        if start == 0 or decorated:
+            continue
+        cuts.append(start)
+    cuts.append(len(code))
+    return [
+        (index.line_of(a), index.line_of(b - 1), code[a:b])
+        for a, b in zip(cuts, cuts[1:])
+        if a < b
+    ]
+
+
+T = TypeVar("T")
+
+
+def parse_segments(
+    code: str, boundary: Pattern, parse: Callable[[str], T], open_line: Optional[int] = None
+) -> Iterator[Tuple[int, int, int, Union[T, Exception]]]:
+    """Parse the segments of `code` one at a time.
+
+    Yields ``(first line, last line, offset, result)`` per segment, where
+    `result` is what `parse` returned or the exception it raised. A boundary
+    match inside a multi-line string splits the string, so a segment that
+    fails with a string or bracket open at its end is merged with the next
+    one and parsed again. `open_line` is the line of a string or bracket the
+    whole file leaves open; segments failing on it are not merged, as their
+    string runs to the end of the file.
+    """
+    segments = split_segments(code, boundary)
+    offset = 0
+    i = 0
+    while i < len(segments):
+        first_line, last_line, text = segments[i]
+        i += 1
+        while True:
+            try:
+                result: Union[T, Exception] = parse(text)
+            except Exception as exc:
+                line = _open_at_end(exc, first_line)
+                if line is not None and line != open_line and i < len(segments):
+                    _, last_line, more = segments[i]
+                    text += more
+                    i += 1
+                    continue
+                result = exc
+            break
+        yield first_line, last_line, offset, result
+        offset += len(text)
+
+
+def parse_source(code: str, language: str = DEFAULT_LANGUAGE, recover: bool = False) -> ParseResult:
+    """Parse `code` with the registered parser, reporting failures instead of raising.
+
+    A file that does not parse yields no symbols and one error. With
+    `recover`, it is split at top-level definitions (if the language has a
+    segment boundary) and every segment is parsed on its own: symbols of the
+    good segments are returned, with their lines relative to the whole file,
+    and each bad segment gets its own error.
+    """
+    parser = PARSERS[language]
+    try:
+        return ParseResult(parser(code), [])
+    except Exception as exc:
+        error = _segment_error(exc, 1, LineIndex(code).line_of(max(len(code) - 1, 0)))
+        open_line = _open_at_end(exc)
+    boundary = SEGMENT_BOUNDARIES.get(language)
+    if not recover or boundary is None:
+        return ParseResult([], [error])
+    symbols: List[CodeSymbol] = []
+    errors: List[SegmentError] = []
+    for first_line, last_line, segment_offset, segment_symbols in parse_segments(code, boundary, parser, open_line):
+        if isinstance(segment_symbols, Exception):
+            errors.append(_segment_error(segment_symbols, first_line, last_line))
+            continue
+        shift = first_line - 1
+        for s in segment_symbols:
+            update = {"start_line": s.start_line + shift, "end_line": s.end_line + shift}
+            if s.source_span is not None:
+                update["source_span"] = (s.source_span[0] + segment_offset, s.source_span[1] + segment_offset)
+            symbols.append(s.model_copy(update=update))
+    return ParseResult(symbols, errors)
+
+
+# Start of a top-level Python definition (decorators included).
+_PY_TOP_LEVEL_RE = re.compile(r"^(?:@|(?:async[ \t]+)?def\b|class\b)", re.MULTILINE)
+
+
+@register_parser("python", (".py",), segment_boundary=_PY_TOP_LEVEL_RE)
+def parse_python(code: str) -> List[CodeSymbol]:
+    return SymbolExtractor(code).extract(ast.parse(code))
+
+
+# Statement-list fields; definitions can only appear inside these, so the
+# extractor never descends into expressions.
+_BLOCK_FIELDS = ("body", "orelse", "finalbody", "handlers", "cases")
+
+# Line breaks as ast counts them (form feeds and other separators are not).
+_NEWLINE_RE = re.compile(r"\r\n?|\n")
+
+
+class LineIndex:
+    """Maps ast ``(line, column)`` positions to offsets into the source.
+
+    Line start offsets are computed once per file, so each lookup is O(1)
+    instead of re-splitting the file like ``ast.get_source_segment`` does.
+    """
+
+    def __init__(self, code: str):
+        self.code = code
+        self.line_starts = [0] + [m.end() for m in _NEWLINE_RE.finditer(code)]
+        self._ascii = code.isascii()
+
+    def offset(self, lineno: int, col_offset: int) -> int:
+        start = self.line_starts[lineno - 1]
+        if self._ascii or col_offset == 0:
+            return start + col_offset
+        # ast columns count UTF-8 bytes
+        line = self.code[start:start + col_offset]
+        return start + len(line.encode("utf-8")[:col_offset].decode("utf-8", errors="ignore"))
+
+    def line_of(self, offset: int) -> int:
+        """Return the 1-based line containing `offset`."""
+        return bisect_right(self.line_starts, offset)
+
+    def span(self, node: ast.AST) -> Tuple[int, int]:
+        return self.offset(node.lineno, node.col_offset), self.offset(node.end_lineno, node.end_col_offset)
+
+
+class SymbolExtractor(ast.NodeVisitor):
+    """Collects class and function symbols in a single pass over the statements.
+
+    Tracks the enclosing scopes to build qualified names the way Python's
+    ``__qualname__`` does (``Outer.method``, ``func.<locals>.inner``).
+    Snippets are cut from the source through a ``LineIndex`` and redacted
+    with one scan of the whole file.
+    """
+
+    def __init__(self, code: str):
+        self.code = code
+        self.nodes: List[Tuple[ast.AST, str, str]] = []
+        self._scope: List[str] = []
+
+    def extract(self, tree: ast.AST) -> List[CodeSymbol]:
+        self.visit(tree)
+        index = LineIndex(self.code)
+        spans = [index.span(node) for node, _, _ in self.nodes]
+        snippets = redact_pii_slices(self.code, spans)
         symbols: List[CodeSymbol] = []
-        try:
-            tree = ast.parse(code)
-            for node in ast.walk(tree):
-                if isinstance(node, ast.FunctionDef):
-                    snippet = ast.get_source_segment(code, node) or ""
-                    snippet = redact_pii(snippet)
-                    symbols.append(
-                        CodeSymbol(
-                            name=node.name,
-                            kind="function",
-                            start_line=node.lineno,
-                            code_snippet=snippet,
-                        )
-                    )
-                if isinstance(node, ast.ClassDef):
-                    snippet = ast.get_source_segment(code, node) or ""
-                    snippet = redact_pii(snippet)
-                    symbols.append(
-                        CodeSymbol(
-                            name=node.name,
-                            kind="class",
-                            start_line=node.lineno,
-                            code_snippet=snippet,
-                        )
-                    )
-        except Exception:
-            return []
+        for (node, kind, qualified_name), span, snippet in zip(self.nodes, spans, snippets):
+            docstring = ast.get_docstring(node)
+            symbols.append(
+                CodeSymbol(
+                    name=node.name,
+                    qualified_name=qualified_name,
+                    kind=kind,
+                    start_line=node.lineno,
+                    end_line=node.end_lineno,
+                    docstring=redact_pii(docstring) if docstring else docstring,
+                    code_snippet=snippet,
+                    source_span=span,
+                )
+            )
         return symbols
 
+    def generic_visit(self, node: ast.AST) -> None:
+        for field in _BLOCK_FIELDS:
+            children = getattr(node, field, None)
+            if isinstance(children, list):
+                for child in children:
+                    self.visit(child)
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        self._add(node, "class")
+        self._scope.append(node.name)
+        self.generic_visit(node)
+        self._scope.pop()
+
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> None:
+        self._add(node, "function")
+        self._scope.extend((node.name, "<locals>"))
+        self.generic_visit(node)
+        del self._scope[-2:]
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def _add(self, node, kind: str) -> None:
+        self.nodes.append((node, kind, ".".join(self._scope + [node.name])))
+
+
+# Tokenizer shared by the JS/TS and Java extractors. Comments and string,
+# template and text-block literals are consumed whole so braces inside them
+# are never counted; ``/** ... */`` comments are kept as doc comments.
+_CLIKE_TOKEN_RE = re.compile(
+    r"""\s*(?:
+    (?P<doc>/\*\*(?!/).*?(?:\*/|\Z))
+  | (?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<string>\"\"\".*?(?:\"\"\"|\Z)|"(?:[^"\\\n]|\\.)*"?|'(?:[^'\\\n]|\\.)*'?|`(?:[^`\\]|\\.)*`?)
+  | (?P<name>(?:[^\W\d]|\$)[\w$]*)
+  | (?P<number>\d[\w.]*)
+  | (?P<punct>=>|->|\.\.\.|.)
+    )""",
+    re.VERBOSE | re.DOTALL,
+)
+_DOC_LINE_RE = re.compile(r"^\s*\*? ?", re.MULTILINE)
+
+# Keywords after which a ``/`` starts a JavaScript regex literal, not a division.
+_REGEX_PRECEDERS = frozenset(
+    ("return", "typeof", "case", "do", "else", "in", "of", "new", "delete", "void", "throw", "instanceof", "yield", "await")
+)
+# Words that can end a line without ending the statement (no semicolon insertion).
+_JS_CONTINUING = _REGEX_PRECEDERS | frozenset(
+    ("export", "default", "async", "static", "public", "private", "protected", "readonly", "abstract", "declare",
+     "get", "set", "override", "extends", "implements", "const", "let", "var", "function", "class")
+)
+# Words that can start a line without starting a new statement.
+_JS_CONTINUATION_WORDS = frozenset(
+    ("else", "catch", "finally", "while", "as", "in", "of", "instanceof", "extends", "implements", "keyof")
+)
+_TYPE_KEYWORDS = {"class": "class", "record": "class", "interface": "interface", "enum": "enum"}
+_NOT_METHOD_NAMES = frozenset(
+    ("if", "for", "while", "switch", "catch", "return", "new", "typeof", "super", "this", "synchronized", "do",
+     "else", "try", "throw", "await", "yield", "delete", "void", "in", "of", "instanceof", "case", "function", "assert")
+)
+_NOT_CALL_NAMES = _NOT_METHOD_NAMES | frozenset(("import", "require"))
+# Words directly before a name that is being declared rather than called.
+_DECLARING_WORDS = frozenset(("function", "class", "record", "interface", "enum"))
+# Tokens that may follow a method's parameter list in a declaration.
+_METHOD_HEADER_ENDS = frozenset(("{", ";", ":", "throws", "default"))
+# Lookahead bound when scanning type annotations and type parameters.
+_TYPE_LOOKAHEAD = 64
+# Bracket pairs, operators and keywords of TypeScript type annotations
+_TYPE_GROUPS = {"{": "}", "(": ")", "[": "]"}
+_TYPE_OPERATORS = frozenset(("|", "&", "?", ":", ".", ","))
+_TYPE_OPERAND_WORDS = frozenset(("keyof", "typeof", "infer", "readonly", "unique", "new", "is", "asserts", "extends"))
+
+ClikeToken = Tuple[str, str, int, int]
+
+
+def _regex_allowed(tokens: List[ClikeToken]) -> bool:
+    if not tokens:
+        return True
+    kind, text, _, _ = tokens[-1]
+    if kind == "name":
+        return text in _REGEX_PRECEDERS
+    return kind == "punct" and text not in (")", "]", "}")
+
+
+def _regex_literal_end(code: str, pos: int) -> Optional[int]:
+    """Return the end of the regex literal starting at `pos`, or None if there is none."""
+    i, n, in_class = pos + 1, len(code), False
+    while i < n:
+        c = code[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c == "\n":
+            return None
+        if in_class:
+            in_class = c != "]"
+        elif c == "[":
+            in_class = True
+        elif c == "/":
+            i += 1
+            while i < n and code[i].isalpha():
+                i += 1
+            return i
+        i += 1
+    return None
+
+
+def tokenize_clike(code: str, regex_literals: bool = True) -> Tuple[List[ClikeToken], Dict[int, str]]:
+    """Split JS/TS/Java source into ``(kind, text, start, end)`` tokens.
+
+    Whitespace and comments are dropped. Returns the tokens and a map from
+    token index to the doc comment directly preceding that token.
+    """
+    tokens: List[ClikeToken] = []
+    docs: Dict[int, str] = {}
+    doc: Optional[str] = None
+    pos, n = 0, len(code)
+    match = _CLIKE_TOKEN_RE.match
+    while pos < n:
+        m = match(code, pos)
+        if m is None:
+            break
+        kind, end = m.lastgroup, m.end()
+        if kind == "comment":
+            pos = end
+            continue
+        if kind == "doc":
+            doc, pos = m.group(kind), end
+            continue
+        start = m.start(kind)
+        if kind == "punct" and regex_literals and m.group(kind) == "/" and _regex_allowed(tokens):
+            regex_end = _regex_literal_end(code, start)
+            if regex_end is not None:
+                kind, end = "regex", regex_end
+        if doc is not None:
+            docs[len(tokens)] = doc
+            doc = None
+        tokens.append((kind, code[start:end], start, end))
+        pos = end
+    return tokens, docs
+
+
+def _clean_doc(raw: Optional[str]) -> Optional[str]:
+    if raw is None:
+        return None
+    body = raw[3:-2] if raw.endswith("*/") else raw[3:]
+    return _DOC_LINE_RE.sub("", body).strip() or None
+
+
+class _Decl:
+    """A declaration found by ``CLikeExtractor``; `end` is set once its body closes."""
+
+    __slots__ = ("kind", "name", "qualified_name", "start", "end", "doc", "arrow", "expr")
+
+    def __init__(self, kind: str, name: str, qualified_name: str, start: int, doc: Optional[str], arrow: bool):
+        self.kind = kind
+        self.name = name
+        self.qualified_name = qualified_name
+        self.start = start
+        self.end: Optional[int] = None
+        self.doc = doc
+        # Arrow function; `expr` once it turns out to have an expression body
+        self.arrow = arrow
+        self.expr = False
+
+
+class _Frame:
+    """A brace-delimited block and the statement currently being read in it."""
+
+    __slots__ = ("kind", "decl", "paren_base", "scope", "pending", "stmt_start", "stmt_doc", "stmt_assign")
+
+    def __init__(self, kind: str, decl: Optional[_Decl], paren_base: int, scope: Tuple[str, ...]):
+        self.kind = kind
+        self.decl = decl
+        self.paren_base = paren_base
+        self.scope = scope
+        # Declaration whose body has not started yet
+        self.pending: Optional[_Decl] = None
+        self.stmt_start: Optional[int] = None
+        self.stmt_doc: Optional[str] = None
+        self.stmt_assign = False
+
+
+class CLikeExtractor:
+    """Tokenizer-based symbol extractor for JavaScript, TypeScript and Java.
+
+    Instead of building a syntax tree it follows brace depth and the enclosing
+    declarations, so it is fast and never fails on code it does not fully
+    understand. Finds classes, interfaces, enums, functions, methods and
+    function-valued variables and fields; JSDoc/Javadoc comments become
+    docstrings. Qualified names follow the same rules as for Python.
+    """
+
+    def __init__(self, code: str, language: str, collect_deps: bool = False):
+        self.code = code
+        self.language = language
+        self.java = language == "java"
+        self.tokens, self.docs = tokenize_clike(code, regex_literals=not self.java)
+        self.decls: List[_Decl] = []
+        # With `collect_deps`: (caller qualified name or "", callee name) pairs and import specifiers
+        self.collect_deps = collect_deps
+        self.calls: List[Tuple[str, str]] = []
+        self.imports: List[str] = []
+
+    def extract(self) -> List[CodeSymbol]:
+        self._scan()
+        index = LineIndex(self.code)
+        snippets = redact_pii_slices(self.code, [(d.start, d.end) for d in self.decls])
+        symbols: List[CodeSymbol] = []
+        for decl, snippet in zip(self.decls, snippets):
+            docstring = _clean_doc(decl.doc)
+            symbols.append(
+                CodeSymbol(
+                    name=decl.name,
+                    qualified_name=decl.qualified_name,
+                    language=self.language,
+                    kind=decl.kind,
+                    start_line=index.line_of(decl.start),
+                    end_line=index.line_of(max(decl.start, decl.end - 1)),
+                    docstring=redact_pii(docstring) if docstring else docstring,
+                    code_snippet=snippet,
+                    source_span=(decl.start, decl.end),
+                )
+            )
+        return symbols
+
+    def _scan(self) -> None:
+        tokens, docs = self.tokens, self.docs
+        n = len(tokens)
+        frames = [_Frame("module", None, 0, ())]
+        paren = 0
+        prev: Optional[ClikeToken] = None
+        # Tokens before this index belong to a type annotation being skipped
+        skip_to = 0
+        for i in range(n):
+            if i < skip_to:
+                prev = tokens[i]
+                continue
+            kind, text, start, end = tokens[i]
+            frame = frames[-1]
+            at_stmt = paren == frame.paren_base
+            if at_stmt:
+                if frame.stmt_start is not None and not self.java and prev is not None and self._asi(prev, tokens[i]):
+                    self._end_statement(frame, prev[3])
+                if frame.stmt_start is None:
+                    frame.stmt_start, frame.stmt_doc, frame.stmt_assign = start, docs.get(i), False
+            if kind == "punct":
+                if text == "(" or text == "[":
+                    paren += 1
+                elif text == ")" or text == "]":
+                    if paren > frame.paren_base:
+                        paren -= 1
+                elif text == "{":
+                    decl = None
+                    if at_stmt and frame.pending is not None and not frame.pending.expr:
+                        decl, frame.pending = frame.pending, None
+                    frames.append(self._open(frame, decl, paren))
+                elif text == "}":
+                    if len(frames) > 1:
+                        frames.pop()
+                        self._close(frame, prev[3] if prev is not None else start, end)
+                        paren = frame.paren_base
+                        outer = frames[-1]
+                        if paren == outer.paren_base and outer.pending is None:
+                            self._end_statement(outer, end)
+                elif at_stmt:
+                    if text == ";" or (text == "," and frame.pending is not None and frame.pending.expr):
+                        self._end_statement(frame, end)
+                    elif text == "=":
+                        frame.stmt_assign = True
+                    elif text == "=>" and frame.pending is not None and frame.pending.arrow:
+                        frame.pending.expr = i + 1 >= n or tokens[i + 1][1] != "{"
+                    elif (
+                        text == ":"
+                        and self.language == "typescript"
+                        and frame.pending is not None
+                        and not frame.pending.expr
+                        and prev is not None
+                        and (prev[1] == ")" or prev[1] == frame.pending.name)
+                    ):
+                        # A return or variable type, whose braces are not the body
+                        skip_to = self._skip_type(i + 1)
+            elif kind == "name":
+                declared = False
+                if at_stmt and frame.pending is None:
+                    count = len(self.decls)
+                    self._declaration(frame, i, prev)
+                    declared = len(self.decls) > count
+                if self.collect_deps and not declared:
+                    self._dependency(frames, i, prev)
+            prev = tokens[i]
+        eof = prev[3] if prev is not None else 0
+        for frame in reversed(frames):
+            self._close(frame, eof, eof)
+
+    def _asi(self, prev: ClikeToken, token: ClikeToken) -> bool:
+        """Whether a JS/TS statement ends between `prev` and `token` without a semicolon."""
+        if token[0] != "name" and token[1] != "@":
+            return False
+        if token[1] in _JS_CONTINUATION_WORDS or "\n" not in self.code[prev[3]:token[2]]:
+            return False
+        kind, text = prev[0], prev[1]
+        if kind == "name":
+            return text not in _JS_CONTINUING
+        return kind != "punct" or text in (")", "]")
+
+    def _open(self, frame: _Frame, decl: Optional[_Decl], paren: int) -> _Frame:
+        if decl is None:
+            return _Frame("block", None, paren, frame.scope)
+        if decl.kind == "function":
+            return _Frame("function", decl, paren, frame.scope + (decl.name, "<locals>"))
+        kind = "class" if decl.kind != "enum" or self.java else "block"
+        return _Frame(kind, decl, paren, frame.scope + (decl.name,))
+
+    def _close(self, frame: _Frame, last_end: int, end: int) -> None:
+        """Close `frame` at a ``}`` ending at `end`; `last_end` is where its content ends."""
+        if frame.pending is not None:
+            frame.pending.end = last_end
+            frame.pending = None
+        if frame.decl is not None:
+            frame.decl.end = end
+
+    def _end_statement(self, frame: _Frame, end: int) -> None:
+        if frame.pending is not None:
+            frame.pending.end = end
+            frame.pending = None
+        frame.stmt_start = None
+
+    def _declare(self, frame: _Frame, kind: str, name: str, arrow: bool = False) -> None:
+        decl = _Decl(kind, name, ".".join(frame.scope + (name,)), frame.stmt_start, frame.stmt_doc, arrow)
+        self.decls.append(decl)
+        frame.pending = decl
+
+    def _declaration(self, frame: _Frame, i: int, prev: Optional[ClikeToken]) -> None:
+        """Record a declaration if the statement-level name token at `i` starts one."""
+        tokens = self.tokens
+        text = tokens[i][1]
+        nxt = tokens[i + 1] if i + 1 < len(tokens) else None
+        if nxt is None:
+            return
+        prev_text = prev[1] if prev is not None else None
+        kind = _TYPE_KEYWORDS.get(text)
+        if kind is not None and nxt[0] == "name" and prev_text != ".":
+            if self.java or (text != "record" and (text == "class" or self.language != "javascript")):
+                self._declare(frame, kind, nxt[1])
+            return
+        if not self.java:
+            if text == "function":
+                j = i + 2 if nxt[1] == "*" else i + 1
+                if j < len(tokens) and tokens[j][0] == "name":
+                    self._declare(frame, "function", tokens[j][1])
+                return
+            if text in ("const", "let", "var"):
+                if nxt[0] == "name" and self._function_value(i + 2):
+                    self._declare(frame, "function", nxt[1], arrow=True)
+                return
+        if frame.kind != "class" or text in _NOT_METHOD_NAMES or prev_text in (".", "@", "new"):
+            return
+        j = self._skip_type_params(i + 1)
+        if j < len(tokens) and tokens[j][1] == "(" and not frame.stmt_assign:
+            close = self._matching(j, "(", ")")
+            if close + 1 < len(tokens) and tokens[close + 1][1] in _METHOD_HEADER_ENDS:
+                self._declare(frame, "function", text)
+        elif not self.java and nxt[1] in ("=", ":") and self._function_value(i + 1):
+            self._declare(frame, "function", text, arrow=True)
+
+    def _dependency(self, frames: List[_Frame], i: int, prev: Optional[ClikeToken]) -> None:
+        """Record the import or call that the name token at `i` starts, if any."""
+        tokens = self.tokens
+        n = len(tokens)
+        text = tokens[i][1]
+        nxt = tokens[i + 1] if i + 1 < n else None
+        if nxt is None:
+            return
+        if self.java:
+            if text == "import" and frames[-1].stmt_start == tokens[i][2]:
+                parts = []
+                for k in range(i + 1, n):
+                    t = tokens[k][1]
+                    if t == ";":
+                        break
+                    if t != "static" and t != "*":
+                        parts.append(t)
+                self.imports.append("".join(parts).rstrip("."))
+                return
+        elif text in ("import", "from") and nxt[0] == "string":
+            self.imports.append(nxt[1][1:-1])
+            return
+        elif text in ("import", "require") and nxt[1] == "(" and i + 2 < n and tokens[i + 2][0] == "string":
+            self.imports.append(tokens[i + 2][1][1:-1])
+            return
+        if nxt[1] != "(" or text in _NOT_CALL_NAMES or (prev is not None and prev[1] in _DECLARING_WORDS):
+            return
+        if prev is not None and prev[1] == "*" and i >= 2 and tokens[i - 2][1] == "function":
+            return
+        owner = ""
+        for frame in reversed(frames):
+            decl = frame.pending or frame.decl
+            if decl is not None:
+                owner = decl.qualified_name
+                break
+        self.calls.append((owner, text))
+
+    def _matching(self, j: int, opening: str, closing: str, limit: Optional[int] = None) -> int:
+        """Return the index of the token closing the bracket at `j` (or the last one scanned)."""
+        tokens = self.tokens
+        stop = len(tokens) if limit is None else min(len(tokens), j + limit)
+        depth = 0
+        for k in range(j, stop):
+            t = tokens[k][1]
+            if t == opening:
+                depth += 1
+            elif t == closing:
+                depth -= 1
+                if depth == 0:
+                    return k
+        return stop - 1
+
+    def _skip_type_params(self, j: int) -> int:
+        if j < len(self.tokens) and self.tokens[j][1] == "<" and not self.java:
+            return self._matching(j, "<", ">", _TYPE_LOOKAHEAD) + 1
+        return j
+
+    def _skip_type(self, j: int) -> int:
+        """Return the index of the first token after the TypeScript type starting at `j`.
+
+        Object literal, tuple, parenthesized and generic parts of the type are
+        skipped as balanced groups; the type ends at the first token that
+        cannot continue it (a body ``{``, ``=>``, ``=``, ``;``).
+        """
+        tokens = self.tokens
+        n = len(tokens)
+        operand = True
+        after_params = False
+        while j < n:
+            kind, text = tokens[j][0], tokens[j][1]
+            if text == "<":
+                # Generic arguments (``Promise<...>``) or type parameters of a function type
+                j = self._skip_type_params(j)
+                after_params = False
+                continue
+            if text in _TYPE_GROUPS and (operand or text == "["):
+                after_params = operand and text == "("
+                j = self._matching(j, text, _TYPE_GROUPS[text]) + 1
+                operand = False
+                continue
+            if text == "=>" and after_params:
+                operand = True
+            elif kind == "punct":
+                if text not in _TYPE_OPERATORS:
+                    break
+                operand = True
+            elif operand or text in _TYPE_OPERAND_WORDS:
+                operand = text in _TYPE_OPERAND_WORDS
+            else:
+                break
+            after_params = False
+            j += 1
+        return j
+
+    def _function_value(self, j: int) -> bool:
+        """Whether tokens from `j` are ``[: Type] = <function or arrow function>``."""
+        tokens = self.tokens
+        n = len(tokens)
+        if j < n and tokens[j][1] == ":":
+            for k in range(j + 1, min(n, j + _TYPE_LOOKAHEAD)):
+                if tokens[k][1] in ("=", ";"):
+                    break
+            else:
+                return False
+            j = k
+        if j >= n or tokens[j][1] != "=":
+            return False
+        k = j + 1
+        if k < n and tokens[k][1] == "async":
+            k += 1
+        if k >= n:
+            return False
+        if tokens[k][1] == "function":
+            return True
+        if tokens[k][0] == "name":
+            return k + 1 < n and tokens[k + 1][1] == "=>"
+        k = self._skip_type_params(k)
+        if k >= n or tokens[k][1] != "(":
+            return False
+        close = self._matching(k, "(", ")")
+        for m in range(close + 1, min(n, close + _TYPE_LOOKAHEAD)):
+            t = tokens[m][1]
+            if t == "=>":
+                return True
+            if m == close + 1 and t != ":" or t in (";", "="):
+                return False
+        return False
+
+
+@register_parser("javascript", (".js", ".jsx", ".mjs", ".cjs"))
+def parse_javascript(code: str) -> List[CodeSymbol]:
+    return CLikeExtractor(code, "javascript").extract()
+
+
+@register_parser("typescript", (".ts", ".tsx", ".mts", ".cts"))
+def parse_typescript(code: str) -> List[CodeSymbol]:
+    return CLikeExtractor(code, "typescript").extract()
+
+
+@register_parser("java", (".java",))
+def parse_java(code: str) -> List[CodeSymbol]:
+    return CLikeExtractor(code, "java").extract()
+
+
+class FileDeps(NamedTuple):
+    """What one file defines, calls and imports, before names are resolved."""
+
+    symbols: List[str]
+    # (caller qualified name, or "" for module-level code, callee name)
+    calls: List[Tuple[str, str]]
+    # Imported modules as dotted names (see ``module_name``)
+    imports: List[str]
+
+
+DependencyExtractor = Callable[[str, str], FileDeps]
+DEPENDENCY_EXTRACTORS: Dict[str, DependencyExtractor] = {}
+
+# Suffix-less file names that stand for their directory's module.
+_PACKAGE_FILES = ("__init__", "index")
+
+
+def register_dependency_extractor(language: str) -> Callable[[DependencyExtractor], DependencyExtractor]:
+    """Register the decorated ``(code, file_path) -> FileDeps`` function for `language`."""
+
+    def decorator(extractor: DependencyExtractor) -> DependencyExtractor:
+        DEPENDENCY_EXTRACTORS[language] = extractor
+        return extractor
+
+    return decorator
+
+
+def module_name(file_path: str) -> str:
+    """Return the dotted module name of a file (``pkg/mod.py`` -> ``pkg.mod``)."""
+    parts = os.path.splitext(file_path.replace("\\", "/"))[0].strip("/").split("/")
+    if len(parts) > 1 and parts[-1] in _PACKAGE_FILES:
+        parts.pop()
+    return ".".join(p for p in parts if p not in ("", "."))
+
+
+class _PyDepsVisitor(ast.NodeVisitor):
+    """Collects definitions, calls and imports of a Python module."""
+
+    def __init__(self, file_path: str):
+        module = module_name(file_path)
+        is_package = os.path.splitext(os.path.basename(file_path))[0] == "__init__"
+        self.package = module.split(".") if is_package else module.split(".")[:-1]
+        self.deps = FileDeps([], [], [])
+        self._scope: List[str] = []
+        self._owner = ""
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        self._definition(node, node.decorator_list + node.bases + [k.value for k in node.keywords], [node.name])
+
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> None:
+        outer = node.decorator_list + node.args.defaults + [d for d in node.args.kw_defaults if d is not None]
+        self._definition(node, outer, [node.name, "<locals>"])
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Call(self, node: ast.Call) -> None:
+        func = node.func
+        name = func.id if isinstance(func, ast.Name) else func.attr if isinstance(func, ast.Attribute) else None
+        if name:
+            self.deps.calls.append((self._owner, name))
+        self.generic_visit(node)
+
+    def visit_Import(self, node: ast.Import) -> None:
+        self.deps.imports.extend(alias.name for alias in node.names)
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        base = self.package[: len(self.package) - node.level + 1] if node.level else []
+        prefix = ".".join(base + ([node.module] if node.module else []))
+        for alias in node.names:
+            target = prefix if alias.name == "*" else f"{prefix}.{alias.name}" if prefix else alias.name
+            self.deps.imports.append(target)
+
+    def _definition(self, node, outer_exprs: List[ast.AST], scope: List[str]) -> None:
+        qualified_name = ".".join(self._scope + [node.name])
+        self.deps.symbols.append(qualified_name)
+        for expr in outer_exprs:
+            self.visit(expr)
+        owner = self._owner
+        self._owner = qualified_name
+        self._scope.extend(scope)
+        for stmt in node.body:
+            self.visit(stmt)
+        del self._scope[-len(scope):]
+        self._owner = owner
+
+
+@register_dependency_extractor("python")
+def python_dependencies(code: str, file_path: str) -> FileDeps:
+    try:
+        trees = [ast.parse(code)]
+    except Exception as exc:
+        # Keep the dependencies of the parts that do parse
+        segments = parse_segments(code, _PY_TOP_LEVEL_RE, ast.parse, _open_at_end(exc))
+        trees = [tree for _, _, _, tree in segments if isinstance(tree, ast.AST)]
+    visitor = _PyDepsVisitor(file_path)
+    for tree in trees:
+        visitor.visit(tree)
+    return visitor.deps
+
+
+def _clike_dependencies(code: str, file_path: str, language: str) -> FileDeps:
+    extractor = CLikeExtractor(code, language, collect_deps=True)
+    extractor._scan()
+    imports = []
+    for spec in extractor.imports:
+        if spec.startswith("."):
+            spec = posixpath.normpath(posixpath.join(posixpath.dirname(file_path.replace("\\", "/")), spec))
+        imports.append(module_name(spec) if language != "java" else spec)
+    return FileDeps([d.qualified_name for d in extractor.decls], extractor.calls, imports)
+
+
+@register_dependency_extractor("javascript")
+def javascript_dependencies(code: str, file_path: str) -> FileDeps:
+    return _clike_dependencies(code, file_path, "javascript")
+
+
+@register_dependency_extractor("typescript")
+def typescript_dependencies(code: str, file_path: str) -> FileDeps:
+    return _clike_dependencies(code, file_path, "typescript")
+
+
+@register_dependency_extractor("java")
+def java_dependencies(code: str, file_path: str) -> FileDeps:
+    return _clike_dependencies(code, file_path, "java")
+
+
+def symbol_node(file_path: str, qualified_name: str) -> str:
+    """Graph node name of a symbol; files are nodes named by their path."""
+    return f"{file_path}::{qualified_name}"
+
+
+class _FileEntry(NamedTuple):
+    digest: str
+    symbols: List[int]
+    # Flattened (caller, callee name) id pairs; caller is a symbol or the file node
+    calls: List[int]
+    imports: List[int]
+
+
+class DependencyGraph:
+    """Call and import graph of a set of files, kept as a compact adjacency index.
+
+    Nodes are files (named by path) and symbols (``path::qualified.name``);
+    all names are interned to integers. Each file's own contribution (its
+    symbols, its calls by callee name and the modules it imports) is stored
+    separately, so a changed file is re-indexed alone and an unchanged one
+    (same content hash) is skipped. Callee names and imports are resolved
+    lazily when the graph is queried: a call goes to same-named symbols in the
+    caller's file, else in the files it imports; an import goes to the file
+    whose module name ends with the imported name. The graph is persisted as
+    JSON with ``save``/``load``.
+    """
+
+    VERSION = 1
+
+    def __init__(self):
+        self._names: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._files: Dict[str, _FileEntry] = {}
+        self._edges: Optional[Tuple[Dict[int, List[int]], Dict[int, List[int]]]] = None
+        self._lock = threading.RLock()
+
+    def _intern(self, name: str) -> int:
+        i = self._ids.get(name)
+        if i is None:
+            i = self._ids[name] = len(self._names)
+            self._names.append(name)
+        return i
+
+    @property
+    def files(self) -> List[str]:
+        with self._lock:
+            return sorted(self._files)
+
+    def update_file(self, file_path: str, code: str, language: Optional[str] = None) -> bool:
+        """(Re-)index one file; returns False if it is unchanged or has no extractor."""
+        language = language or detect_language(file_path)
+        extractor = DEPENDENCY_EXTRACTORS.get(language) if language else None
+        if extractor is None:
+            return False
+        digest = content_hash(code)
+        with self._lock:
+            entry = self._files.get(file_path)
+            if entry is not None and entry.digest == digest:
+                return False
+        deps = extractor(code, file_path)
+        with self._lock:
+            calls: List[int] = []
+            for caller, callee in deps.calls:
+                calls.append(self._intern(symbol_node(file_path, caller) if caller else file_path))
+                calls.append(self._intern(callee))
+            self._intern(file_path)
+            self._files[file_path] = _FileEntry(
+                digest,
+                [self._intern(symbol_node(file_path, q)) for q in deps.symbols],
+                calls,
+                [self._intern(m) for m in deps.imports],
+            )
+            self._edges = None
+        return True
+
+    def symbols_of(self, file_path: str) -> List[str]:
+        """Symbol nodes defined in `file_path`; empty for an unknown file."""
+        with self._lock:
+            entry = self._files.get(file_path)
+            return [self._names[i] for i in entry.symbols] if entry is not None else []
+
+    def remove_file(self, file_path: str) -> bool:
+        with self._lock:
+            if self._files.pop(file_path, None) is None:
+                return False
+            self._edges = None
+            return True
+
+    def update(self, files: Dict[str, str], removed: Iterable[str] = ()) -> Dict[str, int]:
+        """Index changed files and drop removed ones; returns counts of each."""
+        stats = {"updated": 0, "unchanged": 0, "removed": 0}
+        for path in removed:
+            stats["removed"] += self.remove_file(path)
+        for path, code in files.items():
+            stats["updated" if self.update_file(path, code) else "unchanged"] += 1
+        return stats
+
+    def update_repository(self, path: str) -> Dict[str, int]:
+        """Sync the graph with a directory or tarball: re-index changes, drop missing files."""
+        seen = set()
+        stats = {"updated": 0, "unchanged": 0, "removed": 0}
+        for rel_path, code in iter_source_files(path):
+            seen.add(rel_path)
+            stats["updated" if self.update_file(rel_path, code) else "unchanged"] += 1
+        for stale in set(self.files) - seen:
+            stats["removed"] += self.remove_file(stale)
+        return stats
+
+    def _build_edges(self) -> Tuple[Dict[int, List[int]], Dict[int, List[int]]]:
+        """Resolve names into forward and reverse adjacency lists (call and import edges)."""
+        names, ids = self._names, self._ids
+        modules: Dict[str, List[str]] = {}
+        for path in self._files:
+            parts = module_name(path).split(".")
+            for k in range(len(parts)):
+                modules.setdefault(".".join(parts[k:]), []).append(path)
+
+        def resolve_module(target: str) -> List[str]:
+            found = modules.get(target)
+            if found is None and "." in target:
+                found = modules.get(target.rsplit(".", 1)[0])
+            return found or []
+
+        by_name: Dict[str, Dict[str, List[int]]] = {}
+        for path, entry in self._files.items():
+            local: Dict[str, List[int]] = {}
+            for sym in entry.symbols:
+                local.setdefault(names[sym].rsplit("::", 1)[1].rsplit(".", 1)[-1], []).append(sym)
+            by_name[path] = local
+
+        forward: Dict[int, set] = {}
+        for path, entry in self._files.items():
+            file_id = ids[path]
+            imported = []
+            for m in entry.imports:
+                for target in resolve_module(names[m]):
+                    if target != path:
+                        imported.append(target)
+                        forward.setdefault(file_id, set()).add(ids[target])
+            calls = entry.calls
+            for k in range(0, len(calls), 2):
+                callee = names[calls[k + 1]]
+                targets = by_name[path].get(callee)
+                if not targets:
+                    targets = [t for other in imported for t in by_name[other].get(callee, ())]
+                if targets:
+                    forward.setdefault(calls[k], set()).update(t for t in targets if t != calls[k])
+        reverse: Dict[int, List[int]] = {}
+        for src, dsts in forward.items():
+            for dst in dsts:
+                reverse.setdefault(dst, []).append(src)
+        return {src: sorted(dsts) for src, dsts in forward.items()}, reverse
+
+    def _adjacency(self) -> Tuple[Dict[int, List[int]], Dict[int, List[int]]]:
+        with self._lock:
+            if self._edges is None:
+                self._edges = self._build_edges()
+            return self._edges
+
+    def neighbours(self, node: str, reverse: bool = False) -> List[str]:
+        """Direct dependencies of `node` (what it calls/imports), or its dependents if `reverse`."""
+        forward, backward = self._adjacency()
+        i = self._ids.get(node)
+        if i is None:
+            return []
+        return sorted(self._names[j] for j in (backward if reverse else forward).get(i, ()))
+
+    def reachable(self, nodes: Iterable[str], reverse: bool = False, max_depth: Optional[int] = None) -> List[str]:
+        """Nodes reachable from `nodes` along call/import edges (against them if `reverse`).
+
+        With ``reverse=True`` this is everything that may be affected by a
+        change to `nodes`. The start nodes themselves are not included.
+        """
+        forward, backward = self._adjacency()
+        adjacency = backward if reverse else forward
+        start = {self._ids[n] for n in nodes if n in self._ids}
+        seen = set(start)
+        frontier = list(start)
+        depth = 0
+        while frontier and (max_depth is None or depth < max_depth):
+            depth += 1
+            nxt = []
+            for i in frontier:
+                for j in adjacency.get(i, ()):
+                    if j not in seen:
+                        seen.add(j)
+                        nxt.append(j)
+            frontier = nxt
+        return sorted(self._names[i] for i in seen - start)
+
+    def stats(self) -> Dict[str, int]:
+        forward, _ = self._adjacency()
+        with self._lock:
+            return {
+                "files": len(self._files),
+                "symbols": sum(len(e.symbols) for e in self._files.values()),
+                "edges": sum(len(d) for d in forward.values()),
+            }
+
+    def to_dict(self) -> dict:
+        """Serialize with a freshly compacted name table (names of removed files are dropped)."""
+        with self._lock:
+            table: Dict[int, int] = {}
+            names: List[str] = []
+
+            def remap(i: int) -> int:
+                j = table.get(i)
+                if j is None:
+                    j = table[i] = len(names)
+                    names.append(self._names[i])
+                return j
+
+            files = {}
+            for path, entry in self._files.items():
+                remap(self._ids[path])
+                files[path] = [
+                    entry.digest,
+                    [remap(i) for i in entry.symbols],
+                    [remap(i) for i in entry.calls],
+                    [remap(i) for i in entry.imports],
+                ]
+            return {"version": self.VERSION, "names": names, "files": files}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DependencyGraph":
+        if data.get("version") != cls.VERSION:
+            raise ValueError(f"Unsupported dependency graph version: {data.get('version')}")
+        graph = cls()
+        graph._names = list(data["names"])
+        graph._ids = {name: i for i, name in enumerate(graph._names)}
+        graph._files = {path: _FileEntry(*entry) for path, entry in data["files"].items()}
+        return graph
+
+    def save(self, path: str) -> None:
+        """Write the graph to `path` atomically."""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(self.to_dict(), fh, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "DependencyGraph":
+        with open(path, "r", encoding="utf-8") as fh:
+            return cls.from_dict(json.load(fh))
+
+
+_dependency_graph: Optional[DependencyGraph] = None
+_dependency_graph_lock = threading.Lock()
+
+
+def get_dependency_graph() -> DependencyGraph:
+    """Return the process-wide graph, loaded from DEPENDENCY_GRAPH_PATH if that file exists."""
+    global _dependency_graph
+    with _dependency_graph_lock:
+        if _dependency_graph is None:
+            path = os.getenv("DEPENDENCY_GRAPH_PATH")
+            if path and os.path.exists(path):
+                _dependency_graph = DependencyGraph.load(path)
+            else:
+                _dependency_graph = DependencyGraph()
+        return _dependency_graph
+
+
+def save_dependency_graph() -> None:
+    """Persist the process-wide graph to DEPENDENCY_GRAPH_PATH, if configured."""
+    path = os.getenv("DEPENDENCY_GRAPH_PATH")
+    if path and _dependency_graph is not None:
+        _dependency_graph.save(path)
+
+
+class FileChange(NamedTuple):
+    """Changed lines of one file in a unified diff (1-based, inclusive ranges)."""
+
+    old_path: Optional[str]
+    new_path: Optional[str]
+    added: List[Tuple[int, int]]
+    removed: List[Tuple[int, int]]
+    # New-side lines next to which old lines were removed
+    touched: List[int]
+
+
+_HUNK_RE = re.compile(r"@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+# Revisions accepted for two-SHA mode (no leading "-", so never a git option)
+_REVISION_RE = re.compile(r"[\w.~^@{}/][\w.~^@{}/-]*")
+
+
+def _diff_path(header: str) -> Optional[str]:
+    path = header[4:].split("\t", 1)[0].strip()
+    if path == "/dev/null":
+        return None
+    if path.startswith(("a/", "b/")):
+        path = path[2:]
+    return path
+
+
+def _git_header_paths(line: str) -> Tuple[Optional[str], Optional[str]]:
+    """Return the old and new paths of a ``diff --git a/<old> b/<new>`` line."""
+    rest = line[len("diff --git "):]
+    half = (len(rest) - 1) // 2
+    if rest[half:half + 1] == " " and rest[:half][2:] == rest[half + 1:][2:]:
+        # Same path on both sides, so a space inside it is not ambiguous
+        old, new = rest[:half], rest[half + 1:]
+    else:
+        old, _, new = rest.partition(" b/")
+        new = "b/" + new
+    return _diff_path("--- " + old), _diff_path("+++ " + new)
+
+
+def _add_line(ranges: List[Tuple[int, int]], line: int) -> None:
+    if ranges and ranges[-1][1] == line - 1:
+        ranges[-1] = (ranges[-1][0], line)
+    else:
+        ranges.append((line, line))
+
+
+def parse_unified_diff(diff: str) -> List[FileChange]:
+    """Return the per-file changed line ranges of a unified diff (``git diff`` or ``diff -u``).
+
+    Files of a ``git diff`` are started by their ``diff --git`` header, so
+    renames, mode changes and binary files without hunks are listed too.
+    """
+    changes: List[FileChange] = []
+    old_path: Optional[str] = None
+    current: Optional[FileChange] = None
+    # True between a "diff --git" line and the first hunk of its file
+    in_header = False
+    old_no = new_no = old_left = new_left = 0
+    # Only "\n" ends a diff line; other line breaks (form feed, U+2028) are content
+    for line in diff.split("\n"):
+        if current is not None and (old_left > 0 or new_left > 0):
+            tag = line[:1]
+            if tag == "+":
+                _add_line(current.added, new_no)
+                new_no += 1
+                new_left -= 1
+            elif tag == "-":
+                _add_line(current.removed, old_no)
+                for touched in (new_no - 1, new_no):
+                    if touched >= 1 and touched not in current.touched[-2:]:
+                        current.touched.append(touched)
+                old_no += 1
+                old_left -= 1
+            elif tag != "\\":
+                old_no += 1
+                new_no += 1
+                old_left -= 1
+                new_left -= 1
+            continue
+        if line.startswith("diff --git "):
+            old_path, new_path = _git_header_paths(line.rstrip("\r"))
+            current = FileChange(old_path, new_path, [], [], [])
+            changes.append(current)
+            in_header = True
+        elif in_header and line.startswith(("rename from ", "rename to ", "new file mode", "deleted file mode")):
+            if line.startswith("rename from "):
+                current = current._replace(old_path=line[len("rename from "):].rstrip("\r"))
+            elif line.startswith("rename to "):
+                current = current._replace(new_path=line[len("rename to "):].rstrip("\r"))
+            elif line.startswith("new file mode"):
+                current = current._replace(old_path=None)
+            else:
+                current = current._replace(new_path=None)
+            old_path = current.old_path
+            changes[-1] = current
+        elif line.startswith("--- "):
+            old_path = _diff_path(line)
+        elif line.startswith("+++ "):
+            if in_header:
+                current = current._replace(old_path=old_path, new_path=_diff_path(line))
+                changes[-1] = current
+            else:
+                current = FileChange(old_path, _diff_path(line), [], [], [])
+                changes.append(current)
+        else:
+            m = _HUNK_RE.match(line)
+            if m and current is not None:
+                in_header = False
+                old_left = int(m.group(2) or 1)
+                new_left = int(m.group(4) or 1)
+                # A zero-length side starts after the line given
+                old_no = int(m.group(1)) + (old_left == 0)
+                new_no = int(m.group(3)) + (new_left == 0)
+    return changes
+
+
+class GitUnavailableError(RuntimeError):
+    """The git executable is not installed on this server."""
+
+
+def _git(repo: str, *args: str) -> str:
+    try:
+        result = subprocess.run(["git", "-C", repo, *args], capture_output=True, text=True, timeout=120)
+    except FileNotFoundError as exc:
+        raise GitUnavailableError("git is not available on this server") from exc
+    if result.returncode != 0:
+        raise ValueError(f"git {args[0]} failed: {result.stderr.strip()}")
+    return result.stdout
+
+
+def git_changes(repo: str, base: str, head: str = "HEAD") -> Tuple[List[FileChange], Dict[str, str], Dict[str, str]]:
+    """Diff two revisions of `repo`; returns the changes and the old/new sources of changed files."""
+    for rev in (base, head):
+        if not _REVISION_RE.fullmatch(rev):
+            raise ValueError(f"Invalid revision: {rev}")
+    changes = parse_unified_diff(_git(repo, "diff", "--unified=0", "--no-color", "--no-ext-diff", "-M", base, head, "--"))
+    old_sources: Dict[str, str] = {}
+    new_sources: Dict[str, str] = {}
+    for change in changes:
+        if change.old_path and detect_language(change.old_path):
+            old_sources[change.old_path] = _git(repo, "show", f"{base}:{change.old_path}")
+        if change.new_path and detect_language(change.new_path):
+            new_sources[change.new_path] = _git(repo, "show", f"{head}:{change.new_path}")
+    return changes, old_sources, new_sources
+
+
+def _overlaps(symbol: CodeSymbol, ranges: List[Tuple[int, int]]) -> bool:
+    start, end = symbol.start_line or 0, symbol.end_line or symbol.start_line or 0
+    return any(a <= end and start <= b for a, b in ranges)
+
+
+class ChangeImpactAnalyzer:
+    """Selects the symbols and generated tests affected by a change.
+
+    Changed line ranges are mapped onto the ``start_line``/``end_line`` of
+    the symbols of each changed file, on the new side and, when the old
+    sources are known, on the old side (so removed symbols count too). Lines
+    outside any symbol (imports, module-level code) mark the whole file as
+    changed. Everything that transitively calls or imports a changed symbol
+    or file, according to the dependency graph, is affected as well; a file
+    reached that way (through an import) stands for all of its symbols.
+    """
+
+    def __init__(self, agent: Optional[CodeAnalysisAgent] = None, graph: Optional[DependencyGraph] = None):
+        self.agent = agent or CodeAnalysisAgent()
+        self.graph = graph if graph is not None else get_dependency_graph()
+
+    def changed_nodes(
+        self,
+        changes: List[FileChange],
+        new_sources: Dict[str, str],
+        old_sources: Optional[Dict[str, str]] = None,
+    ) -> Tuple[List[CodeSymbol], List[str]]:
+        """Return the changed symbols (new side) and the graph nodes of everything changed."""
+        old_sources = old_sources or {}
+        changed_symbols: List[CodeSymbol] = []
+        nodes = set()
+        for change in changes:
+            sides = []
+            if change.new_path is not None and change.new_path in new_sources:
+                ranges = change.added + ([(t, t) for t in change.touched] if change.old_path not in old_sources else [])
+                sides.append((change.new_path, new_sources[change.new_path], ranges, True))
+            if change.old_path is not None and change.old_path in old_sources:
+                sides.append((change.old_path, old_sources[change.old_path], change.removed, False))
+            if not sides or change.old_path != change.new_path or not (change.added or change.removed):
+                # Not a source file we can read, or the file itself was added,
+                # removed, renamed or had its mode changed: use the file nodes
+                nodes.update(p for p in (change.old_path, change.new_path) if p)
+            for path, code, ranges, is_new in sides:
+                if not ranges or not detect_language(path):
+                    continue
+                symbols = self.agent.extract_symbols(code, file_path=path, recover=True)
+                hit = [s for s in symbols if _overlaps(s, ranges)]
+                covered = [(s.start_line, s.end_line) for s in symbols if s.start_line and s.end_line]
+                outside = any(not any(a <= line <= b for a, b in covered) for r in ranges for line in range(r[0], r[1] + 1))
+                if outside:
+                    # Module-level code changed: everything in the file may depend on it
+                    hit = symbols
+                    nodes.add(path)
+                nodes.update(s.node_id for s in hit)
+                if is_new:
+                    changed_symbols.extend(hit)
+        return changed_symbols, sorted(nodes)
+
+    def analyze(
+        self,
+        changes: List[FileChange],
+        new_sources: Dict[str, str],
+        old_sources: Optional[Dict[str, str]] = None,
+        tests: Optional[List[GeneratedTest]] = None,
+        max_depth: Optional[int] = None,
+        include_unlinked: bool = True,
+    ) -> dict:
+        """Return the changed symbols, all affected graph nodes and the tests to run.
+
+        Dependents are collected both before and after the graph is brought
+        up to date with `new_sources` (deleted and renamed-away files are dropped): callers of a
+        removed or renamed symbol are only linked to it in the old graph.
+        Tests are selected when one of their ``symbol_ids`` is affected; tests
+        without any link are kept when `include_unlinked` is set, since nothing
+        is known about what they cover.
+        """
+        changed_symbols, changed = self.changed_nodes(changes, new_sources, old_sources)
+        affected_set = set(changed) | set(self.graph.reachable(changed, reverse=True, max_depth=max_depth))
+        self.graph.update(new_sources, removed=[c.old_path for c in changes if c.old_path and c.old_path != c.new_path])
+        affected_set.update(self.graph.reachable(changed, reverse=True, max_depth=max_depth))
+        # Tests link to symbols, so an affected file counts through everything it defines
+        affected_set.update(sym for node in list(affected_set) if "::" not in node for sym in self.graph.symbols_of(node))
+        affected = sorted(affected_set)
+        selected = [
+            t
+            for t in tests or []
+            if affected_set.intersection(t.symbol_ids) or (include_unlinked and not t.symbol_ids)
+        ]
+        return {"changed": changed_symbols, "affected": affected, "tests": selected}
+
+
+def _parse_group(sources: List[Tuple[str, str]], recover: bool = False) -> List[ParseResult]:
+    """Parse a group of ``(language, source)`` files in a pool worker."""
+    return [parse_source(code, language, recover) for language, code in sources]
+
 
 class RunPayload(BaseModel):
-    code: str
+    code: str = ""
+    file_path: Optional[str] = None
+    # Incremental mode: path -> source; unchanged files are served from cache
+    files: Dict[str, str] = Field(default_factory=dict)
+    # Parser for `code`; detected from file_path (or per path in `files`) when omitted
+    language: Optional[str] = None
+    # False: return snippet_ref instead of code_snippet; fetch via GET /snippet/{ref}
+    inline_snippets: bool = True
+    # Parse each top-level definition of a broken file on its own
+    recover: bool = False
+
+
+class RepositoryPayload(BaseModel):
+    # Directory or tarball to analyse; must live under CODE_ANALYSIS_ROOT
+    path: str
+    inline_snippets: bool = True
+    recover: bool = False
+
+
+class GraphUpdatePayload(BaseModel):
+    # Changed files (path -> source), deleted paths, and/or a directory or
+    # tarball to sync the whole graph with
+    files: Dict[str, str] = Field(default_factory=dict)
+    removed: List[str] = Field(default_factory=list)
+    path: Optional[str] = None
+
+
+class GraphQueryPayload(BaseModel):
+    # Files ("pkg/mod.py") and/or symbols ("pkg/mod.py::Class.method")
+    nodes: List[str]
+    # "dependents": what calls/imports the nodes, transitively; "dependencies": the reverse
+    direction: str = "dependents"
+    max_depth: Optional[int] = None
+
+
+class ImpactPayload(BaseModel):
+    # Either a unified diff plus the post-change sources of the changed files
+    # (`files`; read from `repo_path` when omitted) ...
+    diff: Optional[str] = None
+    files: Dict[str, str] = Field(default_factory=dict)
+    # ... or two revisions of the git repository at `repo_path`
+    base: Optional[str] = None
+    head: str = "HEAD"
+    repo_path: Optional[str] = None
+    # Generated tests to select from, linked to symbols via symbol_ids
+    tests: List[GeneratedTest] = Field(default_factory=list)
+    max_depth: Optional[int] = None
+    include_unlinked: bool = True
+
+
+class RedactPayload(BaseModel):
+    texts: List[str]
+
+
+_agent: Optional[CodeAnalysisAgent] = None
+_agent_lock = threading.Lock()
+
+
+def get_code_analysis_agent() -> CodeAnalysisAgent:
+    """Return the agent shared by all requests of this worker, creating it once.
+
+    Its symbol cache and source store are thread-safe, so concurrent
+    requests reuse each other's parses.
+    """
+    global _agent
+    with _agent_lock:
+        if _agent is None:
+            _agent = CodeAnalysisAgent()
+        return _agent
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Build the agent and load the dependency graph at startup; persist and release at shutdown."""
+    get_code_analysis_agent()
+    await asyncio.to_thread(get_dependency_graph)
+    try:
+        yield
+    finally:
+        await asyncio.to_thread(save_dependency_graph)
+        await asyncio.to_thread(shutdown_parse_pool)
+        await asyncio.to_thread(shutdown_redaction_pool)
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 @app.get("/")
@@ -65,11 +1941,157 @@ def read_root():
     return {"status": "ok"}
 
 
+@app.post("/redact")
+async def redact_batch(payload: RedactPayload):
+    """Redact a batch of texts off the event loop, on the shared process pool."""
+    redacted = await redact_pii_many_async(payload.texts)
+    return {"status": "success", "data": redacted}
+
+
 @app.post("/run")
-def run_code_analysis(payload: RunPayload):
-    agent = CodeAnalysisAgent()
-    symbols = agent.extract_symbols(payload.code)
-    return {"status": "success", "data": symbols}
+def run_code_analysis(payload: RunPayload, agent: CodeAnalysisAgent = Depends(get_code_analysis_agent)):
+    errors: List[SegmentError] = []
+    try:
+        if payload.files:
+            symbols, stats = agent.extract_symbols_incremental(
+                payload.files, inline_snippets=payload.inline_snippets, recover=payload.recover, errors=errors
+            )
+            response = {"status": "success", "data": symbols, "stats": stats}
+        else:
+            symbols = agent.extract_symbols(
+                payload.code,
+                file_path=payload.file_path,
+                inline_snippets=payload.inline_snippets,
+                language=payload.language,
+                recover=payload.recover,
+                errors=errors,
+            )
+            response = {"status": "success", "data": symbols}
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if errors:
+        response["errors"] = errors
+    return response
+
+
+@app.get("/snippet/{snippet_ref}")
+def get_snippet(snippet_ref: str, agent: CodeAnalysisAgent = Depends(get_code_analysis_agent)):
+    """Return the redacted code a symbol's ``snippet_ref`` points to.
+
+    Unless SNIPPET_SOURCE_DIR points at storage shared by all replicas, a
+    reference resolves only on the replica that returned it, so requests
+    must be routed back to it (sticky sessions).
+    """
+    try:
+        snippet = agent.snippet(snippet_ref)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if snippet is None:
+        raise HTTPException(status_code=404, detail="Source no longer available; re-run the analysis")
+    return {"status": "success", "data": {"snippet_ref": snippet_ref, "code_snippet": snippet}}
+
+
+def _repository_lines(agent: CodeAnalysisAgent, path: str, payload: RepositoryPayload) -> Iterator[str]:
+    errors: List[SegmentError] = []
+    for sym in agent.extract_repository(path, payload.inline_snippets, payload.recover, errors):
+        yield sym.model_dump_json() + "\n"
+        while errors:
+            yield '{"segment_error": ' + errors.pop(0).model_dump_json() + "}\n"
+    for error in errors:
+        yield '{"segment_error": ' + error.model_dump_json() + "}\n"
+
+
+def _repository_path(path: str) -> str:
+    """Resolve a repository path from a request, enforcing CODE_ANALYSIS_ROOT.
+
+    Server-side paths are refused until a root is configured, so a request
+    cannot walk arbitrary directories of the host.
+    """
+    root = os.getenv("CODE_ANALYSIS_ROOT")
+    if not root:
+        raise HTTPException(status_code=403, detail="Repository paths are disabled; set CODE_ANALYSIS_ROOT")
+    path = os.path.realpath(path)
+    root = os.path.realpath(root)
+    if os.path.commonpath([path, root]) != root:
+        raise HTTPException(status_code=403, detail="Path is outside CODE_ANALYSIS_ROOT")
+    if not (os.path.isdir(path) or (os.path.isfile(path) and tarfile.is_tarfile(path))):
+        raise HTTPException(status_code=400, detail="Path is not a directory or tarball")
+    return path
+
+
+@app.post("/run_repository")
+def run_repository_analysis(payload: RepositoryPayload, agent: CodeAnalysisAgent = Depends(get_code_analysis_agent)):
+    """Stream the symbols of a whole repository as NDJSON, one CodeSymbol per line.
+
+    Files that fail to parse are reported as ``{"segment_error": {...}}`` lines.
+    """
+    path = _repository_path(payload.path)
+    return StreamingResponse(_repository_lines(agent, path, payload), media_type="application/x-ndjson")
+
+
+@app.post("/graph/update")
+def update_dependency_graph(payload: GraphUpdatePayload, graph: DependencyGraph = Depends(get_dependency_graph)):
+    """Incrementally update the call/import graph and persist it (DEPENDENCY_GRAPH_PATH)."""
+    stats = graph.update(payload.files, payload.removed)
+    if payload.path:
+        for key, value in graph.update_repository(_repository_path(payload.path)).items():
+            stats[key] += value
+    if stats["updated"] or stats["removed"]:
+        save_dependency_graph()
+    return {"status": "success", "data": {**stats, **graph.stats()}}
+
+
+@app.post("/graph/query")
+def query_dependency_graph(payload: GraphQueryPayload, graph: DependencyGraph = Depends(get_dependency_graph)):
+    """Return the nodes that depend on (or are depended on by) the given files/symbols."""
+    if payload.direction not in ("dependents", "dependencies"):
+        raise HTTPException(status_code=400, detail="direction must be 'dependents' or 'dependencies'")
+    nodes = graph.reachable(
+        payload.nodes, reverse=payload.direction == "dependents", max_depth=payload.max_depth
+    )
+    return {"status": "success", "data": nodes}
+
+
+@app.post("/impact")
+def change_impact(
+    payload: ImpactPayload,
+    agent: CodeAnalysisAgent = Depends(get_code_analysis_agent),
+    graph: DependencyGraph = Depends(get_dependency_graph),
+):
+    """Select the symbols and generated tests affected by a diff or by two commits."""
+    repo = _repository_path(payload.repo_path) if payload.repo_path else None
+    old_sources: Dict[str, str] = {}
+    try:
+        if payload.base:
+            if repo is None:
+                raise ValueError("repo_path is required with base/head")
+            changes, old_sources, new_sources = git_changes(repo, payload.base, payload.head)
+        elif payload.diff is not None:
+            changes = parse_unified_diff(payload.diff)
+            new_sources = dict(payload.files)
+            for change in changes:
+                path = change.new_path
+                if path and path not in new_sources and repo and detect_language(path):
+                    full = os.path.realpath(os.path.join(repo, path))
+                    if os.path.commonpath([full, repo]) == repo and os.path.isfile(full):
+                        with open(full, "r", encoding="utf-8", errors="replace") as fh:
+                            new_sources[path] = fh.read()
+        else:
+            raise ValueError("Provide either diff or base")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except GitUnavailableError as exc:
+        raise HTTPException(status_code=501, detail=str(exc))
+    result = ChangeImpactAnalyzer(agent, graph).analyze(
+        changes,
+        new_sources,
+        old_sources,
+        tests=payload.tests,
+        max_depth=payload.max_depth,
+        include_unlinked=payload.include_unlinked,
+    )
+    save_dependency_graph()
+    return {"status": "success", "data": result}
 
 
 if __name__ == "__main__":
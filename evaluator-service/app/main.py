@@ -1,17 +1,17 @@
 """ValidationAgent: runs tests and logs results/coverage to BigQuery."""
 from __future__ import annotations
 
-from typing import List
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
 import subprocess
+import threading
 
 from common.models import GeneratedTest
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from pydantic import BaseModel
 import uvicorn
 import os
 
-app = FastAPI()
-
 
 class ValidationAgent:
     """Runs tests locally or via Cloud Build and logs metrics to BigQuery."""
@@ -20,11 +20,14 @@ class ValidationAgent:
         self.bq_dataset = bq_dataset
         self.bq = None
         self.mock = mock
+        self._bq_lock = threading.Lock()
 
     def _init_bq(self):
-        if self.bq is None:
-            from common.gcp_clients import get_bigquery_client
-            self.bq = get_bigquery_client()
+        # The agent is shared between requests; create the client only once
+        with self._bq_lock:
+            if self.bq is None:
+                from common.gcp_clients import get_bigquery_client
+                self.bq = get_bigquery_client()
 
     def run_tests_locally(self, tests: List[GeneratedTest]) -> dict:
         # If mock mode, optionally run pytest on the tests folder and return a fake coverage
@@ -58,14 +61,36 @@ class RunPayload(BaseModel):
     tests: List[GeneratedTest]
 
 
+_agent: Optional[ValidationAgent] = None
+_agent_lock = threading.Lock()
+
+
+def get_validation_agent() -> ValidationAgent:
+    """Return the agent shared by all requests of this worker, creating it once."""
+    global _agent
+    with _agent_lock:
+        if _agent is None:
+            _agent = ValidationAgent(mock=True)
+        return _agent
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Build the worker's agent at startup rather than on the first request."""
+    get_validation_agent()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+
+
 @app.get("/")
 def read_root():
     return {"status": "ok"}
 
 
 @app.post("/run")
-def run_tests(payload: RunPayload):
-    agent = ValidationAgent(mock=True)
+def run_tests(payload: RunPayload, agent: ValidationAgent = Depends(get_validation_agent)):
     results = agent.run_tests_locally(payload.tests)
     agent.log_results(results)
     return {"status": "success", "data": results}
@@ -2,12 +2,29 @@
 
 Functions:
 - redact_pii(text) -> str: returns a redacted copy of text with common PHI patterns masked
+  (results are memoized, see redaction_cache_info() / clear_redaction_cache())
+- redact_pii_slices(text, slices) -> List[str]: redacts many slices of one text with a single scan
+- redact_pii_stream(source) -> Iterator[str]: redacts an iterable of chunks or a text file lazily
+- redact_pii_many(texts) -> List[str]: redacts a batch, spreading large ones over worker processes
+- redact_pii_many_async(texts) -> List[str]: awaitable variant for async request handlers
+- find_phi(text, first_only=False) -> List[PhiFinding]: reports what PHI was found and where
+- find_phi_batch(texts, first_only=True) -> List[List[PhiFinding]]: same for many texts in one scan
 - deny_real_phi_in_tests(code) -> None: raises ValueError if PHI patterns are detected
+- deny_real_phi_in_test_batch(codes) -> None: same check for a batch of generated tests
 """
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import multiprocessing
+import os
 import re
-from typing import Pattern
+import sys
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, Any, Iterable, Iterator, List, NamedTuple, Optional, Pattern, Sequence, Tuple, Union
 
 # Basic regex patterns to catch common PHI/PII items. These are intentionally
 # conservative and designed to catch obvious cases; do not rely on them as a
@@ -28,6 +45,294 @@ _MRN_RE: Pattern = re.compile(r"\bMRN[:#\s]*[A-Za-z0-9-]{4,20}\b", re.IGNORECASE
 # Dates in common formats (YYYY-MM-DD, MM/DD/YYYY, etc.)
 _DATE_RE: Pattern = re.compile(r"\b(?:\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}/\d{2,4})\b")
 
+# PHI kinds in redaction priority order: when two patterns overlap, the kind
+# listed first wins (this is the order the patterns were historically applied).
+_PHI_KINDS: Tuple[Tuple[str, Pattern, str], ...] = (
+    ("email", _EMAIL_RE, "[REDACTED_EMAIL]"),
+    ("phone", _PHONE_RE, "[REDACTED_PHONE]"),
+    ("ssn", _SSN_RE, "[REDACTED_SSN]"),
+    ("mrn", _MRN_RE, "[REDACTED_MRN]"),
+    ("date", _DATE_RE, "[REDACTED_DATE]"),
+)
+_PHI_TOKENS = {kind: token for kind, _, token in _PHI_KINDS}
+
+# Single-pass scanner equivalent to the patterns above. Every alternative
+# starts on one shared trigger character so the regex engine can skip clean
+# text quickly; leading ``\b`` checks are rewritten as look-behinds after the
+# trigger. Emails are anchored on the ``@`` and their local part is recovered
+# by walking backwards (see ``_scan_phi``). The empty group closing each
+# alternative tells us which one matched via ``match.lastindex``.
+_PHI_SCAN_RE: Pattern = re.compile(
+    r"""[\d(+@Mm](?:
+        (?<=[a-zA-Z0-9_.+-]@)[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+()
+      | (?<=\w\+)1[-.\s]?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}\b()
+      | (?<=\w\()\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}\b()
+      | (?<=\d)(?<!\w\d)\d{2}\)?[-.\s]?\d{3}[-.\s]?\d{4}\b()
+      | (?<=\d)(?<!\w\d)\d{2}-\d{2}-\d{4}\b()
+      | (?<=[Mm])(?<!\w[Mm])(?i:rn[:#\s]*[a-z0-9-]{4,20})\b()
+      | (?<=\d)(?<!\w\d)(?:\d{3}-\d{2}-\d{2}|\d?/\d{1,2}/\d{2,4})\b()
+    )""",
+    re.VERBOSE,
+)
+_SCAN_GROUP_KINDS = (None, "email", "phone", "phone", "phone", "ssn", "mrn", "date")
+
+# Characters that may appear in the local part of an email address.
+_EMAIL_LOCAL_CHARS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_.+-")
+
+# Phone numbers and SSNs that start inside an already matched SSN/MRN/date
+# span must win over it. They are at most 17 characters long, so looking this
+# far past the end of the span is enough to see them in full.
+_INNER_PHI_RE: Pattern = re.compile(f"{_PHONE_RE.pattern}|{_SSN_RE.pattern}")
+_INNER_LOOKAHEAD = 32
+
+# Characters no PHI pattern can consume and that are not word characters. No
+# match can cross them, so text on either side can be redacted independently.
+_SEPARATOR_RE: Pattern = re.compile(r"[^\w\s.+\-@()/:#]")
+_LAST_SEPARATOR_RE: Pattern = re.compile(r"(?s:.*)[^\w\s.+\-@()/:#]")
+
+# Streaming redaction cuts the text right after whitespace or a separator.
+# Such a cut is never crossed by a match, and no pattern is longer than the
+# overlap kept in the buffer, except for emails and MRNs padded with an
+# unrealistic amount of whitespace.
+_LAST_CUT_RE: Pattern = re.compile(r"(?s:.*)[^\w.+\-@()/:#]")
+_STREAM_OVERLAP = 1024
+
+# Joins batched texts so they can be scanned in one call; it is a separator,
+# so no match crosses from one text into the next.
+_BATCH_JOINER = "\x00"
+
+# Bulk redaction runs batches totalling fewer characters than this inline;
+# larger ones are split into groups of roughly _POOL_GROUP_CHARS characters
+# and spread across a process pool (REDACTION_WORKERS, default: CPU count).
+_POOL_MIN_CHARS = 1 << 20
+_POOL_GROUP_CHARS = 1 << 18
+
+_redaction_pool: Optional[ProcessPoolExecutor] = None
+_redaction_pool_lock = threading.Lock()
+
+# Pool workers are started from a clean server process rather than forked
+# from the service, whose threads may hold locks at fork time.
+_POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+PhiSpan = Tuple[int, int, str]
+
+
+class PhiFinding(NamedTuple):
+    """A PHI/PII match: its kind, character offsets and 1-based line number."""
+
+    kind: str
+    start: int
+    end: int
+    line: int
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    bytes: int
+
+
+class RedactionCache:
+    """Bounded LRU cache for redaction and detection results.
+
+    Entries are keyed by a BLAKE2b digest of the text, so the cache never
+    holds on to the (possibly PHI-bearing) input itself. The least recently
+    used entries are evicted once either `max_entries` or `max_bytes` (the
+    approximate memory held by cached results) is exceeded. Texts shorter than
+    `min_chars` are cheaper to scan than to hash and are not cached.
+    """
+
+    def __init__(self, max_entries: int = 4096, max_bytes: int = 64 << 20, min_chars: int = 64):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.min_chars = min_chars
+        self._entries: "OrderedDict[bytes, Tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def key(self, op: str, text: str) -> Optional[bytes]:
+        """Return the cache key for `op` applied to `text`, or None if not cacheable."""
+        if self.max_entries <= 0 or len(text) < self.min_chars:
+            return None
+        digest = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16)
+        digest.update(op.encode("ascii"))
+        return digest.digest()
+
+    def get(self, key: bytes, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def put(self, key: bytes, value: Any) -> None:
+        size = sys.getsizeof(value) + len(key)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self._evictions += 1
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._evictions, len(self._entries), self._bytes)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._hits = self._misses = self._evictions = 0
+
+
+_cache = RedactionCache(
+    max_entries=int(os.getenv("REDACTION_CACHE_ENTRIES", "4096")),
+    max_bytes=int(os.getenv("REDACTION_CACHE_BYTES", str(64 << 20))),
+)
+
+
+def redaction_cache_info() -> CacheInfo:
+    """Return hit/miss/eviction counters and current size of the redaction cache."""
+    return _cache.info()
+
+
+def clear_redaction_cache() -> None:
+    """Drop all cached redaction results and reset the counters."""
+    _cache.clear()
+
+
+def _scan_candidates(text: str) -> Tuple[List[PhiSpan], List[bool]]:
+    """Run the single-pass scanner, flagging spans that need exact resolution.
+
+    A span is flagged when it touches the previous span, when a higher
+    priority pattern starts inside it, or when it is an email whose local
+    part runs into the previous span. Only then can the combined scan disagree
+    with applying the patterns one after another.
+    """
+    spans: List[PhiSpan] = []
+    conflicts: List[bool] = []
+    prev_end = 0
+    for m in _PHI_SCAN_RE.finditer(text):
+        kind = _SCAN_GROUP_KINDS[m.lastindex]
+        start, end = m.span()
+        conflict = False
+        if kind == "email":
+            while start > prev_end and text[start - 1] in _EMAIL_LOCAL_CHARS:
+                start -= 1
+            # A non-ASCII word character before the local part changes how a
+            # neighbouring ``\b`` is evaluated once the email is replaced.
+            conflict = start > 0 and (text[start - 1] == "_" or text[start - 1].isalnum())
+            conflict = conflict or (end < len(text) and (text[end] == "_" or text[end].isalnum()))
+        elif kind in ("ssn", "mrn", "date"):
+            inner = _INNER_PHI_RE.search(text, start + 1, end + _INNER_LOOKAHEAD)
+            conflict = inner is not None and inner.start() < end
+        if spans and start <= prev_end:
+            conflict = True
+        spans.append((start, end, kind))
+        conflicts.append(conflict)
+        prev_end = end
+    return spans, conflicts
+
+
+def _sequential_spans(text: str) -> List[PhiSpan]:
+    """Return PHI spans by applying each pattern in priority order.
+
+    Later patterns only see the text left between earlier matches, exactly as
+    if each pattern had been substituted over the output of the previous one.
+    """
+    spans: List[PhiSpan] = []
+    for kind, pattern, _ in _PHI_KINDS:
+        found: List[PhiSpan] = []
+        pos = 0
+        for start, end, _kind in spans + [(len(text), len(text), "")]:
+            gap = text[pos:start]
+            found.extend((pos + m.start(), pos + m.end(), kind) for m in pattern.finditer(gap))
+            pos = end
+        spans = sorted(spans + found)
+    return spans
+
+
+def _scan_phi(text: str) -> List[PhiSpan]:
+    """Return the sorted ``(start, end, kind)`` PHI spans found in `text`.
+
+    The result is identical to applying the individual patterns one after
+    another in ``_PHI_KINDS`` order. The text is scanned once; the rare
+    regions where patterns interact are re-resolved between the nearest
+    separator characters with ``_sequential_spans``.
+    """
+    spans, conflicts = _scan_candidates(text)
+    if not any(conflicts):
+        return spans
+
+    # Grow every conflicting span to a window bounded by separators, merging
+    # windows that touch, and resolve each window exactly.
+    windows: List[Tuple[int, int]] = []
+    i = 0
+    while i < len(spans):
+        if not conflicts[i]:
+            i += 1
+            continue
+        lo = i
+        while True:
+            gap_start = spans[lo - 1][1] if lo > 0 else 0
+            sep = _LAST_SEPARATOR_RE.match(text, gap_start, spans[lo][0])
+            if sep is not None or lo == 0:
+                left = sep.end() if sep is not None else 0
+                break
+            lo -= 1
+        hi = i
+        while True:
+            if hi + 1 < len(spans) and conflicts[hi + 1]:
+                hi += 1
+                continue
+            gap_end = spans[hi + 1][0] if hi + 1 < len(spans) else len(text)
+            sep = _SEPARATOR_RE.search(text, spans[hi][1], gap_end)
+            if sep is not None or hi + 1 == len(spans):
+                right = sep.start() if sep is not None else len(text)
+                break
+            hi += 1
+        if windows and left <= windows[-1][1]:
+            left = windows.pop()[0]
+        windows.append((left, right))
+        i = hi + 1
+
+    resolved: List[PhiSpan] = []
+    pos = 0
+    for left, right in windows:
+        resolved.extend(s for s in spans if pos <= s[0] and s[1] <= left)
+        resolved.extend((left + s, left + e, kind) for s, e, kind in _sequential_spans(text[left:right]))
+        pos = right
+    resolved.extend(s for s in spans if s[0] >= pos)
+    return resolved
+
+
+def _apply_redaction(text: str, spans: List[PhiSpan]) -> str:
+    """Replace every span in `text` with the token for its PHI kind."""
+    if not spans:
+        return text
+    parts: List[str] = []
+    pos = 0
+    for start, end, kind in spans:
+        parts.append(text[pos:start])
+        parts.append(_PHI_TOKENS[kind])
+        pos = end
+    parts.append(text[pos:])
+    return "".join(parts)
+
 
 def redact_pii(text: str) -> str:
     """Return a copy of `text` with detected PHI/PII masked.
@@ -37,23 +342,313 @@ def redact_pii(text: str) -> str:
     if not text:
         return text
 
-    redacted = _EMAIL_RE.sub("[REDACTED_EMAIL]", text)
-    redacted = _PHONE_RE.sub("[REDACTED_PHONE]", redacted)
-    redacted = _SSN_RE.sub("[REDACTED_SSN]", redacted)
-    redacted = _MRN_RE.sub("[REDACTED_MRN]", redacted)
-    redacted = _DATE_RE.sub("[REDACTED_DATE]", redacted)
+    key = _cache.key("redact", text)
+    if key is not None:
+        cached = _cache.get(key)
+        if cached is not None:
+            return cached
+    redacted = _apply_redaction(text, _scan_phi(text))
+    if key is not None:
+        _cache.put(key, redacted)
+    return redacted
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def redact_pii_slices(text: str, slices: Sequence[Tuple[int, int]]) -> List[str]:
+    """Return ``redact_pii(text[start:end])`` for every ``(start, end)`` slice.
+
+    `text` is scanned once and each slice is cut from the redacted result, so
+    overlapping slices (e.g. a class and its methods) cost no extra scans.
+    Slices that a match crosses, or that border on a word character, are
+    redacted on their own instead so the result is the same as redacting
+    each slice.
+    """
+    spans = _scan_phi(text) if text else []
+    starts = [start for start, _, _ in spans]
+    ends = [end for _, end, _ in spans]
+    redacted: List[str] = []
+    for start, end in slices:
+        inner = spans[bisect_right(ends, start):bisect_left(starts, end)]
+        if (
+            (inner and (inner[0][0] < start or inner[-1][1] > end))
+            or (start > 0 and _is_word_char(text[start - 1]))
+            or (end < len(text) and _is_word_char(text[end]))
+        ):
+            redacted.append(redact_pii(text[start:end]))
+            continue
+        redacted.append(_apply_redaction(text[start:end], [(s - start, e - start, k) for s, e, k in inner]))
     return redacted
 
 
+def _read_chunks(source: Union[Iterable[str], IO[str]], chunk_size: int) -> Iterator[str]:
+    read = getattr(source, "read", None)
+    if read is None:
+        yield from source
+        return
+    while True:
+        chunk = read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _find_cut(buffer: str, max_buffer: int) -> Tuple[int, List[PhiSpan]]:
+    """Return a position where `buffer` can be split, and its PHI spans.
+
+    The cut is zero when no safe cut exists yet and the buffer may still
+    grow. Past `max_buffer` characters the buffer is cut regardless, outside
+    any PHI span, so memory stays bounded.
+    """
+    limit = len(buffer) - _STREAM_OVERLAP
+    m = _LAST_CUT_RE.match(buffer, 0, limit)
+    if m is None and len(buffer) < max_buffer:
+        return 0, []
+    spans = _scan_phi(buffer)
+    if m is not None:
+        cut = m.end()
+        # Whitespace may sit inside a phone number or MRN; back off before it.
+        for start, end, _kind in reversed(spans):
+            if end <= cut:
+                break
+            if start < cut:
+                m = _LAST_CUT_RE.match(buffer, 0, start)
+                cut = m.end() if m is not None else 0
+        if cut or len(buffer) < max_buffer:
+            return cut, spans
+    cut = limit
+    for start, end, _kind in spans:
+        if start < cut < end:
+            cut = start or end
+            break
+    return cut, spans
+
+
+def _stream_segments(
+    source: Union[Iterable[str], IO[str]], chunk_size: int, max_buffer: int
+) -> Iterator[Tuple[str, List[PhiSpan]]]:
+    """Split streamed text into segments that can be redacted independently.
+
+    Yields ``(segment, spans)`` pairs whose concatenation is the input text,
+    with the PHI spans of each segment relative to its start.
+    """
+    parts: List[str] = []
+    size = 0
+    for chunk in _read_chunks(source, chunk_size):
+        parts.append(chunk)
+        size += len(chunk)
+        if size < chunk_size + _STREAM_OVERLAP:
+            continue
+        buffer = "".join(parts)
+        cut, spans = _find_cut(buffer, max_buffer)
+        parts = [buffer[cut:]]
+        size = len(parts[0])
+        if cut:
+            yield buffer[:cut], [s for s in spans if s[1] <= cut]
+    buffer = "".join(parts)
+    if buffer:
+        yield buffer, _scan_phi(buffer)
+
+
+def redact_pii_stream(
+    source: Union[Iterable[str], IO[str]],
+    chunk_size: int = 1 << 16,
+    max_buffer: int = 1 << 22,
+) -> Iterator[str]:
+    """Yield redacted chunks of a text read from `source`.
+
+    `source` is an iterable of ``str`` chunks or a text-mode file object, read
+    `chunk_size` characters at a time. The concatenated output equals
+    ``redact_pii`` over the concatenated input, including matches that
+    straddle chunk boundaries. At most about `max_buffer` characters are held
+    in memory however large the input is; if that much text goes by without
+    any whitespace or punctuation the buffer is cut anyway, outside any
+    match found so far.
+
+    Raises ValueError if `max_buffer` is smaller than `chunk_size` plus the
+    overlap kept between chunks, since the buffer could then be cut at every
+    chunk and the output would no longer match ``redact_pii``.
+    """
+    if max_buffer < chunk_size + _STREAM_OVERLAP:
+        raise ValueError(f"max_buffer must be at least chunk_size + {_STREAM_OVERLAP}")
+    return (_apply_redaction(segment, spans) for segment, spans in _stream_segments(source, chunk_size, max_buffer))
+
+
+def _redaction_workers() -> int:
+    return int(os.getenv("REDACTION_WORKERS", "0")) or os.cpu_count() or 1
+
+
+def get_redaction_pool() -> ProcessPoolExecutor:
+    """Return the process-wide pool used for bulk redaction, creating it once."""
+    global _redaction_pool
+    with _redaction_pool_lock:
+        if _redaction_pool is None:
+            _redaction_pool = ProcessPoolExecutor(
+                max_workers=_redaction_workers(), mp_context=multiprocessing.get_context(_POOL_START_METHOD)
+            )
+        return _redaction_pool
+
+
+def shutdown_redaction_pool() -> None:
+    """Shut down the bulk redaction pool, if it was started."""
+    global _redaction_pool
+    with _redaction_pool_lock:
+        if _redaction_pool is not None:
+            _redaction_pool.shutdown()
+            _redaction_pool = None
+
+
+def _redact_group(texts: List[str]) -> List[str]:
+    return [redact_pii(t) for t in texts]
+
+
+def _group_texts(texts: Sequence[str], total: int) -> List[List[str]]:
+    """Split `texts` into contiguous groups of similar character counts.
+
+    Groups are small enough to give every worker several of them, so one
+    oversized text does not leave the other workers idle.
+    """
+    target = max(_POOL_GROUP_CHARS // 4, min(_POOL_GROUP_CHARS, total // (_redaction_workers() * 4)))
+    groups: List[List[str]] = []
+    current: List[str] = []
+    size = 0
+    for t in texts:
+        current.append(t)
+        size += len(t) if t else 0
+        if size >= target:
+            groups.append(current)
+            current, size = [], 0
+    if current:
+        groups.append(current)
+    return groups
+
+
+def redact_pii_many(texts: Sequence[str], min_pool_chars: int = _POOL_MIN_CHARS) -> List[str]:
+    """Return ``redact_pii`` applied to each of `texts`, in order.
+
+    Batches of at least `min_pool_chars` characters are redacted in parallel
+    on the shared process pool; smaller ones are redacted inline, where the
+    pool overhead would outweigh the gain.
+    """
+    total = sum(len(t) for t in texts if t)
+    if total < min_pool_chars:
+        return _redact_group(list(texts))
+    redacted: List[str] = []
+    for group in get_redaction_pool().map(_redact_group, _group_texts(texts, total)):
+        redacted.extend(group)
+    return redacted
+
+
+async def redact_pii_many_async(texts: Sequence[str], min_pool_chars: int = _POOL_MIN_CHARS) -> List[str]:
+    """Awaitable ``redact_pii_many`` that keeps the event loop free.
+
+    Large batches are awaited on the shared process pool and small ones on a
+    worker thread, so neither is redacted on the event loop thread.
+    """
+    total = sum(len(t) for t in texts if t)
+    if total < min_pool_chars:
+        return await asyncio.to_thread(_redact_group, list(texts))
+    loop = asyncio.get_running_loop()
+    pool = get_redaction_pool()
+    groups = await asyncio.gather(
+        *(loop.run_in_executor(pool, _redact_group, group) for group in _group_texts(texts, total))
+    )
+    return [t for group in groups for t in group]
+
+
+def _first_hit(text: str, pos: int = 0) -> Optional[PhiSpan]:
+    """Return the first PHI span the scanner finds at or after `pos`.
+
+    Stops at the first hit. Where patterns overlap, the reported kind is the
+    one the scanner met first, which may differ from what ``redact_pii``
+    replaces it with.
+    """
+    m = _PHI_SCAN_RE.search(text, pos)
+    if m is None:
+        return None
+    kind = _SCAN_GROUP_KINDS[m.lastindex]
+    start, end = m.span()
+    if kind == "email":
+        while start > pos and text[start - 1] in _EMAIL_LOCAL_CHARS:
+            start -= 1
+    return start, end, kind
+
+
+def _findings(text: str, spans: Iterable[PhiSpan], base: int = 0) -> List[PhiFinding]:
+    """Convert spans over `text` into findings relative to offset `base`."""
+    findings: List[PhiFinding] = []
+    line = 1
+    pos = base
+    for start, end, kind in spans:
+        line += text.count("\n", pos, start)
+        pos = start
+        findings.append(PhiFinding(kind, start - base, end - base, line))
+    return findings
+
+
+def find_phi(text: str, first_only: bool = False) -> List[PhiFinding]:
+    """Return the PHI/PII found in `text` as ``PhiFinding`` entries.
+
+    With `first_only`, scanning stops at the first hit and at most one
+    finding is returned; otherwise every span ``redact_pii`` would mask is
+    reported.
+    """
+    if not text:
+        return []
+    if first_only:
+        hit = _first_hit(text)
+        return _findings(text, [hit] if hit else [])
+    return _findings(text, _scan_phi(text))
+
+
+def find_phi_batch(texts: Sequence[str], first_only: bool = True) -> List[List[PhiFinding]]:
+    """Return ``find_phi`` results for every text in `texts`, in order.
+
+    The texts are scanned as one string, so a clean batch costs a single
+    scan. With `first_only` (the default) each text is abandoned at its
+    first hit.
+    """
+    starts: List[int] = []
+    pos = 0
+    for t in texts:
+        starts.append(pos)
+        pos += len(t) + len(_BATCH_JOINER)
+    joined = _BATCH_JOINER.join(texts)
+    results: List[List[PhiFinding]] = [[] for _ in starts]
+    if first_only:
+        pos = 0
+        while True:
+            hit = _first_hit(joined, pos)
+            if hit is None:
+                break
+            i = bisect_right(starts, hit[0]) - 1
+            results[i] = _findings(joined, [hit], starts[i])
+            if i + 1 == len(starts):
+                break
+            pos = starts[i + 1]
+        return results
+    spans = _scan_phi(joined)
+    grouped: List[List[PhiSpan]] = [[] for _ in starts]
+    for span in spans:
+        grouped[bisect_right(starts, span[0]) - 1].append(span)
+    return [_findings(joined, group, starts[i]) for i, group in enumerate(grouped)]
+
+
 def _contains_phi(text: str) -> bool:
     """Return True if any PHI/PII pattern is found in text."""
     if not text:
         return False
-    checks = [_EMAIL_RE, _PHONE_RE, _SSN_RE, _MRN_RE, _DATE_RE]
-    for p in checks:
-        if p.search(text):
-            return True
-    return False
+    key = _cache.key("contains", text)
+    if key is not None:
+        cached = _cache.get(key)
+        if cached is not None:
+            return cached
+    found = _PHI_SCAN_RE.search(text) is not None
+    if key is not None:
+        _cache.put(key, found)
+    return found
 
 
 def deny_real_phi_in_tests(code: str) -> None:
@@ -64,7 +659,27 @@ def deny_real_phi_in_tests(code: str) -> None:
     raise if any common PHI-like patterns are detected.
     """
     if _contains_phi(code):
+        findings = find_phi(code, first_only=True)
         raise ValueError(
-            "Generated test contains patterns that resemble real PHI/PII. "
+            "Generated test contains patterns that resemble real PHI/PII "
+            f"({findings[0].kind} on line {findings[0].line}). "
             "Refuse to save or execute unredacted PHI."
         )
+
+
+def deny_real_phi_in_test_batch(codes: Sequence[str]) -> None:
+    """Raise ValueError if any of `codes` contains real PHI/PII patterns.
+
+    Gates a whole batch of generated tests with a single scan; the error
+    names every offending test by its index in `codes`.
+    """
+    offending = [
+        f"#{i} ({found[0].kind} on line {found[0].line})"
+        for i, found in enumerate(find_phi_batch(codes))
+        if found
+    ]
+    if offending:
+        raise ValueError(
+            "Generated tests contain patterns that resemble real PHI/PII: "
+            f"{', '.join(offending)}. Refuse to save or execute unredacted PHI."
+        )
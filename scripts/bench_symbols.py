@@ -0,0 +1,121 @@
+"""Benchmark symbol extraction against the previous ast.walk-based walker.
+
+Usage:
+  python scripts/bench_symbols.py [--classes 100] [--repeat 3]
+
+Builds one large Python module, checks that the single-pass extractor finds
+every symbol the walker did (plus async functions) and prints timings for
+the tree traversal alone and for full extraction including snippets.
+"""
+import argparse
+import ast
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from code_analysis_service.main import CodeAnalysisAgent, SymbolCache, SymbolExtractor  # noqa: E402
+from common.models import CodeSymbol  # noqa: E402
+from common.security import clear_redaction_cache, redact_pii  # noqa: E402
+
+CLASS_TEMPLATE = '''
+class Mapper{i}(object):
+    """Map resource {i} onto internal records."""
+
+    def load(self, patient_id: str) -> dict:
+        record = self.client.get(f"/Patient/{{patient_id}}", timeout=15)
+        return {{"id": record["id"], "status": record.get("status", "active")}}
+
+    async def refresh(self, ids):
+        values = [v * 1.5 for v in range(10) if v % 2 == 0]
+        return await self.client.bulk(ids, values)
+
+    def transform(self, rows):
+        def clean(row):
+            return {{k: v for k, v in row.items() if v is not None}}
+        return [clean(r) for r in rows]
+
+
+def helper_{i}(value):
+    """Module-level helper {i}."""
+    return value + {i}
+'''
+
+
+def walk_symbols(code):
+    """Extraction as it was implemented before the single-pass visitor."""
+    symbols = []
+    try:
+        tree = ast.parse(code)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.FunctionDef):
+                snippet = ast.get_source_segment(code, node) or ""
+                snippet = redact_pii(snippet)
+                symbols.append(CodeSymbol(name=node.name, kind="function", start_line=node.lineno, code_snippet=snippet))
+            if isinstance(node, ast.ClassDef):
+                snippet = ast.get_source_segment(code, node) or ""
+                snippet = redact_pii(snippet)
+                symbols.append(CodeSymbol(name=node.name, kind="class", start_line=node.lineno, code_snippet=snippet))
+    except Exception:
+        return []
+    return symbols
+
+
+def walk_nodes(tree):
+    nodes = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.FunctionDef):
+            nodes.append(node)
+        if isinstance(node, ast.ClassDef):
+            nodes.append(node)
+    return nodes
+
+
+def visit_nodes(tree):
+    extractor = SymbolExtractor("")
+    extractor.visit(tree)
+    return extractor.nodes
+
+
+def best_of(fn, arg, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        clear_redaction_cache()
+        start = time.perf_counter()
+        result = fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--classes', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    code = "".join(CLASS_TEMPLATE.format(i=i) for i in range(args.classes))
+    tree = ast.parse(code)
+    print(f'{len(code) / 1e6:6.1f} MB, {code.count(chr(10))} lines')
+    old_s, old = best_of(walk_nodes, tree, args.repeat)
+    new_s, new = best_of(visit_nodes, tree, args.repeat)
+    print(f'traversal   ast.walk {old_s:6.3f}s  visitor {new_s:6.3f}s  speedup {old_s / new_s:4.1f}x')
+
+    agent = CodeAnalysisAgent(cache=SymbolCache(max_entries=0))
+    old_s, old = best_of(walk_symbols, code, args.repeat)
+    new_s, new = best_of(agent._parse_symbols, code, args.repeat)
+
+    key = lambda s: (s.start_line, s.name, s.kind, s.code_snippet)  # noqa: E731
+    missing = {key(s) for s in old} - {key(s) for s in new}
+    if missing:
+        print(f'{len(missing)} symbols found by the walker are missing!')
+        return 1
+    print(f'extraction  ast.walk {old_s:6.3f}s  visitor {new_s:6.3f}s  speedup {old_s / new_s:4.1f}x  '
+          f'({len(old)} -> {len(new)} symbols)')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,189 @@
+"""Local stand-in for the Jira search API, for load-testing the bug miner offline.
+
+Usage:
+  python scripts/jira_standin.py serve [--issues 50000] [--rate 0] [--burst 50] [--latency-ms 0] [--port 8099]
+  python scripts/jira_standin.py bench [--issues 50000] [--limit 50000] [--rate 0] [--latency-ms 20]
+
+`serve` answers GET /rest/api/2/search like Jira Cloud does: startAt /
+maxResults paging capped at 100 issues per page, the `total`, JQL ordering
+by `updated` ASC or DESC with an optional `updated >= "yyyy/MM/dd HH:mm"`
+clause, and, with --rate, a token bucket that answers 429 with Retry-After
+once requests exceed `rate` per second (bursts of `burst`). Issues are
+generated from their index, so millions of them cost no memory.
+
+`bench` starts the stand-in on a free local port and mines it through the
+bug miner's AsyncBugMinerAgent, printing bugs per second.
+"""
+import argparse
+import asyncio
+import importlib.util
+import math
+import re
+import socket
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+# Issue i was last updated at BASE + i minutes, so the oldest issue is SIM-1
+BASE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+PAGE_CAP = 100
+STATUSES = [("Open", "new"), ("In Progress", "indeterminate"), ("Done", "done")]
+PRIORITIES = ["Highest", "High", "Medium", "Low"]
+
+_SINCE_RE = re.compile(r'updated\s*>=\s*"(\d{4}/\d{2}/\d{2} \d{2}:\d{2})"')
+_ORDER_RE = re.compile(r"ORDER\s+BY\s+updated\s+(ASC|DESC)", re.IGNORECASE)
+
+
+def issue(i: int) -> dict:
+    status, category = STATUSES[i % len(STATUSES)]
+    description = f"Observation list for encounter {i} renders twice after refresh."
+    if i % 7 == 0:
+        description += f" Reported by patient{i}@example.com, call +1 (555) 010-{i % 10000:04d}."
+    return {
+        "key": f"SIM-{i + 1}",
+        "fields": {
+            "summary": f"Duplicate observations on encounter view ({i % 500})",
+            "description": description,
+            "updated": (BASE + timedelta(minutes=i)).strftime("%Y-%m-%dT%H:%M:%S.000+0000"),
+            "priority": {"name": PRIORITIES[i % len(PRIORITIES)]},
+            "status": {"name": status, "statusCategory": {"key": category}},
+        },
+    }
+
+
+class TokenBucket:
+    """`rate` tokens per second, at most `burst` saved up; rate 0 disables limiting."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.stamp = time.monotonic()
+
+    def take(self) -> float:
+        """Take a token; returns 0, or the seconds to wait when none is left."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+def create_app(
+    issues: int = 50000, rate: float = 0.0, burst: int = 50, latency_ms: float = 0.0, whole_seconds: bool = True
+) -> FastAPI:
+    """The stand-in app; `whole_seconds=False` sends sub-second Retry-After values (for tests)."""
+    app = FastAPI()
+    bucket = TokenBucket(rate, burst)
+    app.state.requests = 0
+    app.state.throttled = 0
+
+    @app.get("/rest/api/2/search")
+    async def search(request: Request):
+        app.state.requests += 1
+        wait = bucket.take()
+        if wait:
+            app.state.throttled += 1
+            return JSONResponse(
+                {"errorMessages": ["Rate limit exceeded"]},
+                status_code=429,
+                headers={"Retry-After": str(max(1, math.ceil(wait)) if whole_seconds else round(wait, 3))},
+            )
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        params = request.query_params
+        jql = params.get("jql", "")
+        start_at = max(0, int(params.get("startAt", 0)))
+        max_results = min(PAGE_CAP, max(0, int(params.get("maxResults", 50))))
+        first = 0
+        since = _SINCE_RE.search(jql)
+        if since:
+            moment = datetime.strptime(since.group(1), "%Y/%m/%d %H:%M").replace(tzinfo=timezone.utc)
+            first = min(issues, max(0, math.ceil((moment - BASE).total_seconds() / 60)))
+        total = issues - first
+        order = _ORDER_RE.search(jql)
+        ascending = bool(order) and order.group(1).upper() == "ASC"
+        positions = range(start_at, min(start_at + max_results, total))
+        indices = [first + p if ascending else issues - 1 - p for p in positions]
+        return {"startAt": start_at, "maxResults": max_results, "total": total, "issues": [issue(i) for i in indices]}
+
+    return app
+
+
+def load_bugminer():
+    path = ROOT / "bugminer-service" / "app" / "main.py"
+    spec = importlib.util.spec_from_file_location("bugminer_main", path)
+    module = sys.modules["bugminer_main"] = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def bench(args) -> int:
+    app = create_app(args.issues, args.rate, args.burst, args.latency_ms)
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    bugminer = load_bugminer()
+    config = {"base_url": f"http://127.0.0.1:{port}", "email": "bench@example.com", "api_token": "bench"}
+
+    async def mine():
+        async with bugminer.build_async_http_client() as client:
+            agent = bugminer.AsyncBugMinerAgent("jira", config, client=client)
+            start = time.perf_counter()
+            count = 0
+            async for _ in agent.iter_recent_bugs(limit=args.limit):
+                count += 1
+            return count, time.perf_counter() - start
+
+    try:
+        count, seconds = asyncio.run(mine())
+    finally:
+        server.should_exit = True
+        thread.join()
+    print(f'mined {count} bugs in {seconds:.2f}s ({count / seconds:,.0f} bugs/s), '
+          f'{app.state.requests} requests, {app.state.throttled} throttled')
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('command', choices=['serve', 'bench'])
+    parser.add_argument('--issues', type=int, default=50000)
+    parser.add_argument('--rate', type=float, default=0.0, help='requests per second before 429s (0: unlimited)')
+    parser.add_argument('--burst', type=int, default=50)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--limit', type=int, default=50000)
+    args = parser.parse_args()
+
+    if args.command == 'bench':
+        return bench(args)
+    uvicorn.run(create_app(args.issues, args.rate, args.burst, args.latency_ms), host="127.0.0.1", port=args.port)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,18 +1,18 @@
 """TestGeneratorAgent: plans tests and generates runnable test code."""
 from __future__ import annotations
 
-from typing import List
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+import threading
 
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from pydantic import BaseModel
 
 from common.models import CodeSymbol, TestIntent, GeneratedTest, Requirement, BugItem
-from common.security import redact_pii, deny_real_phi_in_tests
+from common.security import redact_pii, deny_real_phi_in_tests, deny_real_phi_in_test_batch
 import os
 from pathlib import Path
 
-app = FastAPI()
-
 
 class PlanTestsRequest(BaseModel):
     symbols: List[CodeSymbol]
@@ -60,6 +60,9 @@ class TestGeneratorAgent:
         fname = out_dir / f"test_{intent.id.replace('-', '_')}.py"
         fname.write_text(redacted, encoding="utf-8")
 
+        # Link the test to the symbol it covers for change-impact selection
+        symbol_ids = [symbol.node_id] if symbol is not None else []
+
         # If mock flag is set, return a small set of hardcoded tests with bilingual comments
         if self.mock:
             tests = []
@@ -74,16 +77,42 @@ class TestGeneratorAgent:
                     "# English: autogenerated test B\n# हिन्दी: यह एक स्वचालित परीक्षण B है\n\n def test_sample_b():\n     assert 'a'.upper() == 'A'\n",
                 ),
             ]
-            for fname, body in templates:
+            bodies = [redact_pii(body) for _, body in templates]
+            # Gate the whole batch before anything is written to disk
+            deny_real_phi_in_test_batch(bodies)
+            for (fname, _), redacted in zip(templates, bodies):
                 path = out_dir / fname
-                redacted = redact_pii(body)
-                deny_real_phi_in_tests(redacted)
                 path.write_text(redacted, encoding="utf-8")
-                tests.append(GeneratedTest(intent_id=intent.id, code=redacted, metadata={"path": str(path)}))
+                tests.append(
+                    GeneratedTest(intent_id=intent.id, code=redacted, metadata={"path": str(path)}, symbol_ids=symbol_ids)
+                )
             # Return the first one for compatibility
             return tests[0]
 
-        return GeneratedTest(intent_id=intent.id, code=redacted, metadata={"path": str(fname)})
+        return GeneratedTest(intent_id=intent.id, code=redacted, metadata={"path": str(fname)}, symbol_ids=symbol_ids)
+
+
+_agent: Optional[TestGeneratorAgent] = None
+_agent_lock = threading.Lock()
+
+
+def get_test_generator_agent() -> TestGeneratorAgent:
+    """Return the agent shared by all requests of this worker, creating it once."""
+    global _agent
+    with _agent_lock:
+        if _agent is None:
+            _agent = TestGeneratorAgent()
+        return _agent
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Build the worker's agent at startup rather than on the first request."""
+    get_test_generator_agent()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 @app.get("/")
@@ -92,12 +121,10 @@ def read_root():
 
 
 @app.post("/plan_tests", response_model=List[TestIntent])
-def plan_tests_endpoint(request: PlanTestsRequest):
-    agent = TestGeneratorAgent()
+def plan_tests_endpoint(request: PlanTestsRequest, agent: TestGeneratorAgent = Depends(get_test_generator_agent)):
     return agent.plan_tests(request.symbols, request.requirements, request.bugs)
 
 
 @app.post("/generate_test", response_model=GeneratedTest)
-def generate_test_endpoint(request: GenerateTestRequest):
-    agent = TestGeneratorAgent()
+def generate_test_endpoint(request: GenerateTestRequest, agent: TestGeneratorAgent = Depends(get_test_generator_agent)):
     return agent.generate_test(request.intent, request.symbol)
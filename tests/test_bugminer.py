@@ -0,0 +1,543 @@
+import importlib.util
+import json
+import os
+import sys
+import threading
+
+# Mined bugs are kept in the local store; keep the tests' out of the working tree
+os.environ.setdefault("BUG_STORE_PATH", ":memory:")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_spec = importlib.util.spec_from_file_location("bugminer_main", os.path.join(ROOT, "bugminer-service", "app", "main.py"))
+bugminer = sys.modules["bugminer_main"] = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(bugminer)
+
+JIRA = {"provider": "jira", "base_url": "https://jira.example", "email": "qa@example.com", "api_token": "t"}
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise bugminer.requests.HTTPError(str(self.status_code))
+
+    def json(self):
+        return self.payload
+
+
+class FakeSession:
+    def __init__(self, get=None, post=None):
+        self.get = get
+        self.post = post
+
+
+def fake_jira(total, page_cap=100):
+    """A Jira search endpoint over `total` issues that records the requested offsets."""
+    calls = []
+    lock = threading.Lock()
+
+    def get(url, params=None, **kwargs):
+        with lock:
+            calls.append(params)
+        start = params["startAt"]
+        size = min(params["maxResults"], page_cap)
+        issues = [
+            {"key": f"QA-{i}", "fields": {"summary": f"bug {i}", "description": f"mail qa{i}@example.com"}}
+            for i in range(start, min(start + size, total))
+        ]
+        return FakeResponse({"startAt": start, "maxResults": size, "total": total, "issues": issues})
+
+    return get, calls
+
+
+def test_jira_pages_are_fetched_concurrently_and_yielded_in_order():
+    get, calls = fake_jira(total=1234, page_cap=50)
+    agent = bugminer.BugMinerAgent(provider="jira", config=JIRA, session=FakeSession(get=get))
+
+    bugs = agent.fetch_recent_bugs(limit=1000)
+    assert [b.title for b in bugs] == [f"bug {i}" for i in range(1000)]
+    assert bugs[7].description == "mail [REDACTED_EMAIL]"
+    assert sorted(c["startAt"] for c in calls) == list(range(0, 1000, 50))
+    assert all(c["fields"] == bugminer.JIRA_FIELDS for c in calls)
+
+    calls.clear()
+    assert len(agent.fetch_recent_bugs(limit=5000)) == 1234
+    assert len(calls) == 25
+
+    calls.clear()
+    assert [b.title for b in agent.fetch_recent_bugs(limit=30)] == [f"bug {i}" for i in range(30)]
+    assert len(calls) == 1
+
+
+def test_fetch_ordered_bounds_concurrency():
+    running = []
+    peak = []
+    lock = threading.Lock()
+    release = threading.Event()
+
+    def fetch(n):
+        with lock:
+            running.append(n)
+            peak.append(len(running))
+        release.wait(0.01)
+        with lock:
+            running.remove(n)
+        return n * n
+
+    assert list(bugminer.fetch_ordered(fetch, range(40), concurrency=4)) == [n * n for n in range(40)]
+    assert max(peak) <= 4
+
+
+def test_azure_work_items_are_read_in_200_id_batches():
+    posts = []
+    lock = threading.Lock()
+
+    def post(url, params=None, json=None, **kwargs):
+        with lock:
+            posts.append((url.rsplit("/", 1)[-1], json))
+        if url.endswith("/wiql"):
+            assert params["$top"] == 450
+            return FakeResponse({"workItems": [{"id": i} for i in range(1000, 0, -1)]})
+        assert len(json["ids"]) <= 200 and json["fields"] == bugminer.AZURE_FIELDS
+        value = [{"id": i, "fields": {"System.Title": f"bug {i}"}} for i in json["ids"]]
+        return FakeResponse({"count": len(value), "value": value})
+
+    agent = bugminer.BugMinerAgent(provider="azure", config={"org": "org", "pat": "p"}, session=FakeSession(post=post))
+    bugs = agent.fetch_recent_bugs(project="proj", limit=450)
+    assert [b.title for b in bugs] == [f"bug {i}" for i in range(1000, 550, -1)]
+    assert sorted(len(body["ids"]) for name, body in posts if name == "workitemsbatch") == [50, 200, 200]
+
+
+def test_agents_share_one_pooled_session():
+    first = bugminer.BugMinerAgent(provider="jira", config=JIRA)
+    second = bugminer.BugMinerAgent(provider="azure")
+    assert first.session is second.session is bugminer.get_http_session()
+    adapter = first.session.get_adapter("https://jira.example")
+    assert adapter._pool_maxsize == bugminer.HTTP_POOL_SIZE
+    assert adapter.max_retries.total == bugminer.HTTP_RETRIES
+    assert 429 in adapter.max_retries.status_forcelist
+
+
+def test_async_agents_mine_providers_concurrently(monkeypatch):
+    import asyncio
+
+    import httpx
+
+    monkeypatch.setattr(bugminer, "PROVIDER_MAX_RETRIES", 0)
+
+    async def handler(request):
+        if request.url.host == "jira.example":
+            start = int(request.url.params["startAt"])
+            size = min(int(request.url.params["maxResults"]), 50)
+            issues = [{"fields": {"summary": f"jira {i}"}} for i in range(start, min(start + size, 120))]
+            return httpx.Response(200, json={"maxResults": size, "total": 120, "issues": issues})
+        if request.url.path.endswith("/wiql"):
+            return httpx.Response(200, json={"workItems": [{"id": i} for i in range(1, 301)]})
+        if request.url.path.endswith("/workitemsbatch"):
+            ids = json.loads(request.content)["ids"]
+            return httpx.Response(200, json={"value": [{"fields": {"System.Title": f"azure {i}"}} for i in ids]})
+        return httpx.Response(503)
+
+    async def mine():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        jira = bugminer.AsyncBugMinerAgent(provider="jira", config=JIRA, client=client)
+        azure = bugminer.AsyncBugMinerAgent(provider="azure", config={"org": "org", "pat": "p"}, client=client)
+        broken = bugminer.AsyncBugMinerAgent(provider="jira", config=dict(JIRA, base_url="https://down.example"), client=client)
+        got = {0: [], 1: [], 2: []}
+        async for index, item in bugminer.mine_concurrently(
+            [jira.iter_recent_bugs(limit=100), azure.iter_recent_bugs(project="proj", limit=250), broken.iter_recent_bugs(limit=10)]
+        ):
+            got[index].append(item)
+        await client.aclose()
+        return got
+
+    got = asyncio.run(mine())
+    assert [b.title for b in got[0]] == [f"jira {i}" for i in range(100)]
+    assert [b.title for b in got[1]] == [f"azure {i}" for i in range(1, 251)]
+    assert len(got[2]) == 1 and isinstance(got[2][0], bugminer.httpx.HTTPStatusError)
+
+
+def test_mine_endpoint_streams_ndjson_from_several_sources(tmp_path):
+    from fastapi.testclient import TestClient
+
+    for name in ("a", "b"):
+        bugs = [{"title": f"{name}{i}", "description": "mail qa@example.com"} for i in range(3)]
+        (tmp_path / f"{name}.json").write_text(json.dumps({"bugs": bugs}))
+    sources = [{"mock": True, "mock_file": str(tmp_path / f"{name}.json")} for name in ("a", "b")]
+    with TestClient(bugminer.app) as client:
+        resp = client.post("/mine", json={"sources": sources})
+        assert resp.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in resp.text.splitlines()]
+        assert sorted(line["title"] for line in lines) == ["a0", "a1", "a2", "b0", "b1", "b2"]
+        assert lines[0]["description"] == "mail [REDACTED_EMAIL]"
+        run = client.post("/run", json=sources[0]).json()
+    assert [b["title"] for b in run["data"]] == ["a0", "a1", "a2"]
+
+
+def test_incremental_runs_fetch_only_changes_since_the_watermark(tmp_path, monkeypatch):
+    from datetime import datetime, timedelta, timezone
+
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(bugminer, "BUGMINER_STATE_DIR", str(tmp_path / "state"))
+    dump = tmp_path / "bugs.json"
+
+    def write(bugs):
+        dump.write_text(json.dumps({"bugs": [{"id": i, "title": t, "updated_at": u} for i, t, u in bugs]}))
+
+    write([("QA-1", "first", "2024-05-01T10:00:00+00:00"), ("QA-2", "second", "2024-05-02T10:00:00+00:00")])
+    source = {"mock": True, "mock_file": str(dump), "incremental": True}
+    with TestClient(bugminer.app) as client:
+        assert [b["id"] for b in client.post("/run", json=source).json()["data"]] == ["QA-1", "QA-2"]
+        # Bugs already mined at the watermark are not returned again
+        assert client.post("/run", json=source).json()["data"] == []
+        write([
+            ("QA-1", "first, reopened", "2024-05-03T09:00:00+00:00"),
+            ("QA-2", "second", "2024-05-02T10:00:00+00:00"),
+            ("QA-3", "third", "2024-05-03T10:00:00+00:00"),
+        ])
+        assert [b["id"] for b in client.post("/run", json=source).json()["data"]] == ["QA-1", "QA-3"]
+        assert client.get("/bugs/QA-1").json()["data"]["title"] == "first, reopened"
+
+    (path,) = (tmp_path / "state").iterdir()
+    assert bugminer.SourceCache.load(str(path)).watermark == datetime(2024, 5, 3, 10, tzinfo=timezone.utc)
+
+    since = datetime(2024, 5, 3, 15, 30, 12, tzinfo=timezone(timedelta(hours=5, minutes=30)))
+    jql = bugminer.jira_page_params(0, 100, since)["jql"]
+    assert jql == 'issuetype=Bug AND updated >= "2024/05/03 15:30" ORDER BY updated ASC'
+    assert "[System.ChangedDate] >= '2024-05-03T10:00:12.000000Z'" in bugminer.azure_wiql("proj", since)["query"]
+
+
+def test_incremental_first_runs_and_concurrent_runs_keep_a_safe_watermark(tmp_path):
+    import asyncio
+    from datetime import datetime, timedelta, timezone
+
+    base = datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+    class Source:
+        """Six bugs, newest first without `since`; fails after three when `fail` is set."""
+
+        def __init__(self, fail=False):
+            self.fail = fail
+            self.since = []
+
+        async def iter_recent_bugs(self, project="", limit=50, since=None, seen=()):
+            self.since.append(since)
+            days = range(1, 7) if since else range(6, 0, -1)
+            for n, day in enumerate(days):
+                if self.fail and n == 3:
+                    raise RuntimeError("page 2 failed")
+                bug = bugminer.BugItem(id=f"B{day}", title="b", updated_at=base + timedelta(days=day))
+                if bugminer.is_new(bug, since, seen):
+                    yield bug
+
+    async def run(source, path, store=None):
+        return [bug.id async for bug in bugminer.iter_incremental(source, bugminer.SourceCache(path), limit=6, store=store)]
+
+    path = str(tmp_path / "state" / "src.json")
+    store = bugminer.BugStore()
+    try:
+        asyncio.run(run(Source(fail=True), path, store))
+    except RuntimeError:
+        pass
+    # The newest bugs of an unfinished first run are kept, but no watermark that would skip B1-B3
+    assert store.count() == 3 and not os.path.exists(path)
+
+    source = Source()
+
+    async def concurrently():
+        return await asyncio.gather(run(source, path, store), run(source, path, store))
+
+    first, second = asyncio.run(concurrently())
+    assert first == ["B6", "B5", "B4", "B3", "B2", "B1"] and second == []
+    assert source.since == [None, base + timedelta(days=6)] and store.count() == 6
+    assert bugminer.SourceCache.load(path).watermark == base + timedelta(days=6)
+    assert os.listdir(tmp_path / "state") == ["src.json"]
+
+
+def test_incremental_jira_runs_advance_through_a_busy_minute(tmp_path):
+    import asyncio
+    import re
+    from datetime import datetime, timedelta, timezone
+
+    import httpx
+
+    # 100 bugs updated within one minute, two at each timestamp, after an older one
+    minute = datetime(2024, 5, 1, 10, 0, tzinfo=timezone.utc)
+    issues = [("B-0", minute - timedelta(hours=1))] + [
+        (f"B-{i}", minute + timedelta(seconds=(i - 1) // 2)) for i in range(1, 101)
+    ]
+
+    def search(request):
+        params = request.url.params
+        since = re.search(r'updated >= "([^"]+)"', params["jql"])
+        start = datetime.strptime(since.group(1), "%Y/%m/%d %H:%M").replace(tzinfo=timezone.utc)
+        rows = [r for r in issues if r[1] >= start]
+        start_at, size = int(params["startAt"]), int(params["maxResults"])
+        page = [
+            {"key": key, "fields": {"summary": key, "updated": at.strftime("%Y-%m-%dT%H:%M:%S.000+0000")}}
+            for key, at in rows[start_at:start_at + size]
+        ]
+        return httpx.Response(200, json={"startAt": start_at, "maxResults": size, "total": len(rows), "issues": page})
+
+    path = str(tmp_path / "jira.json")
+    bugminer.SourceCache(path, minute - timedelta(hours=1), {"jira:jira.test:B-0"}).save()
+
+    async def runs(count):
+        async with httpx.AsyncClient(transport=httpx.MockTransport(search)) as client:
+            agent = bugminer.AsyncBugMinerAgent("jira", dict(JIRA, base_url="http://jira.test"), client=client)
+            return [[bug.id async for bug in bugminer.iter_incremental(agent, bugminer.SourceCache(path), limit=50)] for _ in range(count)]
+
+    mined = asyncio.run(runs(3))
+    ids = [f"jira:jira.test:B-{i}" for i in range(1, 101)]
+    assert mined == [ids[:50], ids[50:], []]
+    assert bugminer.SourceCache.load(path).seen == {"jira:jira.test:B-99", "jira:jira.test:B-100"}
+
+    # Keys are namespaced by site, so equal keys of two trackers do not collide
+    data = {"issues": [{"key": "B-1", "fields": {"summary": "x"}}]}
+    sites = ["https://one.example/rest/api/2/search", "https://Two.example/rest/api/2/search"]
+    assert [next(bugminer.jira_bugs(data, source=bugminer.jira_source(u))).id for u in sites] == [
+        "jira:one.example:B-1",
+        "jira:two.example:B-1",
+    ]
+    api, _ = bugminer.azure_api({"org": "Contoso", "pat": "p"}, "web")
+    assert next(bugminer.azure_bugs({"value": [{"id": 7, "fields": {}}]}, source=bugminer.azure_source(api))).id == "azure:contoso:7"
+
+
+def test_bug_store_indexes_status_severity_and_requirements(tmp_path):
+    from fastapi.testclient import TestClient
+
+    store = bugminer.BugStore(str(tmp_path / "bugs.db"))
+    bugs = [
+        bugminer.BugItem(id="QA-1", title="a", severity="High", related_requirements=["REQ-1", "REQ-2"]),
+        bugminer.BugItem(id="QA-2", title="b", severity="Low", status="resolved", related_requirements=["REQ-2"]),
+        bugminer.BugItem(id="QA-3", title="c", severity="High", status="resolved"),
+    ]
+    assert store.upsert(bugs) == 3
+    assert [b.id for b in store.query(severity="High")] == ["QA-1", "QA-3"]
+    assert [b.id for b in store.query(requirement="REQ-2", status="resolved")] == ["QA-2"]
+    store.upsert([bugs[0].model_copy(update={"title": "a2", "related_requirements": ["REQ-3"]})])
+    assert store.count(requirement="REQ-1") == 0 and store.get("QA-1").title == "a2"
+    plan = store._conn.execute("EXPLAIN QUERY PLAN SELECT id FROM bugs WHERE severity = 'High'").fetchall()
+    assert "bugs_severity" in str(plan)
+    # Most recently updated first, whatever the tracker's UTC offset
+    store.upsert([
+        bugminer.BugItem(id="JR-1", title="j", updated_at=bugminer.parse_timestamp("2024-05-01T10:00:00.000+0530")),
+        bugminer.BugItem(id="AZ-9", title="a", updated_at=bugminer.parse_timestamp("2024-05-01T06:00:00Z")),
+    ])
+    store._conn.execute("UPDATE bugs SET updated_at = '2024-05-01T07:00:00+05:30' WHERE id = 'QA-1'")
+    store.close()
+    store = bugminer.BugStore(str(tmp_path / "bugs.db"))
+    # QA-1 was written in the old offset format and is normalized on open (01:30Z)
+    assert [b.id for b in store.query()][:3] == ["AZ-9", "JR-1", "QA-1"]
+    assert [b.id for b in store.query(requirement="REQ-3")] == ["QA-1"]
+
+    dump = tmp_path / "dump.json"
+    dump.write_text(json.dumps({"bugs": [
+        {"id": "AZ-1", "title": "x", "status": "Active", "severity": "1 - Critical", "related_requirements": ["REQ-9"]},
+        {"id": "AZ-2", "title": "y", "status": "Closed"},
+    ]}))
+    bugminer._bug_store = bugminer.BugStore()
+    with TestClient(bugminer.app) as client:
+        client.post("/run", json={"mock": True, "mock_file": str(dump)})
+        found = client.get("/bugs", params={"requirement": "REQ-9"}).json()
+        assert found["total"] == 1 and found["data"][0]["status"] == "in_progress"
+        assert [b["id"] for b in client.get("/bugs", params={"status": "closed"}).json()["data"]] == ["AZ-2"]
+        assert client.get("/bugs/AZ-1").json()["data"]["severity"] == "1 - Critical"
+        assert client.get("/bugs/nope").status_code == 404
+
+
+def test_near_duplicate_bugs_are_clustered_with_one_representative():
+    from fastapi.testclient import TestClient
+
+    BugItem = bugminer.BugItem
+    text = "Patient search returns stale results after the encounter is updated from the mobile app and the cache is not invalidated"
+    bugs = [
+        BugItem(id="J-1", title="Stale patient search", description=text + " for jane@example.com"),
+        BugItem(id="A-7", title="Stale patient search", description=text + " for john@example.com"),
+        BugItem(id="J-2", title="Stale patient search results", description=text + " again"),
+        BugItem(id="J-3", title="Lab report PDF export fails", description="Exporting a lab report to PDF raises a timeout for large panels"),
+    ]
+    clusters = bugminer.deduplicate(bugs)
+    assert [(c.representative.id, c.duplicate_ids) for c in clusters] == [("J-1", ["A-7", "J-2"]), ("J-3", [])]
+    assert bugminer.signature_similarity(*(bugminer.minhash(bugminer.shingles(t)) for t in (text, text))) == 1.0
+
+    with TestClient(bugminer.app) as client:
+        body = client.post("/dedupe", json={"bugs": [b.model_dump(mode="json") for b in bugs]}).json()
+        assert [c["representative"]["id"] for c in body["data"]] == ["J-1", "J-3"]
+        assert client.post("/dedupe", json={"bugs": [], "threshold": 0}).status_code == 400
+
+
+def test_provider_plugins_and_jira_standin_pagination(tmp_path, monkeypatch):
+    import asyncio
+    from datetime import datetime, timezone
+
+    import httpx
+    from fastapi.testclient import TestClient
+
+    spec = importlib.util.spec_from_file_location("jira_standin", os.path.join(ROOT, "scripts", "jira_standin.py"))
+    standin = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(standin)
+
+    @bugminer.register_provider("static")
+    async def static_pages(query):
+        for start in range(0, query.limit, 2):
+            yield [bugminer.BugItem(id=f"S-{i}", title=query.project) for i in range(start, min(start + 2, query.limit))]
+
+    async def mine():
+        transport = httpx.ASGITransport(app=standin.create_app(issues=1234))
+        async with httpx.AsyncClient(transport=transport) as client:
+            config = dict(JIRA, base_url="http://standin")
+            jira = bugminer.AsyncBugMinerAgent("jira", config, client=client)
+            latest = await jira.fetch_recent_bugs(limit=1000)
+            since = datetime(2024, 1, 1, 20, 0, tzinfo=timezone.utc)
+            changed = await jira.fetch_recent_bugs(limit=1000, since=since)
+            pages = [len(p) async for p in bugminer.AsyncBugMinerAgent("static", client=client).iter_pages("p", limit=5)]
+            return latest, changed, pages
+
+    @bugminer.register_provider("flaky")
+    async def flaky_pages(query):
+        yield [bugminer.BugItem(id="F-1", title="first page")]
+        raise RuntimeError("page 2 failed")
+
+    def on_loop(text):
+        raise AssertionError("async plugins redact whole pages off the event loop")
+
+    monkeypatch.setattr(bugminer, "redact_pii", on_loop)
+    try:
+        latest, changed, pages = asyncio.run(mine())
+        assert [b.id for b in bugminer.BugMinerAgent("static").fetch_recent_bugs("p", limit=3)] == ["S-0", "S-1", "S-2"]
+        with TestClient(bugminer.app) as client:
+            body = client.post("/run", json={"provider": "flaky", "project": "p"}).json()
+    finally:
+        del bugminer.BUG_PROVIDERS["static"], bugminer.BUG_PROVIDERS["flaky"]
+    # A source failing part way still returns what it mined
+    assert body["status"] == "partial" and [b["id"] for b in body["data"]] == ["F-1"]
+    assert body["error"] == {"provider": "flaky", "project": "p", "message": "page 2 failed"}
+    assert [b.id for b in latest[:2]] == ["jira:standin:SIM-1234", "jira:standin:SIM-1233"] and len(latest) == 1000
+    assert len({b.id for b in latest}) == 1000
+    assert latest[0].status == bugminer.BugStatus.open and "[REDACTED_EMAIL]" in latest[1].description
+    # 20:00 is issue index 1200 (one per minute); changes come oldest first
+    assert [b.id for b in changed] == [f"jira:standin:SIM-{i}" for i in range(1201, 1235)]
+    assert pages == [2, 2, 1]
+    assert bugminer.BugMinerAgent("nope").fetch_recent_bugs() == []
+
+
+def test_scheduler_honours_retry_after_and_adapts_concurrency(monkeypatch):
+    import asyncio
+    from email.utils import format_datetime
+    from datetime import datetime, timedelta, timezone
+
+    import httpx
+
+    monkeypatch.setattr(bugminer, "HTTP_BACKOFF", 0.01)
+    spec = importlib.util.spec_from_file_location("jira_standin", os.path.join(ROOT, "scripts", "jira_standin.py"))
+    standin = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(standin)
+    # A stand-in that allows 3 requests and then one more every 25 ms
+    app = standin.create_app(issues=1500, rate=40, burst=3, whole_seconds=False)
+
+    async def mine():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app)) as client:
+            agent = bugminer.AsyncBugMinerAgent("jira", dict(JIRA, base_url="http://standin"), client=client)
+            bugs = await agent.fetch_recent_bugs(limit=1500)
+            return bugs, bugminer.get_host_scheduler("http://standin/rest/api/2/search").stats()
+
+    bugs, stats = asyncio.run(mine())
+    assert len({b.id for b in bugs}) == 1500
+    assert app.state.throttled > 0 and stats["throttled"] == app.state.throttled
+    assert stats["requests"] == app.state.requests and stats["in_flight"] == 0
+
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 28 < bugminer.retry_after_seconds(later) <= 30
+    assert bugminer.retry_after_seconds("2") == 2.0 and bugminer.retry_after_seconds("soon") is None
+
+    scheduler = bugminer.HostScheduler(max_concurrency=8)
+    for _ in range(40):
+        scheduler.in_flight += 1
+        scheduler.release(200, 0.01)
+    assert scheduler.limit == 8
+    scheduler.in_flight += 1
+    scheduler.release(429, 0.01, pause=5)
+    assert scheduler.limit == 4 and scheduler._try_acquire() > 4
+
+
+def test_mock_dumps_are_streamed_lazily_and_respect_limit(tmp_path):
+    import io
+
+    doc = {
+        "exported": {"by": "qa", "counts": [1, 2, 3], "note": "braces } ] and \"quotes\""},
+        "version": 12345678,
+        "bugs": [
+            {
+                "id": f"M-{i}",
+                "title": f"bug {i} é中",
+                "description": "esc \\\" \\n " * (i % 3),
+                "severity": 10 ** i,
+                "score": [1.5 * 10 ** -i, -2.25e21 * i],
+            }
+            for i in range(25)
+        ],
+        "trailer": None,
+    }
+    text = json.dumps(doc, indent=1)
+    for chunk_size in (1, 7, 64, 1 << 20):
+        items = list(bugminer.iter_json_array(io.StringIO(text), "bugs", chunk_size=chunk_size))
+        assert items == doc["bugs"]
+    assert list(bugminer.iter_json_array(io.StringIO('{"bugs": []}'), "bugs")) == []
+
+    # Numbers cut at a chunk boundary after "." or "e" are read whole
+    text_numbers = json.dumps({"bugs": [1.25, 2e-7, 3.5E+12, -4.0, 5]}, separators=(",", ":"))
+    for chunk_size in range(1, 12):
+        assert list(bugminer.iter_json_array(io.StringIO(text_numbers), "bugs", chunk_size=chunk_size)) == [
+            1.25, 2e-7, 3.5e12, -4.0, 5
+        ]
+
+    # A dump whose tail is cut off yields its first bugs, then reports the damage;
+    # a limit stops before it
+    dump = tmp_path / "dump.json"
+    dump.write_text(text[: text.index('"M-20"')])
+    mined = []
+    try:
+        for bug in bugminer.iter_mock_bugs(str(dump)):
+            mined.append(bug.id)
+        assert False, "Expected ValueError"
+    except ValueError as exc:
+        assert "Malformed bug export" in str(exc)
+    assert mined == [f"M-{i}" for i in range(20)]
+    agent = bugminer.BugMinerAgent(mock=True, mock_file=str(dump))
+    assert [b.id for b in agent.fetch_recent_bugs(limit=3)] == ["M-0", "M-1", "M-2"]
+
+    async def first_page():
+        agent = bugminer.AsyncBugMinerAgent(mock=True, mock_file=str(dump), client=object())
+        return [b.id async for b in agent.iter_recent_bugs(limit=4)]
+
+    import asyncio
+
+    assert asyncio.run(first_page()) == ["M-0", "M-1", "M-2", "M-3"]
+
+    from fastapi.testclient import TestClient
+
+    with TestClient(bugminer.app) as client:
+        body = client.post("/run", json={"mock": True, "mock_file": str(dump)}).json()
+    assert body["status"] == "partial" and len(body["data"]) == 20
+
+
+def test_lifespan_shares_agents_and_store_and_closes_them(tmp_path):
+    from fastapi.testclient import TestClient
+
+    dump = tmp_path / "bugs.json"
+    dump.write_text(json.dumps({"bugs": [{"id": "QA-1", "title": "a"}]}))
+    source = {"mock": True, "mock_file": str(dump), "config": {"b": 1, "a": 2}}
+    with TestClient(bugminer.app) as client:
+        store = bugminer._bug_store
+        assert store is not None
+        client.post("/run", json=source)
+        agent = bugminer._async_agent(bugminer.RunPayload(**dict(source, config={"a": 2, "b": 1})))
+        client.post("/run", json=source)
+        assert list(bugminer._async_agents.values()) == [agent]
+        assert client.get("/bugs/QA-1").json()["data"]["title"] == "a"
+    assert bugminer._bug_store is None and not bugminer._async_agents
@@ -0,0 +1,462 @@
+from code_analysis_service.main import CodeAnalysisAgent, SymbolCache
+from common.security import redact_pii
+
+
+SOURCE = '''
+class PatientService:
+    def lookup(self, patient_id):
+        return {"id": patient_id}
+
+
+def helper():
+    return 1
+'''
+
+
+def test_incremental_extraction_reuses_unchanged_files():
+    agent = CodeAnalysisAgent(cache=SymbolCache())
+    files = {"svc.py": SOURCE, "util.py": "def util():\n    return 2\n"}
+    first, stats = agent.extract_symbols_incremental(files)
+    assert stats == {"parsed": 2, "cached": 0}
+
+    files["util.py"] = "def util():\n    return 3\n"
+    second, stats = agent.extract_symbols_incremental(files)
+    assert stats == {"parsed": 1, "cached": 1}
+    # Symbols of the unchanged file keep their ids
+    assert [s.id for s in first if s.file_path == "svc.py"] == [s.id for s in second if s.file_path == "svc.py"]
+    assert {s.file_path for s in second} == {"svc.py", "util.py"}
+
+    # Identical content at two paths shares the parse but not the ids
+    copies, stats = agent.extract_symbols_incremental({"x/a.py": SOURCE, "y/a.py": SOURCE})
+    assert stats == {"parsed": 0, "cached": 2}
+    assert len({s.id for s in copies}) == len(copies) == 6
+
+    # Large snippets count against the byte bound, not just the entry count
+    big = "def big():\n" + "    x = 1\n" * 20000
+    cache = SymbolCache(max_entries=100, max_bytes=300_000)
+    agent = CodeAnalysisAgent(cache=cache)
+    _, stats = agent.extract_symbols_incremental({"a.py": big, "b.py": big + "\n", "c.py": SOURCE})
+    _, stats = agent.extract_symbols_incremental({"a.py": big, "c.py": SOURCE})
+    assert stats == {"parsed": 1, "cached": 1}
+    assert cache._bytes <= cache.max_bytes
+
+
+def test_repository_mode_streams_symbols_from_directory_and_tarball(tmp_path, monkeypatch):
+    import json
+    import tarfile
+
+    from fastapi.testclient import TestClient
+
+    from code_analysis_service.main import app
+
+    repo = tmp_path / "repo"
+    (repo / "pkg").mkdir(parents=True)
+    (repo / "pkg" / "svc.py").write_text(SOURCE, encoding="utf-8")
+    (repo / "pkg" / "notes.txt").write_text("def not_python(): pass", encoding="utf-8")
+    (repo / "node_modules").mkdir()
+    (repo / "node_modules" / "skip.py").write_text("def skipped(): pass", encoding="utf-8")
+    archive = tmp_path / "repo.tar.gz"
+    with tarfile.open(archive, "w:gz") as tar:
+        tar.add(repo, arcname="repo")
+    # Links out of the repository are not followed
+    (tmp_path / "outside").mkdir()
+    (tmp_path / "outside" / "secret.py").write_text("def secret(): pass", encoding="utf-8")
+    (repo / "pkg" / "leak.py").symlink_to(tmp_path / "outside" / "secret.py")
+    (repo / "linked").symlink_to(tmp_path / "outside", target_is_directory=True)
+
+    client = TestClient(app)
+    monkeypatch.delenv("CODE_ANALYSIS_ROOT", raising=False)
+    assert client.post("/run_repository", json={"path": str(repo)}).status_code == 403
+    monkeypatch.setenv("CODE_ANALYSIS_ROOT", str(repo / "pkg"))
+    assert client.post("/run_repository", json={"path": str(repo)}).status_code == 403
+    monkeypatch.setenv("CODE_ANALYSIS_ROOT", str(tmp_path))
+    for path in (repo, archive):
+        resp = client.post("/run_repository", json={"path": str(path)})
+        assert resp.status_code == 200
+        symbols = [json.loads(line) for line in resp.text.splitlines()]
+        assert sorted(s["name"] for s in symbols) == ["PatientService", "helper", "lookup"]
+        assert all(s["file_path"].endswith("svc.py") for s in symbols)
+    assert client.post("/run_repository", json={"path": str(tmp_path / "missing")}).status_code == 400
+
+
+def test_extractor_fills_qualified_names_end_lines_and_docstrings():
+    code = '''
+class Outer:
+    """Outer docs."""
+
+    class Inner:
+        async def fetch(self):
+            """Fetch for jane@example.com"""
+            def parse(raw):
+                return raw
+            return parse(1)
+
+
+if True:
+    def conditional():
+        pass
+'''
+    symbols = {s.qualified_name: s for s in CodeAnalysisAgent(cache=SymbolCache())._parse_symbols(code)}
+    assert list(symbols) == [
+        "Outer",
+        "Outer.Inner",
+        "Outer.Inner.fetch",
+        "Outer.Inner.fetch.<locals>.parse",
+        "conditional",
+    ]
+    assert symbols["Outer"].docstring == "Outer docs."
+    assert (symbols["Outer"].start_line, symbols["Outer"].end_line) == (2, 10)
+    fetch = symbols["Outer.Inner.fetch"]
+    assert (fetch.name, fetch.kind, fetch.end_line) == ("fetch", "function", 10)
+    assert fetch.docstring == "Fetch for [REDACTED_EMAIL]"
+    assert symbols["conditional"].docstring is None
+
+
+def test_snippets_match_get_source_segment_with_crlf_and_unicode():
+    import ast
+
+    code = (
+        "class Café:\r\n"
+        "    def naïve(self): return 'é' * 2\r\n"
+        "    x = 1; y = 2\r\n"
+        "\r\n"
+        "def call(): return '555-123-4567'\n"
+        "if True: \f\n"
+        "    def after_ff(): pass\n"
+    )
+    tree = ast.parse(code)
+    expected = {
+        node.name: redact_pii(ast.get_source_segment(code, node))
+        for node in ast.walk(tree)
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef))
+    }
+    symbols = CodeAnalysisAgent(cache=SymbolCache())._parse_symbols(code)
+    assert {s.name: s.code_snippet for s in symbols} == expected
+    assert "[REDACTED_PHONE]" in expected["call"]
+
+
+def test_snippets_by_reference_resolve_through_snippet_endpoint():
+    from fastapi.testclient import TestClient
+
+    from code_analysis_service.main import app
+
+    client = TestClient(app)
+    code = SOURCE.replace('{"id": patient_id}', '{"id": patient_id, "mrn": "MRN: AB1234"}')
+    inline = client.post("/run", json={"code": code}).json()["data"]
+    by_ref = client.post("/run", json={"code": code, "inline_snippets": False}).json()["data"]
+    assert [s["code_snippet"] for s in by_ref] == [None] * len(inline)
+
+    for inline_sym, ref_sym in zip(inline, by_ref):
+        resp = client.get(f"/snippet/{ref_sym['snippet_ref']}")
+        assert resp.status_code == 200
+        assert resp.json()["data"]["code_snippet"] == inline_sym["code_snippet"]
+    assert "[REDACTED_MRN]" in inline[0]["code_snippet"]
+
+    assert client.get("/snippet/not-a-ref").status_code == 400
+    assert client.get(f"/snippet/{'0' * 32}:1-2").status_code == 404
+
+    # Spans that are not whole lines, also in recovery mode
+    cases = [
+        {"code": "class A { m() { return 1; } n() { return 2; } }\n", "file_path": "a.js"},
+        {"code": "const h = () => 1, k = 2;\n", "file_path": "h.ts"},
+        {"code": "def f():\n    return 1  # trailing\n", "file_path": "f.py"},
+        {"code": "def broken(:\n    pass\n\ndef ok():  return 1\n", "file_path": "r.py", "recover": True},
+    ]
+    for case in cases:
+        inline = client.post("/run", json=case).json()["data"]
+        by_ref = client.post("/run", json=dict(case, inline_snippets=False)).json()["data"]
+        assert inline and len(by_ref) == len(inline)
+        for inline_sym, ref_sym in zip(inline, by_ref):
+            fetched = client.get(f"/snippet/{ref_sym['snippet_ref']}").json()["data"]["code_snippet"]
+            assert fetched == inline_sym["code_snippet"], case
+
+
+def test_snippet_refs_resolve_on_another_replica_through_the_source_dir(tmp_path):
+    from code_analysis_service.main import CodeAnalysisAgent, SourceStore, SymbolCache
+
+    code = "def f():\r\n    return 'MRN: AB1234'\r\n"
+    issuing = CodeAnalysisAgent(cache=SymbolCache(), sources=SourceStore(directory=str(tmp_path)))
+    [inline] = issuing.extract_symbols(code)
+    [by_ref] = issuing.extract_symbols(code, inline_snippets=False)
+
+    other = CodeAnalysisAgent(cache=SymbolCache(), sources=SourceStore(directory=str(tmp_path)))
+    assert other.snippet(by_ref.snippet_ref) == inline.code_snippet
+    assert CodeAnalysisAgent(sources=SourceStore()).snippet(by_ref.snippet_ref) is None
+
+
+def test_javascript_typescript_and_java_symbols_by_extension():
+    files = {
+        "web/api.ts": (
+            "/** Loads a patient. */\n"
+            "export async function load(id: string): Promise<Patient> {\n"
+            "  const re = /[{}]/g;\n"
+            "  return fetch(`/p/${id}`);\n"
+            "}\n"
+            "export const toId = (p: Patient): string => p.id\n"
+            "class Store {\n"
+            "  save = (p) => { this.items.push(p); };\n"
+            "  get(id: string): Patient { return this.items[id]; }\n"
+            "  run(x): { ok: boolean } {\n"
+            "    return { ok: true };\n"
+            "  }\n"
+            "}\n"
+            "function f(): { a: number } {\n"
+            "  return { a: 1 };\n"
+            "}\n"
+            "const g = (y: number): { z: number } => {\n"
+            "  return { z: y };\n"
+            "};\n"
+        ),
+        "Svc.java": (
+            "public class Svc {\n"
+            "    private static final String T = \"}\";\n"
+            "    /** Finds MRN: AB123456. */\n"
+            "    @Override\n"
+            "    public Patient find(String id) throws IOException {\n"
+            "        return repo.get(id);\n"
+            "    }\n"
+            "}\n"
+        ),
+    }
+    symbols, _ = CodeAnalysisAgent(cache=SymbolCache()).extract_symbols_incremental(files)
+    found = {(s.language, s.qualified_name, s.kind, s.start_line, s.end_line) for s in symbols}
+    assert found == {
+        ("typescript", "load", "function", 2, 5),
+        ("typescript", "toId", "function", 6, 6),
+        ("typescript", "Store", "class", 7, 13),
+        ("typescript", "Store.save", "function", 8, 8),
+        ("typescript", "Store.get", "function", 9, 9),
+        ("typescript", "Store.run", "function", 10, 12),
+        ("typescript", "f", "function", 14, 16),
+        ("typescript", "g", "function", 17, 19),
+        ("java", "Svc", "class", 1, 8),
+        ("java", "Svc.find", "function", 4, 7),
+    }
+    by_name = {s.qualified_name: s for s in symbols}
+    assert by_name["load"].docstring == "Loads a patient."
+    assert by_name["Store.run"].code_snippet.endswith("return { ok: true };\n  }")
+    assert by_name["g"].code_snippet.endswith("return { z: y };\n}")
+    assert by_name["Svc.find"].docstring == "Finds [REDACTED_MRN]."
+    assert by_name["Svc.find"].code_snippet.startswith("@Override\n    public Patient find(")
+
+
+def test_recovery_mode_returns_symbols_of_parseable_segments():
+    from fastapi.testclient import TestClient
+
+    from code_analysis_service.main import app
+
+    code = (
+        "import os\n"
+        "\n"
+        "def good():\n"
+        "    return 1\n"
+        "\n"
+        "def broken(:\n"
+        "    pass\n"
+        "\n"
+        "@decorator\n"
+        "class Fine:\n"
+        "    def method(self):\n"
+        "        return 2\n"
+    )
+    client = TestClient(app)
+    strict = client.post("/run", json={"code": code}).json()
+    assert strict["data"] == []
+    assert [(e["start_line"], e["end_line"], e["error_line"]) for e in strict["errors"]] == [(1, 12, 6)]
+
+    recovered = client.post("/run", json={"code": code, "file_path": "m.py", "recover": True}).json()
+    assert [(s["qualified_name"], s["start_line"], s["end_line"]) for s in recovered["data"]] == [
+        ("good", 3, 4),
+        ("Fine", 10, 12),
+        ("Fine.method", 11, 12),
+    ]
+    [error] = recovered["errors"]
+    assert (error["file_path"], error["start_line"], error["end_line"], error["error_line"]) == ("m.py", 6, 8, 6)
+    assert error["message"].startswith("SyntaxError: ")
+
+    # A decorator spanning several lines stays with its function
+    from code_analysis_service.main import parse_source
+
+    code = '@app.route(\n    "/p",\n)\n@login\ndef ok():\n    return 1\n\ndef broken(:\n    pass\n'
+    result = parse_source(code, recover=True)
+    assert [(s.qualified_name, s.start_line) for s in result.symbols] == [("ok", 5)]
+    assert [(e.start_line, e.end_line) for e in result.errors] == [(8, 9)]
+
+    # Definitions inside a docstring are not segment boundaries; errors quote file lines
+    code = (
+        'def documented():\n    """Usage:\n\ndef example():\n    pass\n"""\n    return 1\n\n'
+        'def broken(:\n    pass\n\n'
+        'def tail():\n    s = """\n    return s\n'
+    )
+    result = parse_source(code, recover=True)
+    assert [(s.qualified_name, s.start_line, s.end_line) for s in result.symbols] == [("documented", 1, 7)]
+    assert [(e.start_line, e.end_line, e.error_line) for e in result.errors] == [(9, 11, 9), (12, 14, 13)]
+    assert result.errors[1].message.endswith("(detected at line 14)")
+
+
+def test_dependency_graph_resolves_calls_and_imports_and_updates_incrementally(tmp_path):
+    from code_analysis_service.main import DependencyGraph
+
+    files = {
+        "pkg/__init__.py": "",
+        "pkg/db.py": "def query(sql):\n    return []\n\ndef unused():\n    pass\n",
+        "pkg/service.py": (
+            "from .db import query\n"
+            "\n"
+            "class PatientService:\n"
+            "    def lookup(self, pid):\n"
+            "        return self.fetch(pid)\n"
+            "\n"
+            "    def fetch(self, pid):\n"
+            "        return query('select')\n"
+        ),
+        "web/api.ts": (
+            "import { fetchPatient } from './client';\n"
+            "export const show = (id) => render(fetchPatient(id));\n"
+            "function render(p) { return p; }\n"
+        ),
+        "web/client.ts": "export function fetchPatient(id) { return fetch(id); }\n",
+    }
+    graph = DependencyGraph()
+    assert graph.update(files) == {"updated": 5, "unchanged": 0, "removed": 0}
+
+    assert graph.neighbours("pkg/service.py") == ["pkg/db.py"]
+    assert graph.neighbours("pkg/service.py::PatientService.fetch") == ["pkg/db.py::query"]
+    assert graph.reachable(["pkg/db.py::query"], reverse=True) == [
+        "pkg/service.py::PatientService.fetch",
+        "pkg/service.py::PatientService.lookup",
+    ]
+    assert graph.reachable(["web/client.ts::fetchPatient"], reverse=True) == ["web/api.ts::show"]
+    assert graph.neighbours("web/api.ts::show") == ["web/api.ts::render", "web/client.ts::fetchPatient"]
+
+    path = tmp_path / "graph.json"
+    graph.save(str(path))
+    loaded = DependencyGraph.load(str(path))
+    files["pkg/service.py"] = files["pkg/service.py"].replace("return self.fetch(pid)", "return pid")
+    del files["web/client.ts"]
+    assert loaded.update(files, removed=["web/client.ts"]) == {"updated": 1, "unchanged": 3, "removed": 1}
+    assert loaded.reachable(["pkg/db.py::query"], reverse=True) == ["pkg/service.py::PatientService.fetch"]
+    assert loaded.reachable(["web/api.ts::show"]) == ["web/api.ts::render"]
+
+
+def test_change_impact_selects_tests_of_changed_and_dependent_symbols(tmp_path):
+    import subprocess
+
+    from code_analysis_service.main import ChangeImpactAnalyzer, DependencyGraph, git_changes, parse_unified_diff
+    from common.models import GeneratedTest
+
+    old = {
+        "db.py": "def query(sql):\n    return []\n\ndef unused():\n    pass\n",
+        "service.py": "from db import query\n\ndef lookup(pid):\n    return query(pid)\n\ndef ping():\n    return 1\n",
+    }
+    new = dict(old, **{"db.py": "def query(sql):\n    return list(sql)\n\ndef unused():\n    pass\n"})
+    diff = (
+        "diff --git a/db.py b/db.py\n"
+        "--- a/db.py\n"
+        "+++ b/db.py\n"
+        "@@ -2 +2 @@ def query(sql):\n"
+        "-    return []\n"
+        "+    return list(sql)\n"
+    )
+    tests = [
+        GeneratedTest(id="t-query", code="", symbol_ids=["db.py::query"]),
+        GeneratedTest(id="t-lookup", code="", symbol_ids=["service.py::lookup"]),
+        GeneratedTest(id="t-ping", code="", symbol_ids=["service.py::ping"]),
+        GeneratedTest(id="t-any", code=""),
+    ]
+    changes = parse_unified_diff(diff)
+    assert [(c.old_path, c.new_path, c.added, c.removed) for c in changes] == [("db.py", "db.py", [(2, 2)], [(2, 2)])]
+
+    graph = DependencyGraph()
+    graph.update(old)
+    result = ChangeImpactAnalyzer(graph=graph).analyze(changes, new, tests=tests)
+    assert [s.node_id for s in result["changed"]] == ["db.py::query"]
+    assert "service.py::lookup" in result["affected"] and "service.py::ping" not in result["affected"]
+    assert [t.id for t in result["tests"]] == ["t-query", "t-lookup", "t-any"]
+    linked = ChangeImpactAnalyzer(graph=graph).analyze(changes, new, tests=tests, include_unlinked=False)
+    assert [t.id for t in linked["tests"]] == ["t-query", "t-lookup"]
+
+    # The same selection from two commits of a git repository.
+    git = ["git", "-C", str(tmp_path), "-c", "user.name=t", "-c", "user.email=t@example.com"]
+    subprocess.run(git + ["init", "-q"], check=True)
+    for files in (old, new):
+        for name, code in files.items():
+            (tmp_path / name).write_text(code)
+        subprocess.run(git + ["add", "-A"], check=True)
+        subprocess.run(git + ["commit", "-q", "-m", "change"], check=True)
+    changes, old_sources, new_sources = git_changes(str(tmp_path), "HEAD~1", "HEAD")
+    assert set(new_sources) == {"db.py"} and old_sources["db.py"] == old["db.py"]
+    result = ChangeImpactAnalyzer(graph=DependencyGraph()).analyze(changes, new_sources, old_sources, tests=tests)
+    assert [s.node_id for s in result["changed"]] == ["db.py::query"]
+
+
+def test_change_impact_follows_renamed_symbols_and_module_level_changes():
+    from code_analysis_service.main import ChangeImpactAnalyzer, DependencyGraph, parse_unified_diff
+    from common.models import GeneratedTest
+
+    old = {
+        "a.py": "X = 1\n\ndef f():\n    return X\n",
+        "b.py": "from a import f\n\ndef g():\n    return f()\n",
+        "c.py": "from a import X\n\ndef h():\n    return X\n",
+    }
+    tests = [GeneratedTest(id=f"t-{n}", code="", symbol_ids=[n]) for n in ("b.py::g", "c.py::h")]
+
+    # Renaming f breaks its caller g, which only the old graph links to it
+    graph = DependencyGraph()
+    graph.update(old)
+    new = dict(old, **{"a.py": "X = 1\n\ndef f2():\n    return X\n"})
+    diff = "--- a/a.py\n+++ b/a.py\n@@ -3 +3 @@\n-def f():\n+def f2():\n"
+    result = ChangeImpactAnalyzer(graph=graph).analyze(parse_unified_diff(diff), new, old, tests=tests)
+    assert "b.py::g" in result["affected"] and [t.id for t in result["tests"]] == ["t-b.py::g"]
+
+    # A module-level change reaches the symbols of files importing it
+    graph = DependencyGraph()
+    graph.update(old)
+    new = dict(old, **{"a.py": "X = 2\n\ndef f():\n    return X\n"})
+    diff = "--- a/a.py\n+++ b/a.py\n@@ -1 +1 @@\n-X = 1\n+X = 2\n"
+    result = ChangeImpactAnalyzer(graph=graph).analyze(parse_unified_diff(diff), new, old, tests=tests)
+    assert {"c.py", "c.py::h"} <= set(result["affected"]) and "t-c.py::h" in [t.id for t in result["tests"]]
+
+    # Pure renames and mode changes have no hunks; form feeds are line content
+    diff = (
+        "diff --git a/a.py b/lib/a.py\nsimilarity index 100%\nrename from a.py\nrename to lib/a.py\n"
+        "diff --git a/run.sh b/run.sh\nold mode 100644\nnew mode 100755\n"
+        "diff --git a/c.py b/c.py\n--- a/c.py\n+++ b/c.py\n@@ -1,2 +1,2 @@\n-#\x0cold\n+#\x0cnew\n \n"
+    )
+    changes = parse_unified_diff(diff)
+    assert [(c.old_path, c.new_path, c.added, c.removed) for c in changes] == [
+        ("a.py", "lib/a.py", [], []),
+        ("run.sh", "run.sh", [], []),
+        ("c.py", "c.py", [(1, 1)], [(1, 1)]),
+    ]
+    graph = DependencyGraph()
+    graph.update(old)
+    new = {"lib/a.py": old["a.py"]}
+    result = ChangeImpactAnalyzer(graph=graph).analyze(changes[:1], new, {"a.py": old["a.py"]}, tests=tests)
+    assert {"a.py", "lib/a.py", "b.py::g", "c.py::h"} <= set(result["affected"]) and len(result["tests"]) == 2
+
+
+def test_change_impact_reports_missing_git(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from code_analysis_service.main import app
+
+    monkeypatch.setenv("CODE_ANALYSIS_ROOT", str(tmp_path))
+    monkeypatch.setenv("PATH", "")
+    response = TestClient(app).post("/impact", json={"repo_path": str(tmp_path), "base": "HEAD~1"})
+    assert response.status_code == 501
+
+
+def test_requests_share_one_agent_built_by_the_lifespan():
+    from fastapi.testclient import TestClient
+
+    from code_analysis_service import main
+
+    with TestClient(main.app) as client:
+        agent = main._agent
+        assert agent is not None
+        for _ in range(2):
+            assert client.post("/run", json={"code": SOURCE, "file_path": "svc.py"}).status_code == 200
+        assert main.get_code_analysis_agent() is agent
+        assert main.get_parse_pool() is main._parse_pool
+    assert main._parse_pool is None
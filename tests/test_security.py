@@ -1,4 +1,6 @@
-from common.security import redact_pii, deny_real_phi_in_tests
+import io
+
+from common.security import redact_pii, redact_pii_stream, deny_real_phi_in_tests
 
 
 def test_redact_email_and_phone():
@@ -15,4 +17,139 @@ def test_deny_real_phi_raises():
         deny_real_phi_in_tests(txt)
         assert False, "Expected ValueError"
     except ValueError:
-        assert True
\ No newline at end of file
+        assert True
+
+
+def _five_pass_redact(text):
+    from common import security
+
+    for _, pattern, token in security._PHI_KINDS:
+        text = pattern.sub(token, text)
+    return text
+
+
+def test_single_pass_matches_five_pass_redaction():
+    samples = [
+        "MRN 555-123-4567 and 1/2/555-123-4567",
+        "a@b.c+15551234567 (555) 123-4567@x.com",
+        "MRN abcd-5551234567, dob 12/31/2020; ssn 123-45-6789",
+        "ref 2021-01-01_x 555.123.4567 x@y.co_1 MRN#A1-B2",
+        "def f():\n    return 1\n",
+    ]
+    for txt in samples:
+        assert redact_pii(txt) == _five_pass_redact(txt)
+
+
+def test_single_pass_matches_five_pass_on_random_text():
+    import random
+
+    rnd = random.Random(0)
+    pieces = ["a", "M", "MRN", " ", "\n", "-", ".", "/", "+1", "(", ")", "@", "_", ",",
+              "1", "123", "2021", "x.com", "555-123-4567", "123-45-6789", "1/2/2021", "é", "١"]
+    for _ in range(5000):
+        txt = "".join(rnd.choice(pieces) for _ in range(rnd.randint(1, 20)))
+        assert redact_pii(txt) == _five_pass_redact(txt)
+
+
+def test_stream_redaction_handles_matches_across_chunks():
+    chunks = ["Call (555) 12", "3-4567 or mail jo", "hn.doe@example.com on 2021-", "01-01"]
+    out = "".join(redact_pii_stream(chunks, chunk_size=4))
+    assert out == "Call ([REDACTED_PHONE] or mail [REDACTED_EMAIL] on [REDACTED_DATE]"
+
+
+def test_stream_redaction_matches_whole_text_redaction():
+    line = "Patient MRN: AB1234 (dob 1/2/1980) called 555.123.4567, ssn 123-45-6789\n"
+    text = "".join(f"{i}: {line}" for i in range(2000))
+    assert "".join(redact_pii_stream(io.StringIO(text), chunk_size=97)) == redact_pii(text)
+
+    # A buffer too small to hold a chunk plus the overlap is rejected up front
+    try:
+        redact_pii_stream(io.StringIO(text), chunk_size=1 << 16, max_buffer=1 << 16)
+        assert False, "Expected ValueError"
+    except ValueError as exc:
+        assert "max_buffer" in str(exc)
+
+
+def test_find_phi_reports_kind_offset_and_line():
+    from common.security import find_phi
+
+    txt = "x = 1\nowner = 'MRN: AB1234'\nseen = '2021-01-01'\n"
+    found = find_phi(txt)
+    assert [(f.kind, f.line) for f in found] == [("mrn", 2), ("date", 3)]
+    assert txt[found[0].start:found[0].end] == "MRN: AB1234"
+    assert len(find_phi(txt, first_only=True)) == 1
+
+
+def test_batch_gate_names_offending_tests():
+    from common.security import deny_real_phi_in_test_batch, find_phi_batch
+
+    batch = ["def test_a():\n    assert True\n", "# call 555-123-4567\n", "", "ssn = '123-45-6789'"]
+    assert [[f.kind for f in found] for found in find_phi_batch(batch)] == [[], ["phone"], [], ["ssn"]]
+    try:
+        deny_real_phi_in_test_batch(batch)
+        assert False, "Expected ValueError"
+    except ValueError as exc:
+        assert "#1" in str(exc) and "#3" in str(exc)
+    deny_real_phi_in_test_batch(batch[:1])
+
+
+def test_redact_many_matches_single_redaction():
+    import asyncio
+    import threading
+
+    from common import security
+    from common.security import redact_pii_many, redact_pii_many_async, shutdown_redaction_pool
+
+    texts = [f"bug {i}: patient seen 2021-01-{i % 28 + 1:02d}, call 555-123-4567" for i in range(200)]
+    expected = [redact_pii(t) for t in texts]
+    try:
+        assert redact_pii_many(texts, min_pool_chars=0) == expected
+        assert asyncio.run(redact_pii_many_async(texts, min_pool_chars=0)) == expected
+    finally:
+        shutdown_redaction_pool()
+    assert redact_pii_many(texts[:3]) == expected[:3]
+
+    async def small_batch():
+        loop_thread = threading.get_ident()
+        threads = set()
+
+        def record(text):
+            threads.add(threading.get_ident())
+            return real(text)
+
+        security.redact_pii = record
+        try:
+            return await redact_pii_many_async(texts[:3]), loop_thread not in threads
+        finally:
+            security.redact_pii = real
+
+    real = security.redact_pii
+    assert asyncio.run(small_batch()) == (expected[:3], True)
+
+
+def test_redaction_cache_counts_hits_and_respects_limits():
+    from common.security import RedactionCache, _contains_phi, clear_redaction_cache, redaction_cache_info
+
+    clear_redaction_cache()
+    snippet = "def lookup():\n    return {'mrn': 'MRN: AB1234', 'seen': '2021-01-01'}\n"
+    first = redact_pii(snippet)
+    assert redact_pii(snippet) == first
+    assert _contains_phi(snippet) and _contains_phi(snippet)
+    info = redaction_cache_info()
+    assert (info.hits, info.misses, info.entries) == (2, 2, 2)
+
+    cache = RedactionCache(max_entries=2, max_bytes=10_000, min_chars=1)
+    for i in range(3):
+        cache.put(cache.key("redact", f"text {i}"), f"value {i}")
+    assert cache.get(cache.key("redact", "text 0")) is None
+    assert cache.info().evictions == 1
+    cache.put(cache.key("redact", "big"), "x" * 20_000)
+    assert cache.get(cache.key("redact", "big")) is None
+
+
+def test_redact_pii_slices_matches_redacting_each_slice():
+    from common.security import redact_pii_slices
+
+    text = "class A:\n    def f(self):\n        return 'jane@example.com', 'x123-45-6789'\n7(555) 123-4567"
+    slices = [(0, 73), (13, 73), (29, 73), (41, 57), (46, 60), (74, 89), (75, 89)]
+    assert redact_pii_slices(text, slices) == [redact_pii(text[a:b]) for a, b in slices]